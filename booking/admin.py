@@ -1,9 +1,92 @@
 from django.contrib import admin
 from .models import Room, Material, RoomInventory, Reservation, ReservationItem, Blackout
 
-admin.site.register(Room)
-admin.site.register(Material)
-admin.site.register(RoomInventory)
-admin.site.register(Reservation)
-admin.site.register(ReservationItem)
-admin.site.register(Blackout)
+# Reservations, their items and the mirror blackouts grow without bound: changelists
+# join what they display (list_select_related), skip the second COUNT(*) of the whole
+# table (show_full_result_count) and filter/order along indexed columns. Forms pick
+# users and reservations by id and rooms/materials by autocomplete instead of
+# rendering every row in a <select>.
+
+
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    search_fields = ["code"]
+    ordering = ["code"]
+
+
+@admin.register(Material)
+class MaterialAdmin(admin.ModelAdmin):
+    search_fields = ["name"]
+    ordering = ["name"]
+
+
+@admin.register(RoomInventory)
+class RoomInventoryAdmin(admin.ModelAdmin):
+    list_display = ["room", "material", "quantity"]
+    list_select_related = ["room", "material"]
+    list_filter = ["room"]
+    search_fields = ["material__name"]
+    autocomplete_fields = ["room", "material"]
+    ordering = ["room__code", "material__name"]
+
+
+class ReservationItemInline(admin.TabularInline):
+    model = ReservationItem
+    extra = 0
+    autocomplete_fields = ["material"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("material")
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ["id", "room", "date", "start_time", "end_time", "user", "created_at"]
+    list_select_related = ["room", "user"]
+    list_filter = ["room"]                  # (room, start_at, end_at) index
+    date_hierarchy = "date"                 # (date, start_time, id) index
+    ordering = ["-date", "-start_time", "-id"]
+    search_fields = ["^user__username"]     # prefix match: uses the username index
+    show_full_result_count = False
+    raw_id_fields = ["user"]
+    autocomplete_fields = ["room"]
+    inlines = [ReservationItemInline]
+
+
+@admin.register(ReservationItem)
+class ReservationItemAdmin(admin.ModelAdmin):
+    list_display = ["reservation", "material", "quantity"]
+    list_select_related = ["reservation__room", "material"]
+    list_filter = ["material"]
+    ordering = ["-id"]
+    show_full_result_count = False
+    raw_id_fields = ["reservation"]
+    autocomplete_fields = ["material"]
+
+
+class BlackoutOriginFilter(admin.SimpleListFilter):
+    title = "origen"
+    parameter_name = "origen"
+
+    def lookups(self, request, model_admin):
+        return [("manual", "Bloqueos"), ("reserva", "Copias de reservas")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "manual":
+            return queryset.exclude(reason__startswith="Reserva de")
+        if self.value() == "reserva":
+            return queryset.filter(reason__startswith="Reserva de")
+        return queryset
+
+
+@admin.register(Blackout)
+class BlackoutAdmin(admin.ModelAdmin):
+    list_display = ["room", "start_datetime", "end_datetime", "reason", "created_by"]
+    list_select_related = ["room", "created_by"]
+    list_filter = [BlackoutOriginFilter, "room"]
+    date_hierarchy = "start_datetime"       # blackout_start_idx
+    ordering = ["-start_datetime", "-id"]
+    search_fields = ["reason"]
+    show_full_result_count = False
+    raw_id_fields = ["created_by"]
+    autocomplete_fields = ["room"]
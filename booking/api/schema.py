@@ -0,0 +1,109 @@
+"""OpenAPI schema served from a file generated by ``manage.py generate_schema``.
+
+Introspecting every serializer/viewset per request is expensive, so the schema
+is built once (image build or container start) and served as a static artifact
+with ETag and precompressed gzip. Live generation is only used in DEBUG.
+"""
+import gzip
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views import View
+from drf_spectacular.views import SpectacularAPIView
+
+FORMATS = {
+    "yaml": ("openapi.yaml", "application/vnd.oai.openapi; charset=utf-8"),
+    "json": ("openapi.json", "application/vnd.oai.openapi+json; charset=utf-8"),
+}
+
+
+def schema_dir():
+    return Path(settings.OPENAPI_SCHEMA_DIR)
+
+
+def generate(directory=None):
+    """Render the schema in every format, plus .gz companions. Returns written paths."""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    directory = Path(directory or schema_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    rendered = {
+        "yaml": OpenApiYamlRenderer().render(schema, renderer_context={}),
+        "json": OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+    written = []
+    for fmt, data in rendered.items():
+        path = directory / FORMATS[fmt][0]
+        gz_path = path.with_suffix(path.suffix + ".gz")
+        # The .gz first: a worker that sees the new main file also finds its .gz
+        _write_atomic(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+        _write_atomic(path, data)
+        written += [path, gz_path]
+    return written
+
+
+def _write_atomic(path, data):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)  # atomic: running workers never see half a file
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+_loaded = {}
+
+
+def _load(fmt):
+    """Read the artifact once per process (reloaded if the file or its .gz changes)."""
+    path = schema_dir() / FORMATS[fmt][0]
+    gz_path = path.with_suffix(path.suffix + ".gz")
+    mtime = (_mtime(path), _mtime(gz_path))
+    if mtime[0] is None:
+        return None
+    cached = _loaded.get(fmt)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    data = path.read_bytes()
+    gz = gz_path.read_bytes() if mtime[1] is not None else gzip.compress(data, mtime=0)
+    entry = {"data": data, "gzip": gz, "etag": '"%s"' % hashlib.sha256(data).hexdigest()[:32]}
+    _loaded[fmt] = (mtime, entry)
+    return entry
+
+
+class PrecomputedSchemaView(View):
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get("format", "")
+        if fmt not in FORMATS:
+            fmt = "json" if "json" in request.headers.get("Accept", "") else "yaml"
+        entry = _load(fmt)
+        if entry is None:
+            if settings.DEBUG:
+                return SpectacularAPIView.as_view()(request, *args, **kwargs)
+            return HttpResponse(
+                "Esquema OpenAPI no generado. Ejecuta: python manage.py generate_schema",
+                status=503, content_type="text/plain; charset=utf-8",
+            )
+
+        if entry["etag"] in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        elif "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = HttpResponse(entry["gzip"], content_type=FORMATS[fmt][1])
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(entry["data"], content_type=FORMATS[fmt][1])
+        response["ETag"] = entry["etag"]
+        response["Cache-Control"] = "public, max-age=300"
+        patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+        return response
@@ -1,8 +1,11 @@
 import datetime as _dt
-from django.db import transaction, models
-from rest_framework import serializers
+from django.db import transaction
+from rest_framework import exceptions, serializers
 from django.contrib.auth import get_user_model
 from booking.models import Room, Material, RoomInventory, Reservation, ReservationItem, Blackout
+from booking.locking import lock_room_ranges
+from booking import conflicts, metrics, suggestions
+from booking.budgets import add_items
 
 User = get_user_model()
 
@@ -37,8 +40,25 @@ class UserMiniSerializer(serializers.ModelSerializer):
         model = User
         fields = ["id","username","email"]
 
-def _dt_join(d, t):
-    return _dt.datetime.combine(d, t)
+class SuggestionSerializer(serializers.Serializer):
+    room = serializers.IntegerField()
+    room_code = serializers.CharField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+class BookingConflict(exceptions.APIException):
+    """400 for a booking that overlaps, with the nearest free slots as typed values.
+
+    A ValidationError would turn every leaf (room ids included) into an error string.
+    """
+    status_code = 400
+    default_code = "invalid"
+
+    def __init__(self, message, slots):
+        super().__init__()
+        self.detail = {"non_field_errors": [exceptions.ErrorDetail(message, code="invalid")],
+                       "suggestions": SuggestionSerializer(slots, many=True).data}
 
 class ReservationSerializer(serializers.ModelSerializer):
     items = ReservationItemSerializer(many=True)
@@ -53,47 +73,72 @@ class ReservationSerializer(serializers.ModelSerializer):
         start = attrs.get("start_time", getattr(self.instance, "start_time", None))
         end = attrs.get("end_time", getattr(self.instance, "end_time", None))
         if start and end and start >= end:
-            raise serializers.ValidationError("La hora de inicio debe ser menor que la de término.")
+            self._reject("invalid", "La hora de inicio debe ser menor que la de término.")
         # L-V 08:00–18:00
         if date and (date.weekday() > 4):
-            raise serializers.ValidationError("Solo se permiten reservas de lunes a viernes.")
+            self._reject("weekend", "Solo se permiten reservas de lunes a viernes.")
         if start and end:
             if not (_dt.time(8,0) <= start < _dt.time(18,0) and _dt.time(8,0) < end <= _dt.time(18,0)):
-                raise serializers.ValidationError("Horario permitido: 08:00 a 18:00.")
-        # Choque con reservas existentes
-        qs = Reservation.objects.filter(room=room, date=date, start_time__lt=end, end_time__gt=start)
-        if self.instance:
-            qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists():
-            raise serializers.ValidationError("El salón ya está ocupado en ese horario.")
-        # Choque con blackouts (global o por salón)
-        start_dt = _dt_join(date, start); end_dt = _dt_join(date, end)
-        blackout_exists = Blackout.objects.filter(
-            models.Q(room__isnull=True) | models.Q(room=room),
-            start_datetime__lt=end_dt,
-            end_datetime__gt=start_dt
-        ).exists()
-        if blackout_exists:
-            raise serializers.ValidationError("Existe un bloqueo de agenda en ese horario (feriado/reunión).")
+                self._reject("hours", "Horario permitido: 08:00 a 18:00.")
+        if room and date and start and end:
+            start_at, end_at = Reservation.range_for(date, start, end)
+            with metrics.observe(metrics.CONFLICT_CHECK, "api"):
+                # Choque con reservas y blackouts (re-checked under lock in create/update)
+                conflict = self._conflict(room, start_at, end_at)
+            if conflict:
+                self._reject_conflict(conflict, room, start_at, end_at, attrs.get("items"))
         return attrs
 
+    def _reject(self, reason, message, suggestions=None):
+        if self.instance is None:  # only bookings count, not edits
+            metrics.booking_rejected("api", reason)
+        if suggestions is None:
+            raise serializers.ValidationError(message)
+        raise BookingConflict(message, suggestions)
+
+    def _conflict(self, room, start_at, end_at):
+        return conflicts.first_conflict(room, start_at, end_at, exclude_reservation=getattr(self.instance, "pk", None))
+
+    def _reject_conflict(self, conflict, room, start_at, end_at, items=None):
+        """Reject with the nearest free slots; call outside the locking transaction"""
+        exclude = getattr(self.instance, "pk", None)
+        materials = {}
+        for it in items or ():
+            materials[it["material"].pk] = materials.get(it["material"].pk, 0) + it["quantity"]
+        free = suggestions.nearest(room, start_at, end_at, exclude_reservation=exclude, materials=materials)
+        if conflict == conflicts.RESERVATION:
+            self._reject("overlap", "El salón ya está ocupado en ese horario.", free)
+        self._reject("blackout", "Existe un bloqueo de agenda en ese horario (feriado/reunión).", free)
+
     def create(self, validated_data):
         request = self.context.get("request")
-        items_data = validated_data.pop("items", [])
+        items_data = sorted(validated_data.pop("items", []), key=lambda it: it["material"].pk)
+        add_items(len(items_data))
         room = validated_data["room"]
         with transaction.atomic():
-            r = Reservation.objects.create(user=(request.user if request and request.user.is_authenticated else None), **validated_data)
-            for it in items_data:
-                material = it["material"]; qty = it["quantity"]
-                inv = RoomInventory.objects.select_for_update().get(room=room, material=material)
-                if inv.quantity < qty:
-                    raise serializers.ValidationError(f"Sin stock suficiente de {material.name} en salón {room.code}.")
-                inv.quantity -= qty; inv.save()
-                ReservationItem.objects.create(reservation=r, material=material, quantity=qty)
+            r = Reservation(user=(request.user if request and request.user.is_authenticated else None), **validated_data)
+            r.sync_range()
+            # Serialize bookings of this room/day, then check again: validate() ran unlocked
+            lock_room_ranges((room, r.start_at, r.end_at))
+            conflict = self._conflict(room, r.start_at, r.end_at)
+            if not conflict:
+                r.save()
+                for it in items_data:
+                    material = it["material"]; qty = it["quantity"]
+                    with metrics.observe(metrics.LOCK_WAIT, "stock"):
+                        inv = RoomInventory.objects.select_for_update().get(room=room, material=material)
+                    if inv.quantity < qty:
+                        self._reject("stock", f"Sin stock suficiente de {material.name} en salón {room.code}.")
+                    inv.quantity -= qty; inv.save()
+                    ReservationItem.objects.create(reservation=r, material=material, quantity=qty)
+        if conflict:
+            # Searched after the transaction, so the room/day lock is not held meanwhile
+            self._reject_conflict(conflict, room, r.start_at, r.end_at, items_data)
+        metrics.booking_created("api")
         return r
 
     def _apply_stock_delta(self, room, deltas):
-        for material, delta in deltas.items():
+        for material, delta in sorted(deltas.items(), key=lambda md: md[0].pk):
             inv = RoomInventory.objects.select_for_update().get(room=room, material=material)
             new_qty = inv.quantity - delta  # delta positivo = consumir más; negativo = devolver
             if new_qty < 0:
@@ -106,26 +151,31 @@ class ReservationSerializer(serializers.ModelSerializer):
         new_date = validated_data.get("date", instance.date)
         new_start = validated_data.get("start_time", instance.start_time)
         new_end = validated_data.get("end_time", instance.end_time)
-        exists = Reservation.objects.filter(room=new_room, date=new_date, start_time__lt=new_end, end_time__gt=new_start).exclude(pk=instance.pk).exists()
-        if exists:
-            raise serializers.ValidationError("El salón ya está ocupado en ese horario.")
+        new_start_at, new_end_at = Reservation.range_for(new_date, new_start, new_end)
         with transaction.atomic():
-            if new_items is not None:
-                old_map = {it.material: it.quantity for it in instance.items.all()}
-                new_map = {}
-                for it in new_items:
-                    m = it["material"]; q = it["quantity"]
-                    new_map[m] = new_map.get(m,0) + q
-                deltas = {}
-                for m in set(old_map)|set(new_map):
-                    deltas[m] = new_map.get(m,0) - old_map.get(m,0)
-                self._apply_stock_delta(new_room, deltas)
-                instance.items.all().delete()
-                for m,q in new_map.items():
-                    ReservationItem.objects.create(reservation=instance, material=m, quantity=q)
-            for k,v in validated_data.items():
-                setattr(instance, k, v)
-            instance.save()
+            lock_room_ranges((instance.room, instance.start_at, instance.end_at), (new_room, new_start_at, new_end_at))
+            conflict = self._conflict(new_room, new_start_at, new_end_at)
+            if not conflict:
+                if new_items is not None:
+                    old_map = {it.material: it.quantity for it in instance.items.all()}
+                    new_map = {}
+                    for it in new_items:
+                        m = it["material"]; q = it["quantity"]
+                        new_map[m] = new_map.get(m,0) + q
+                    deltas = {}
+                    for m in set(old_map)|set(new_map):
+                        deltas[m] = new_map.get(m,0) - old_map.get(m,0)
+                    add_items(len(deltas))
+                    self._apply_stock_delta(new_room, deltas)
+                    instance.items.all().delete()
+                    for m,q in new_map.items():
+                        ReservationItem.objects.create(reservation=instance, material=m, quantity=q)
+                for k,v in validated_data.items():
+                    setattr(instance, k, v)
+                instance.save()
+        if conflict:
+            # Searched after the transaction, so the room/day locks are not held meanwhile
+            self._reject_conflict(conflict, new_room, new_start_at, new_end_at, new_items)
         return instance
 
 class BlackoutSerializer(serializers.ModelSerializer):
@@ -135,7 +185,9 @@ class BlackoutSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_by","created_at"]
 
     def validate(self, attrs):
-        if attrs["start_datetime"] >= attrs["end_datetime"]:
+        start = attrs.get("start_datetime", getattr(self.instance, "start_datetime", None))
+        end = attrs.get("end_datetime", getattr(self.instance, "end_datetime", None))
+        if start and end and start >= end:
             raise serializers.ValidationError("Fecha/hora inicial debe ser menor que la final.")
         return attrs
 
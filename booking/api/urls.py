@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from .viewsets import RoomViewSet, MaterialViewSet, RoomInventoryViewSet, ReservationViewSet, BlackoutViewSet
+from drf_spectacular.views import SpectacularSwaggerView
+from .schema import PrecomputedSchemaView
+from .viewsets import RoomViewSet, MaterialViewSet, RoomInventoryViewSet, ReservationViewSet, BlackoutViewSet, ChangeViewSet
 
 router = DefaultRouter()
 router.register(r"rooms", RoomViewSet, basename="room")
@@ -10,11 +11,12 @@ router.register(r"materials", MaterialViewSet, basename="material")
 router.register(r"inventory", RoomInventoryViewSet, basename="inventory")
 router.register(r"reservations", ReservationViewSet, basename="reservation")
 router.register(r"blackouts", BlackoutViewSet, basename="blackout")
+router.register(r"changes", ChangeViewSet, basename="change")
 
 urlpatterns = [
     path("", include(router.urls)),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
-    path("schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("schema/", PrecomputedSchemaView.as_view(), name="schema"),
     path("docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="docs"),
 ]
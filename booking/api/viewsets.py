@@ -8,25 +8,57 @@ from django.db import transaction
 from rest_framework.response import Response
 from rest_framework import status
 from booking.models import RoomInventory
+from booking.routers import read_from_replica
+from booking.budgets import QueryBudgetMixin, add_items
+from booking import changes
+from rest_framework.exceptions import ValidationError
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 
-class RoomViewSet(viewsets.ReadOnlyModelViewSet):
+# Every budget starts with the authentication queries: the session row (on a
+# session-cache miss) and the user, or the user of a JWT
+AUTH = 2
+
+class AtomicWritesMixin:
+    """Saves and deletes commit together with the change-log rows their signals append"""
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+class RoomViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
+    query_budgets = {"list": AUTH + 2, "retrieve": AUTH + 1}
     queryset = Room.objects.all().order_by("code")
     serializer_class = RoomSerializer
     permission_classes = [AllowAny]
 
-class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
+class MaterialViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
+    query_budgets = {"list": AUTH + 2, "retrieve": AUTH + 1}
     queryset = Material.objects.all().order_by("name")
     serializer_class = MaterialSerializer
     permission_classes = [AllowAny]
 
-class RoomInventoryViewSet(viewsets.ModelViewSet):
+class RoomInventoryViewSet(QueryBudgetMixin, AtomicWritesMixin, viewsets.ModelViewSet):
+    query_budgets = {"list": AUTH + 2, "retrieve": AUTH + 1, "create": AUTH + 4, "update": AUTH + 5,
+                     "partial_update": AUTH + 3, "destroy": AUTH + 3}
     queryset = RoomInventory.objects.select_related("room","material").all()
     serializer_class = RoomInventorySerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["room","material"]
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
+    # get_queryset() adds the AdminBiblioteca check for non-staff users (every action but create)
+    query_budgets = {"list": AUTH + 5, "retrieve": AUTH + 4, "create": (AUTH + 11, 5), "update": (AUTH + 17, 5),
+                     "partial_update": AUTH + 14, "destroy": (AUTH + 11, 3)}
     serializer_class = ReservationSerializer
 
     def get_queryset(self):
@@ -35,15 +67,15 @@ class ReservationViewSet(viewsets.ModelViewSet):
             # Check if user is admin (staff or AdminBiblioteca group)
             if self.request.user.is_staff or self.request.user.groups.filter(name='AdminBiblioteca').exists():
                 # Admins can see all reservations
-                return Reservation.objects.prefetch_related("items").all()
+                return Reservation.objects.select_related("user").prefetch_related("items__material").all()
             else:
                 # Teachers (Docente group) and other users see only their own reservations
-                return Reservation.objects.filter(user=self.request.user).prefetch_related("items").all()
+                return Reservation.objects.filter(user=self.request.user).select_related("user").prefetch_related("items__material").all()
         else:
             # Anonymous users see no reservations for list/retrieve, but can still create
             if self.action in ["list", "retrieve"]:
                 return Reservation.objects.none()
-            return Reservation.objects.prefetch_related("items").all()
+            return Reservation.objects.select_related("user").prefetch_related("items__material").all()
 
     def get_permissions(self):
         if self.action in ["list","retrieve"]:
@@ -56,20 +88,73 @@ class ReservationViewSet(viewsets.ModelViewSet):
     filterset_fields = {"room":["exact"], "date":["exact","gte","lte","range"]}
     ordering_fields = ["date","start_time","end_time"]
 
+    def list(self, request, *args, **kwargs):
+        return read_from_replica(super().list)(request, *args, **kwargs)
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         with transaction.atomic():
-            for it in instance.items.select_related("material"):
+            items = list(instance.items.select_related("material"))
+            add_items(len(items))
+            for it in items:
                 inv = RoomInventory.objects.select_for_update().get(room=instance.room, material=it.material)
                 inv.quantity += it.quantity
                 inv.save()
             instance.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class BlackoutViewSet(viewsets.ModelViewSet):
+class BlackoutViewSet(QueryBudgetMixin, AtomicWritesMixin, viewsets.ModelViewSet):
+    query_budgets = {"list": AUTH + 2, "retrieve": AUTH + 1, "create": AUTH + 3, "update": AUTH + 4,
+                     "partial_update": AUTH + 3, "destroy": AUTH + 3}
     # Only show administrative blackouts, not reservation-generated ones
     queryset = Blackout.objects.select_related("room").exclude(
         reason__startswith='Reserva de'
     ).all()
     serializer_class = BlackoutSerializer
     permission_classes = [IsAdminUser]
+
+class ChangeViewSet(QueryBudgetMixin, viewsets.ViewSet):
+    """Delta sync: ``?since=<seq>`` returns what changed after ``seq`` (see booking.changes).
+
+    Without ``since`` only the current cursor is returned: take it, then download the full lists.
+    """
+    query_budgets = {"list": AUTH + 12}
+    permission_classes = [IsAuthenticated]
+    # Same querysets and representation as the list endpoints, so clients apply data as-is
+    sources = {
+        changes.RESERVATION: (Reservation.objects.select_related("user").prefetch_related("items__material"), ReservationSerializer),
+        changes.INVENTORY: (RoomInventory.objects.select_related("room", "material"), RoomInventorySerializer),
+        changes.BLACKOUT: (Blackout.objects.select_related("room"), BlackoutSerializer),
+    }
+
+    @extend_schema(parameters=[OpenApiParameter("since", int, description="Último seq recibido")],
+                   responses={200: OpenApiTypes.OBJECT})
+    def list(self, request):
+        since = request.query_params.get("since")
+        changes.sequence()
+        if since is None:
+            return Response({"changes": [], "next": changes.current_seq(), "more": False})
+        try:
+            since = int(since)
+        except ValueError:
+            raise ValidationError({"since": "Debe ser un número de secuencia."})
+        user = request.user
+        admin = user.is_staff or user.groups.filter(name="AdminBiblioteca").exists()
+        rows = list(changes.visible_to(user, admin).filter(seq__gt=since).order_by("seq")[:changes.PAGE_SIZE + 1])
+        more = len(rows) > changes.PAGE_SIZE
+        rows = rows[:changes.PAGE_SIZE]
+        latest = changes.latest_per_object(rows)
+        data = {}
+        for entity, (queryset, serializer) in self.sources.items():
+            ids = [c.object_id for c in latest if c.entity == entity and c.op == changes.UPSERT]
+            if ids:
+                data[entity] = {obj["id"]: obj for obj in serializer(queryset.filter(pk__in=ids), many=True).data}
+        deltas = []
+        for c in latest:
+            delta = {"seq": c.seq, "entity": c.entity, "id": c.object_id, "op": c.op}
+            if c.op == changes.UPSERT:
+                delta["data"] = data[c.entity].get(c.object_id)
+                if delta["data"] is None:
+                    continue  # deleted since: its tombstone comes later in the log
+            deltas.append(delta)
+        return Response({"changes": deltas, "next": rows[-1].seq if rows else since, "more": more})
@@ -0,0 +1,98 @@
+"""Archive tier for past reservations.
+
+``manage.py archive_reservations`` moves reservations dated before a cutoff,
+with their items, into ``ArchivedReservation``/``ArchivedReservationItem``,
+one batch per transaction, and then deletes their mirror blackouts ("Reserva
+de ..."): the archived row keeps the same room and range. Lists, the API,
+conflict checks and the iCal feeds only read the live tables. Reports go
+through :func:`report_stats`, which adds the archive only when the requested
+range starts on or before its last day (:func:`horizon`).
+"""
+from datetime import datetime, time
+
+from django.db import router, transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from . import changes, versioning
+from .models import Reservation, ReservationItem, Blackout, ArchivedReservation, ArchivedReservationItem
+
+BATCH_SIZE = 1000
+FIELDS = ("id", "room_id", "user_id", "date", "start_time", "end_time", "start_at", "end_at", "created_at")
+ITEM_FIELDS = ("id", "reservation_id", "material_id", "quantity")
+
+
+def horizon():
+    """Last archived date, or None while the archive is empty.
+
+    Read on every call (an index lookup on ArchivedReservation.date) rather than
+    cached: the archive command runs in its own process, so it could not invalidate
+    a per-worker cache.
+    """
+    return ArchivedReservation.objects.aggregate(last=Max("date"))["last"]
+
+
+def _raw_delete(qs):
+    # The rows were already copied: delete them without loading them or sending
+    # signals, which would publish "reservation.deleted" for every archived row
+    qs._raw_delete(router.db_for_write(qs.model))
+
+
+def archive_batch(cutoff, batch_size=BATCH_SIZE):
+    """Move up to ``batch_size`` reservations dated before ``cutoff`` to the archive; returns how many"""
+    with transaction.atomic():
+        rows = list(Reservation.objects.select_for_update().filter(date__lt=cutoff)
+                    .order_by("date", "start_time", "id").values(*FIELDS)[:batch_size])
+        if not rows:
+            return 0
+        ids = [r["id"] for r in rows]
+        items = ReservationItem.objects.filter(reservation_id__in=ids)
+        ArchivedReservation.objects.bulk_create([ArchivedReservation(**r) for r in rows])
+        ArchivedReservationItem.objects.bulk_create([ArchivedReservationItem(**i) for i in items.values(*ITEM_FIELDS)])
+        _raw_delete(items)
+        _raw_delete(Reservation.objects.filter(pk__in=ids))
+        changes.record(changes.RESERVATION, changes.DELETE, [(r["id"], r["user_id"]) for r in rows])
+        scopes = {versioning.room_scope(r["room_id"]) for r in rows}
+        scopes.update(versioning.user_scope(r["user_id"]) for r in rows if r["user_id"])
+        transaction.on_commit(lambda: versioning.bump(*scopes))
+        versioning.models_changed(Reservation, ReservationItem)
+    return len(rows)
+
+
+def delete_mirrors(cutoff, batch_size=BATCH_SIZE):
+    """Delete one batch of mirror blackouts starting before ``cutoff`` (i.e. of archived reservations); returns how many"""
+    start = timezone.make_aware(datetime.combine(cutoff, time.min))
+    ids = list(Blackout.objects.filter(reason__startswith="Reserva de", start_datetime__lt=start)
+               .order_by("pk").values_list("pk", flat=True)[:batch_size])
+    if ids:
+        _raw_delete(Blackout.objects.filter(pk__in=ids))
+    return len(ids)
+
+
+def _grouped(querysets, key, value):
+    """Rows of ``{key, value}`` summed over ``querysets`` (grouped by ``key``), fetched with one UNION ALL"""
+    if len(querysets) == 1:
+        return list(querysets[0].order_by(key))
+    totals = {}
+    for row in querysets[0].order_by().union(*(qs.order_by() for qs in querysets[1:]), all=True):
+        totals[row[key]] = totals.get(row[key], 0) + (row[value] or 0)
+    return [{key: k, value: totals[k]} for k in sorted(totals)]
+
+
+def report_stats(start, end, room=None):
+    """``(total, room_stats, material_stats)`` for reservations dated ``start``..``end``, archive included when reached"""
+    sources = [(Reservation, ReservationItem)]
+    last = horizon()
+    if last is not None and start <= last:
+        sources.append((ArchivedReservation, ArchivedReservationItem))
+    rooms, materials = [], []
+    for model, item_model in sources:
+        qs = model.objects.filter(date__gte=start, date__lte=end)
+        if room:
+            qs = qs.filter(room_id=room)
+        rooms.append(qs.values("room__code").annotate(reservation_count=Count("id")))
+        materials.append(item_model.objects.filter(reservation__in=qs).values("material__name").annotate(
+            total_quantity=Sum("quantity")))
+    room_stats = _grouped(rooms, "room__code", "reservation_count")
+    material_stats = _grouped(materials, "material__name", "total_quantity")
+    return sum(r["reservation_count"] for r in room_stats), room_stats, material_stats
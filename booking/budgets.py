@@ -0,0 +1,98 @@
+"""Query budgets: the maximum number of SQL queries a view may run.
+
+``@query_budget(5)`` on a function view, or ``query_budgets = {"list": 3}`` on
+a viewset using ``QueryBudgetMixin``. Views whose work grows with the data
+they touch declare ``per_item`` and report the items with ``add_items(n)``.
+Over budget raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_RAISE`` is on
+(DEBUG and tests) and logs a warning otherwise. Savepoints and SQLite's
+explicit BEGIN are not counted, so the numbers are the same inside and
+outside a test transaction.
+"""
+import functools
+import logging
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+log = logging.getLogger("booking.requests")
+
+_current = ContextVar("query_budget", default=None)
+
+TRANSACTION_SQL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT", "BEGIN")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class _Budget:
+    def __init__(self):
+        self.queries = 0
+        self.items = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(TRANSACTION_SQL):
+            self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def add_items(n):
+    """Report ``n`` items processed by the running view (raises its budget by per_item each)."""
+    budget = _current.get()
+    if budget is not None:
+        budget.items += n
+
+
+@contextmanager
+def counting():
+    """Count the queries run inside the block on every database alias."""
+    budget = _Budget()
+    token = _current.set(budget)
+    try:
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(budget))
+            yield budget
+    finally:
+        _current.reset(token)
+
+
+def check(name, budget, limit, per_item=0):
+    allowed = limit + per_item * budget.items
+    if budget.queries <= allowed:
+        return
+    message = f"{name}: {budget.queries} queries, budget {allowed}"
+    if getattr(settings, "QUERY_BUDGET_RAISE", settings.DEBUG):
+        raise QueryBudgetExceeded(message)
+    log.warning("query budget exceeded %s", message)
+
+
+def query_budget(limit, per_item=0):
+    """Decorator for function views; place it right above ``def``."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            with counting() as budget:
+                response = view(request, *args, **kwargs)
+            check(view.__name__, budget, limit, per_item)
+            return response
+        wrapped.query_budget = (limit, per_item)
+        return wrapped
+    return decorator
+
+
+class QueryBudgetMixin:
+    """Viewset mixin: ``query_budgets`` maps action -> limit or (limit, per_item)."""
+
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        with counting() as budget:
+            response = super().dispatch(request, *args, **kwargs)
+        spec = self.query_budgets.get(getattr(self, "action", None))
+        if spec is not None:
+            limit, per_item = spec if isinstance(spec, tuple) else (spec, 0)
+            check(f"{type(self).__name__}.{self.action}", budget, limit, per_item)
+        return response
@@ -0,0 +1,60 @@
+"""One overlap query for reservations and blackouts.
+
+Reservations (``start_at``/``end_at``) and blackouts (``start_datetime``/
+``end_datetime``) are both aware half-open ranges, so a slot ``[start, end)``
+conflicts with either when ``other.start < end and other.end > start``. This
+holds whatever days the ranges span, midnight and multi-day included. Both
+halves of the UNION are covered by a ``(room, start, end)`` index.
+"""
+from django.db.models import CharField, Q, Value
+
+from .models import Reservation, Blackout
+
+RESERVATION = "reservation"
+BLACKOUT = "blackout"
+
+
+def _overlapping(rooms, start, end, exclude_reservation=None):
+    """Reservations of ``rooms`` and blackouts (theirs or global, mirrors left out) overlapping ``[start, end)``"""
+    reservations = Reservation.objects.filter(room__in=rooms, start_at__lt=end, end_at__gt=start)
+    if exclude_reservation is not None:
+        reservations = reservations.exclude(pk=exclude_reservation)
+    blackouts = Blackout.objects.filter(
+        Q(room__in=rooms) | Q(room__isnull=True), start_datetime__lt=end, end_datetime__gt=start
+    ).exclude(reason__startswith="Reserva de")
+    return reservations, blackouts
+
+
+def conflicts(room, start, end, exclude_reservation=None):
+    """(kind, pk, start, end) rows overlapping ``[start, end)`` in ``room``, reservations first.
+
+    Covers the room's reservations and its own and global blackouts in one
+    UNION ALL query. Mirror blackouts ("Reserva de ...") are left out, because
+    the reservation they copy is already a row.
+    """
+    reservations, blackouts = _overlapping([room], start, end, exclude_reservation)
+    return reservations.annotate(kind=Value(RESERVATION, output_field=CharField())).values_list(
+        "kind", "pk", "start_at", "end_at"
+    ).union(
+        blackouts.annotate(kind=Value(BLACKOUT, output_field=CharField())).values_list(
+            "kind", "pk", "start_datetime", "end_datetime"
+        ),
+        all=True,
+    ).order_by("-kind")
+
+
+def busy(rooms, start, end, exclude_reservation=None):
+    """(room_id, start, end) of everything occupying ``rooms`` within ``[start, end)``, in one query.
+
+    Global blackouts come with room_id None: they occupy every room.
+    """
+    reservations, blackouts = _overlapping(rooms, start, end, exclude_reservation)
+    return reservations.values_list("room_id", "start_at", "end_at").union(
+        blackouts.values_list("room_id", "start_datetime", "end_datetime"), all=True
+    )
+
+
+def first_conflict(room, start, end, exclude_reservation=None):
+    """RESERVATION, BLACKOUT or None: what (if anything) occupies ``[start, end)`` in ``room``"""
+    row = next(iter(conflicts(room, start, end, exclude_reservation)[:1]), None)
+    return row[0] if row else None
@@ -0,0 +1,44 @@
+"""MySQL backend that reuses connections from a bounded per-process pool.
+
+Enable with ``ENGINE = "booking.db.backends.mysql_pool"`` and an optional
+``POOL`` dict in the database settings (``SIZE``, ``MAX_OVERFLOW``,
+``MAX_LIFETIME``, ``PRE_PING``, ``TIMEOUT``). Keep ``CONN_MAX_AGE = 0``:
+Django then "closes" after each request, which returns the socket to the pool.
+"""
+from django.db.backends.mysql import base as mysql_base
+
+from booking.db.pool import ConnectionPool, get_pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    def _pool(self, conn_params):
+        options = self.settings_dict.get("POOL", {})
+
+        def factory():
+            return ConnectionPool(
+                connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+                ping=lambda conn: conn.ping(),
+                size=options.get("SIZE", 5),
+                max_overflow=options.get("MAX_OVERFLOW", 5),
+                max_lifetime=options.get("MAX_LIFETIME", 1800),
+                pre_ping=options.get("PRE_PING", True),
+                timeout=options.get("TIMEOUT", 10),
+            )
+
+        return get_pool(self.alias, factory)
+
+    def get_new_connection(self, conn_params):
+        return self._pool(conn_params).acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self._pool(self.get_connection_params())
+        discard = False
+        try:
+            # Never hand a connection with an open transaction to the next request
+            if not self.autocommit or self.in_atomic_block:
+                self.connection.rollback()
+        except Exception:
+            discard = True
+        pool.release(self.connection, discard=discard)
@@ -0,0 +1,141 @@
+"""Bounded per-process connection pool used by the ``mysql_pool`` backend.
+
+The pool is backend agnostic: it receives ``connect``/``ping``/``close``
+callables, so the MySQL specifics live in ``backends/mysql_pool/base.py``.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, ping=None, close=None, size=5, max_overflow=5,
+                 max_lifetime=1800, pre_ping=True, timeout=10):
+        self._connect = connect
+        self._ping = ping
+        self._close = close or (lambda conn: conn.close())
+        self.size = size
+        self.max_overflow = max_overflow
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._idle = deque()  # (conn, created_at); LIFO keeps a warm working set
+        self._born = {}       # id(conn) -> created_at, for connections in use
+        self._pending = 0     # connections being opened outside the lock
+        self._cond = threading.Condition()
+        self._stats = {"created": 0, "reused": 0, "discarded": 0, "waits": 0, "timeouts": 0}
+
+    @property
+    def total(self):
+        return len(self._idle) + len(self._born) + self._pending
+
+    def _expired(self, created_at):
+        return self.max_lifetime and time.monotonic() - created_at > self.max_lifetime
+
+    def _discard(self, conn):
+        self._stats["discarded"] += 1
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = self._checkout(deadline)
+            if conn is None:
+                break  # a slot was reserved for a new connection
+            if not (self.pre_ping and self._ping):
+                return conn
+            try:
+                self._ping(conn)  # outside the lock: a dead server must not block other threads
+                return conn
+            except Exception:
+                self.release(conn, discard=True)
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._pending -= 1
+            self._born[id(conn)] = time.monotonic()
+            self._stats["created"] += 1
+        return conn
+
+    def _checkout(self, deadline):
+        """Take an idle connection, or reserve a slot and return None."""
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn, created_at = self._idle.pop()
+                    if self._expired(created_at):
+                        self._discard(conn)
+                        continue
+                    self._born[id(conn)] = created_at
+                    self._stats["reused"] += 1
+                    return conn
+                if self.total < self.size + self.max_overflow:
+                    self._pending += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No hay conexiones libres (límite {self.size + self.max_overflow})")
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+    def release(self, conn, discard=False):
+        with self._cond:
+            created_at = self._born.pop(id(conn), None)
+            if discard or created_at is None or self._expired(created_at) or len(self._idle) >= self.size:
+                # Overflow connections are closed instead of being kept idle
+                self._discard(conn)
+            else:
+                self._idle.append((conn, created_at))
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                size=self.size,
+                max_overflow=self.max_overflow,
+                idle=len(self._idle),
+                in_use=len(self._born),
+            )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory):
+    """Pool for ``alias`` in this process; forked workers never reuse the parent's sockets."""
+    key = (alias, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                for stale in [k for k in _pools if k[0] == alias and k[1] != os.getpid()]:
+                    del _pools[stale]
+                pool = _pools[key] = factory()
+    return pool
+
+
+def all_stats():
+    pid = os.getpid()
+    return {alias: pool.stats() for (alias, p), pool in list(_pools.items()) if p == pid}
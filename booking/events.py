@@ -0,0 +1,159 @@
+"""Broadcast hub for availability change events (reservas y bloqueos).
+
+Events are published after commit by ``booking.signals`` and consumed by the
+SSE endpoint in ``booking.views.events_stream``. Two backends:
+
+* ``memory``: in-process ring buffer, enough for runserver or a single worker.
+* ``file``: append-only JSON lines file shared by every worker on the host,
+  renamed to ``<file>.1`` once it grows past ``BOOKING_EVENTS_MAX_BYTES``.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+RING_SIZE = 500
+MAX_FILE_BYTES = 10 * 1024 * 1024
+
+
+def _matches(event, room_id):
+    # Global events (room=None) are relevant for every room
+    return room_id is None or event.get("room") is None or event.get("room") == room_id
+
+
+class MemoryEventHub:
+    def __init__(self, size=RING_SIZE):
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event):
+        with self._cond:
+            self._seq += 1
+            event = dict(event, id=self._seq)
+            self._events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def last_id(self):
+        return self._seq
+
+    def read(self, after, room_id=None, timeout=None):
+        """Return ``(cursor, events)`` newer than ``after``, waiting up to ``timeout`` seconds."""
+        with self._cond:
+            if after > self._seq:
+                after = 0  # an id from before a restart: the counter started over
+            if self._seq <= after and timeout:
+                self._cond.wait(timeout)
+            events = [e for e in self._events if e["id"] > after and _matches(e, room_id)]
+            return self._seq, events
+
+
+class FileEventHub:
+    """Events are JSON lines; the id of an event is the byte offset after its line.
+
+    Past ``max_bytes`` the writer renames the file to ``<path>.1`` (replacing the
+    previous one) and the next event starts a new file. Readers whose cursor is
+    beyond the new file's end start over from its beginning.
+    """
+
+    def __init__(self, path, poll_interval=0.5, max_bytes=MAX_FILE_BYTES):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def publish(self, event):
+        line = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        # O_APPEND keeps concurrent writers from interleaving whole lines
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            offset = os.lseek(fd, 0, os.SEEK_CUR)
+            if self.max_bytes and offset >= self.max_bytes:
+                self._rotate(fd)
+        finally:
+            os.close(fd)
+        return dict(event, id=offset)
+
+    def _rotate(self, fd):
+        try:
+            # Another worker may have rotated already: only rename the file this fd wrote to
+            if os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass
+
+    def last_id(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, after, room_id=None, timeout=None):
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            if after < 0 or self.last_id() < after:
+                after = 0  # file was truncated/rotated
+            events = []
+            try:
+                with open(self.path, "rb") as fh:
+                    fh.seek(max(after - 1, 0))
+                    if after and fh.read(1) != b"\n":
+                        # Not a line boundary (a forged Last-Event-ID, or an offset into
+                        # the file before a rotation): resume at the next line
+                        skipped = fh.readline()
+                        if skipped.endswith(b"\n"):
+                            after += len(skipped)
+                    for line in fh:
+                        if not line.endswith(b"\n"):
+                            break  # partially written line, pick it up next time
+                        after += len(line)
+                        event = json.loads(line)
+                        event["id"] = after
+                        if _matches(event, room_id):
+                            events.append(event)
+            except FileNotFoundError:
+                pass
+            if events or time.monotonic() >= deadline:
+                return after, events
+            time.sleep(self.poll_interval)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                backend = getattr(settings, "BOOKING_EVENTS_BACKEND", "memory")
+                if backend == "file":
+                    _hub = FileEventHub(
+                        settings.BOOKING_EVENTS_FILE,
+                        poll_interval=getattr(settings, "BOOKING_EVENTS_POLL_INTERVAL", 0.5),
+                        max_bytes=getattr(settings, "BOOKING_EVENTS_MAX_BYTES", MAX_FILE_BYTES),
+                    )
+                else:
+                    _hub = MemoryEventHub()
+    return _hub
+
+
+def reset_hub():
+    """Drop the cached hub (tests / settings changes)."""
+    global _hub
+    _hub = None
+
+
+def publish(event_type, room_id, **data):
+    return get_hub().publish(dict(data, type=event_type, room=room_id))
+
+
+def format_sse(event):
+    payload = json.dumps(event, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
@@ -0,0 +1,41 @@
+"""Report export renderers, imported on first use.
+
+Each renderer module exposes ``content_type``, ``extension`` and
+``render(dataset, stream)``. Only its path is registered here, so reportlab
+and openpyxl are loaded by the first export of a worker instead of at
+startup. More formats can be added with the ``EXPORT_RENDERERS`` setting
+(format -> module path).
+"""
+from dataclasses import dataclass, field
+from datetime import date
+from importlib import import_module
+
+from django.conf import settings
+
+RENDERERS = {
+    "pdf": "booking.exports.pdf",
+    "xlsx": "booking.exports.xlsx",
+    "csv": "booking.exports.csvfile",
+}
+
+
+@dataclass
+class ReportDataset:
+    start: date
+    end: date
+    total_reservations: int
+    room_stats: list = field(default_factory=list)  # [{"room__code", "reservation_count"}]
+    material_stats: list = field(default_factory=list)  # [{"material__name", "total_quantity"}]
+
+    @property
+    def period(self):
+        return f"{self.start.strftime('%d/%m/%Y')} - {self.end.strftime('%d/%m/%Y')}"
+
+
+def formats():
+    return {**RENDERERS, **getattr(settings, "EXPORT_RENDERERS", {})}
+
+
+def get_renderer(fmt):
+    """The renderer module for ``fmt`` (imported now if needed); KeyError if unknown."""
+    return import_module(formats()[fmt])
@@ -0,0 +1,23 @@
+import csv
+import io
+
+content_type = "text/csv; charset=utf-8"
+extension = "csv"
+
+
+def render(dataset, stream):
+    # utf-8-sig: Excel detects the encoding from the BOM
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text, delimiter=";")  # ";" is what Excel expects with a Spanish locale
+    writer.writerow(["Período", dataset.period])
+    writer.writerow(["Total de reservas", dataset.total_reservations])
+    writer.writerow([])
+    writer.writerow(["Código de Salón", "Cantidad de Reservas"])
+    for stat in dataset.room_stats:
+        writer.writerow([f"Salón {stat['room__code']}", stat['reservation_count']])
+    writer.writerow([])
+    writer.writerow(["Material", "Cantidad Total Solicitada"])
+    for stat in dataset.material_stats:
+        writer.writerow([stat['material__name'], stat['total_quantity']])
+    text.flush()
+    text.detach()  # leave the caller's stream open
@@ -0,0 +1,73 @@
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+content_type = "application/pdf"
+extension = "pdf"
+
+
+def _table(data, header_size):
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    return table
+
+
+def render(dataset, stream):
+    doc = SimpleDocTemplate(stream, pagesize=A4)
+    elements = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+
+    elements.append(Paragraph("Reporte de Biblioteca", title_style))
+    elements.append(Paragraph(f"Período: {dataset.period}", styles['Normal']))
+    elements.append(Spacer(1, 20))
+
+    # Summary stats
+    elements.append(_table([
+        ['Métrica', 'Valor'],
+        ['Total de reservas', str(dataset.total_reservations)],
+        ['Salones utilizados', str(len(dataset.room_stats))],
+        ['Tipos de materiales', str(len(dataset.material_stats))]
+    ], 14))
+    elements.append(Spacer(1, 30))
+
+    # Room statistics
+    elements.append(Paragraph("Reservas por Salón", styles['Heading2']))
+    elements.append(Spacer(1, 12))
+    if dataset.room_stats:
+        elements.append(_table([['Código de Salón', 'Cantidad de Reservas']] + [
+            [f"Salón {stat['room__code']}", str(stat['reservation_count'])] for stat in dataset.room_stats
+        ], 12))
+    else:
+        elements.append(Paragraph("No hay datos de reservas para el período seleccionado.", styles['Normal']))
+    elements.append(Spacer(1, 30))
+
+    # Material statistics
+    elements.append(Paragraph("Materiales Solicitados", styles['Heading2']))
+    elements.append(Spacer(1, 12))
+    if dataset.material_stats:
+        elements.append(_table([['Material', 'Cantidad Total Solicitada']] + [
+            [stat['material__name'], str(stat['total_quantity'])] for stat in dataset.material_stats
+        ], 12))
+    else:
+        elements.append(Paragraph("No hay datos de materiales para el período seleccionado.", styles['Normal']))
+
+    doc.build(elements)
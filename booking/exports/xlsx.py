@@ -0,0 +1,55 @@
+from openpyxl import Workbook
+from openpyxl.styles import Font, Alignment, PatternFill
+
+content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+extension = "xlsx"
+
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
+
+def _header(cells):
+    for cell in cells:
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+
+
+def _stats_sheet(wb, title, headers, rows, widths):
+    ws = wb.create_sheet(title)
+    ws.append(headers)
+    _header(ws[1])
+    for row in rows:
+        ws.append(row)
+    ws.column_dimensions['A'].width, ws.column_dimensions['B'].width = widths
+
+
+def render(dataset, stream):
+    wb = Workbook()
+    wb.remove(wb.active)
+
+    summary_ws = wb.create_sheet("Resumen")
+    summary_ws['A1'] = "Reporte de Biblioteca"
+    summary_ws['A1'].font = Font(bold=True, size=16)
+    summary_ws.merge_cells('A1:C1')
+    summary_ws['A3'] = f"Período: {dataset.period}"
+    summary_ws.merge_cells('A3:C3')
+    summary_ws['A5'] = "Métrica"
+    summary_ws['B5'] = "Valor"
+    _header((summary_ws['A5'], summary_ws['B5']))
+    summary_ws['A6'] = "Total de reservas"
+    summary_ws['B6'] = dataset.total_reservations
+    summary_ws['A7'] = "Salones utilizados"
+    summary_ws['B7'] = len(dataset.room_stats)
+    summary_ws['A8'] = "Tipos de materiales"
+    summary_ws['B8'] = len(dataset.material_stats)
+    summary_ws.column_dimensions['A'].width = 20
+    summary_ws.column_dimensions['B'].width = 15
+
+    _stats_sheet(wb, "Reservas por Salón", ["Código de Salón", "Cantidad de Reservas"],
+                 ([f"Salón {s['room__code']}", s['reservation_count']] for s in dataset.room_stats), (20, 25))
+    _stats_sheet(wb, "Materiales Solicitados", ["Material", "Cantidad Total Solicitada"],
+                 ([s['material__name'], s['total_quantity']] for s in dataset.material_stats), (30, 25))
+
+    wb.save(stream)
@@ -47,6 +47,8 @@ class BlackoutForm(forms.ModelForm):
         if start_datetime:
             # Add the calculated end datetime to cleaned data
             cleaned['end_datetime'] = getattr(self, 'calculated_end_datetime', None)
+            # end_datetime is not a form field, so save() would not copy it
+            self.instance.end_datetime = cleaned['end_datetime']
         
         return cleaned
 
@@ -147,3 +149,18 @@ class AdminUserCreationForm(forms.ModelForm):
             if groups:
                 user.groups.set(groups)
         return user
+
+
+class UserImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label="Archivo CSV",
+        help_text="Columnas: username, email, first_name, last_name y opcionalmente password (separadas por ; o ,)",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv,text/csv"})
+    )
+    dry_run = forms.BooleanField(required=False, label="Solo validar (no crear usuarios)")
+
+    def clean_csv_file(self):
+        try:
+            return self.cleaned_data["csv_file"].read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise forms.ValidationError("El archivo debe estar codificado en UTF-8.")
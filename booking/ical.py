@@ -0,0 +1,119 @@
+"""iCalendar (RFC 5545) feeds for rooms and users.
+
+Feeds cover a bounded window around today and are generated by iterating
+``values_list`` cursors, so no model instances are built for the rows.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Reservation, Blackout
+
+PRODID = "-//Salones CRA//Reservas//ES"
+TOKEN_SALT = "booking.ical"
+CHUNK_SIZE = 500
+
+
+def feed_window(today=None):
+    today = today or timezone.localdate()
+    past = getattr(settings, "ICAL_PAST_DAYS", 30)
+    future = getattr(settings, "ICAL_FUTURE_DAYS", 180)
+    return today - timedelta(days=past), today + timedelta(days=future)
+
+
+def user_token(user):
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def user_id_from_token(token):
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _utc(dt):
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+                .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line):
+    # Content lines are limited to 75 octets; continuation lines start with a space
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line + "\r\n"
+    parts, current = [], b""
+    for ch in line:
+        b = ch.encode("utf-8")
+        if len(current) + len(b) > (75 if not parts else 74):
+            parts.append(current.decode("utf-8"))
+            current = b""
+        current += b
+    parts.append(current.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _event(uid, start, end, summary, stamp):
+    yield "BEGIN:VEVENT\r\n"
+    yield _fold(f"UID:{uid}")
+    yield f"DTSTAMP:{stamp}\r\n"
+    yield f"DTSTART:{_utc(start)}\r\n"
+    yield f"DTEND:{_utc(end)}\r\n"
+    yield _fold(f"SUMMARY:{_escape(summary)}")
+    yield "END:VEVENT\r\n"
+
+
+def _reservation_events(qs, stamp):
+    rows = qs.values_list("id", "room__code", "start_at", "end_at")
+    for pk, code, start, end in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield from _event(f"reserva-{pk}@salones-cra", start, end, f"Reserva salón {code}", stamp)
+
+
+def _blackout_events(qs, stamp):
+    rows = qs.values_list("id", "room__code", "start_datetime", "end_datetime", "reason")
+    for pk, code, start, end, reason in rows.iterator(chunk_size=CHUNK_SIZE):
+        scope = f"salón {code}" if code else "todos los salones"
+        yield from _event(f"bloqueo-{pk}@salones-cra", start, end, f"Bloqueo {scope}: {reason}", stamp)
+
+
+def _calendar(name, *components):
+    yield "BEGIN:VCALENDAR\r\n"
+    yield "VERSION:2.0\r\n"
+    yield f"PRODID:{PRODID}\r\n"
+    yield "CALSCALE:GREGORIAN\r\n"
+    yield _fold(f"X-WR-CALNAME:{_escape(name)}")
+    for component in components:
+        yield from component
+    yield "END:VCALENDAR\r\n"
+
+
+def room_feed(room, window):
+    start, end = window
+    stamp = _utc(timezone.now())
+    reservations = Reservation.objects.filter(room=room, date__gte=start, date__lte=end).order_by("date", "start_time")
+    blackouts = Blackout.objects.filter(
+        Q(room=room) | Q(room__isnull=True),
+        start_datetime__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time())),
+        end_datetime__gt=timezone.make_aware(datetime.combine(start, datetime.min.time())),
+    ).exclude(reason__startswith="Reserva de").order_by("start_datetime")
+    return _calendar(
+        f"Salón {room.code}",
+        _reservation_events(reservations, stamp),
+        _blackout_events(blackouts, stamp),
+    )
+
+
+def user_feed(user, window):
+    start, end = window
+    stamp = _utc(timezone.now())
+    reservations = Reservation.objects.filter(user=user, date__gte=start, date__lte=end).order_by("date", "start_time")
+    return _calendar(f"Mis reservas ({user.username})", _reservation_events(reservations, stamp))
@@ -0,0 +1,194 @@
+"""Synthetic data for benchmarks and load tests.
+
+``generate`` is deterministic for a given seed and writes with chunked
+``bulk_create``; it is used by ``manage.py generate_load_data`` and
+``manage.py benchmark``.
+"""
+import random
+from datetime import datetime, date, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import versioning
+from .models import Room, Material, RoomInventory, Reservation, ReservationItem, Blackout
+
+CHUNK_SIZE = 2000
+
+# Room.code is a single character: A-Z, then a-z, then digits
+ROOM_CODES = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+MAX_ROOMS = len(ROOM_CODES)
+
+# Relative demand Mon..Fri and per start hour 08..17 (mid-morning and early afternoon peaks)
+WEEKDAY_WEIGHTS = [1.0, 1.1, 1.15, 1.1, 0.75]
+HOUR_WEIGHTS = {8: 0.6, 9: 1.0, 10: 1.3, 11: 1.2, 12: 0.6, 13: 0.7, 14: 1.1, 15: 1.0, 16: 0.6, 17: 0.3}
+TWO_HOUR_RATIO = 0.2
+ITEMS_RATIO = 0.4
+
+
+def bulk_create(model, objs, batch_size=CHUNK_SIZE):
+    """bulk_create that always leaves primary keys set.
+
+    MySQL does not return ids from bulk inserts, so they are assigned up front.
+    """
+    if not connection.features.can_return_rows_from_bulk_insert:
+        next_id = (model.objects.aggregate(m=Max("pk"))["m"] or 0) + 1
+        for offset, obj in enumerate(objs):
+            obj.pk = next_id + offset
+    return model.objects.bulk_create(objs, batch_size=batch_size)
+
+
+def _holidays(start, end):
+    try:
+        import holidays
+    except ImportError:
+        return {}
+    return dict(holidays.country_holidays("CL", years=range(start.year, end.year + 1)))
+
+
+def _quotas(rnd, cells, total):
+    """Split ``total`` over weighted cells (largest remainder, random tie-break)."""
+    weight_sum = sum(w for _, w in cells) or 1
+    exact = [(cell, total * w / weight_sum) for cell, w in cells]
+    quotas = {cell: int(x) for cell, x in exact}
+    remainder = total - sum(quotas.values())
+    by_fraction = sorted(exact, key=lambda cx: (cx[1] - int(cx[1]), rnd.random()), reverse=True)
+    for cell, _ in by_fraction[:remainder]:
+        quotas[cell] += 1
+    return quotas
+
+
+def _day_schedule(rnd, count, busy=()):
+    """Pick up to ``count`` non-overlapping (start_hour, hours) slots in 08:00-18:00."""
+    free = set(HOUR_WEIGHTS) - set(busy)
+    slots = []
+    while len(slots) < count and free:
+        candidates = sorted(free)
+        start = rnd.choices(candidates, [HOUR_WEIGHTS[h] for h in candidates])[0]
+        length = 2 if rnd.random() < TWO_HOUR_RATIO and start + 1 in free else 1
+        free.difference_update(range(start, start + length))
+        slots.append((start, length))
+    return slots
+
+
+def generate(rooms=3, materials=5, users=20, reservations=1000, seed=1, start=None, days=365,
+             blackouts=0, mirror_blackouts=True, prefix="docente", password="docente123", log=None):
+    """Create a synthetic dataset and return a summary dict.
+
+    Reservations never overlap within a room, skip weekends and Chilean
+    holidays (created as global blackouts) and follow WEEKDAY_WEIGHTS /
+    HOUR_WEIGHTS. All synthetic users share one password hash, computed once.
+    """
+    if rooms > MAX_ROOMS:
+        raise ValueError(f"Room.code admite como máximo {MAX_ROOMS} salones")
+    log = log or (lambda msg: None)
+    rnd = random.Random(seed)
+    start = start or date.today() - timedelta(days=days - 60)
+    end = start + timedelta(days=days - 1)
+    tz = timezone.get_current_timezone()
+
+    existing = {r.code: r for r in Room.objects.filter(code__in=ROOM_CODES[:rooms])}
+    room_objs = list(existing.values()) + bulk_create(
+        Room, [Room(code=c) for c in ROOM_CODES[:rooms] if c not in existing]
+    )
+    room_objs.sort(key=lambda r: ROOM_CODES.index(r.code))
+
+    material_objs = bulk_create(Material, [Material(name=f"{prefix}-material-{i}") for i in range(materials)])
+    bulk_create(RoomInventory, [
+        RoomInventory(room=r, material=m, quantity=rnd.randint(5, 30)) for r in room_objs for m in material_objs
+    ])
+
+    # Hash once: PBKDF2 per user would dominate the run for thousands of users
+    password_hash = make_password(password)
+    user_objs = bulk_create(User, [
+        User(username=f"{prefix}{i}", email=f"{prefix}{i}@colegio.cl", password=password_hash)
+        for i in range(users)
+    ])
+    docente, _ = Group.objects.get_or_create(name="Docente")
+    Membership = User.groups.through
+    bulk_create(Membership, [Membership(user_id=u.pk, group_id=docente.pk) for u in user_objs])
+    log(f"{len(room_objs)} salones, {len(material_objs)} materiales, {len(user_objs)} usuarios")
+
+    holidays = _holidays(start, end)
+    blackout_objs = [
+        Blackout(room=None, reason=f"Feriado: {name}",
+                 start_datetime=timezone.make_aware(datetime.combine(day, time(0, 0)), tz),
+                 end_datetime=timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz))
+        for day, name in sorted(holidays.items()) if start <= day <= end
+    ]
+    workdays = [
+        day for day in (start + timedelta(days=d) for d in range(days))
+        if day.weekday() < 5 and day not in holidays
+    ]
+    # ``blackouts`` room-specific blackouts in total: 45-minute meetings in random rooms and workdays
+    busy = {}
+    for _ in range(blackouts if workdays else 0):
+        day, room = rnd.choice(workdays), rnd.choice(room_objs)
+        begin = datetime.combine(day, time(rnd.randint(8, 17), rnd.choice((0, 15, 30))))
+        finish = begin + timedelta(minutes=45)
+        busy.setdefault((day, room.pk), set()).update(range(begin.hour, (finish - timedelta(minutes=1)).hour + 1))
+        blackout_objs.append(Blackout(room=room, reason="Reunión (sintético)",
+                                      start_datetime=timezone.make_aware(begin, tz),
+                                      end_datetime=timezone.make_aware(finish, tz)))
+    bulk_create(Blackout, blackout_objs)
+
+    cells = [((day, room), WEEKDAY_WEIGHTS[day.weekday()]) for day in workdays for room in room_objs]
+    quotas = _quotas(rnd, cells, reservations)
+    capacity = len(cells) * len(HOUR_WEIGHTS)
+    if reservations > capacity * 0.7:
+        log(f"Aviso: {reservations} reservas para {capacity} horas disponibles; aumenta --days o --rooms")
+
+    created = items = mirrors = 0
+    pending = []
+
+    def flush():
+        nonlocal created, items, mirrors
+        with transaction.atomic():
+            for r, _ in pending:
+                r.sync_range()  # bulk_create skips save()
+            batch = bulk_create(Reservation, [r for r, _ in pending])
+            item_objs = []
+            for r in batch:
+                if rnd.random() < ITEMS_RATIO:
+                    for m in rnd.sample(material_objs, min(len(material_objs), rnd.randint(1, 2))):
+                        item_objs.append(ReservationItem(reservation=r, material=m, quantity=rnd.randint(1, 3)))
+            bulk_create(ReservationItem, item_objs)
+            if mirror_blackouts:
+                # Same shape as the blackout reservation_create writes for each booking
+                bulk_create(Blackout, [
+                    Blackout(room_id=r.room_id, created_by_id=r.user_id, reason=f"Reserva de {username}",
+                             start_datetime=r.start_at, end_datetime=r.end_at)
+                    for r, username in pending
+                ])
+                mirrors += len(pending)
+        created += len(batch)
+        items += len(item_objs)
+        pending.clear()
+        log(f"  {created} reservas")
+
+    for (day, room), count in quotas.items():
+        if not count:
+            continue
+        for hour, length in _day_schedule(rnd, count, busy.get((day, room.pk), ())):
+            user = rnd.choice(user_objs)
+            created_at = timezone.make_aware(datetime.combine(day - timedelta(days=rnd.randint(1, 14)), time(12)), tz)
+            pending.append((Reservation(room=room, user=user, date=day, start_time=time(hour),
+                                        end_time=time(hour + length), created_at=created_at), user.username))
+            if len(pending) >= CHUNK_SIZE:
+                flush()
+    if pending:
+        flush()
+    # bulk_create sends no signals
+    versioning.models_changed(Room, Material, RoomInventory, Reservation, ReservationItem, Blackout)
+
+    return {"rooms": len(room_objs), "materials": len(material_objs), "users": len(user_objs),
+            "reservations": created, "items": items, "blackouts": len(blackout_objs),
+            "mirror_blackouts": mirrors, "start": start, "end": end}
+
+
+def build_dataset(rooms=3, materials=5, users=20, reservations=1000, seed=1, days=365):
+    """Benchmark dataset: mostly past reservations plus two months ahead."""
+    return generate(rooms=rooms, materials=materials, users=users, reservations=reservations, seed=seed, days=days)
@@ -0,0 +1,46 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from booking import archive
+
+
+class Command(BaseCommand):
+    help = ("Mueve las reservas antiguas (con sus ítems) a las tablas de archivo por lotes y elimina sus "
+            "bloqueos 'Reserva de ...'; los reportes siguen incluyéndolas")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.RESERVATION_ARCHIVE_DAYS,
+                            help="Archivar reservas con más de estos días de antigüedad (RESERVATION_ARCHIVE_DAYS)")
+        parser.add_argument("--before", help="Archivar reservas anteriores a esta fecha YYYY-MM-DD (en lugar de --days)")
+        parser.add_argument("--batch-size", type=int, default=archive.BATCH_SIZE, help="Reservas por transacción")
+
+    def handle(self, *args, **opts):
+        if opts["before"]:
+            try:
+                cutoff = datetime.strptime(opts["before"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--before debe tener formato YYYY-MM-DD")
+        else:
+            cutoff = date.today() - timedelta(days=opts["days"])
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size debe ser mayor que 0")
+        started = time.perf_counter()
+        moved = mirrors = 0
+        while True:
+            batch = archive.archive_batch(cutoff, opts["batch_size"])
+            if not batch:
+                break
+            moved += batch
+            self.stdout.write(f"  {moved} reservas archivadas")
+        while True:
+            batch = archive.delete_mirrors(cutoff, opts["batch_size"])
+            if not batch:
+                break
+            mirrors += batch
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} reservas anteriores al {cutoff:%d/%m/%Y} archivadas y {mirrors} bloqueos de reservas "
+            f"eliminados en {elapsed:.1f}s"))
@@ -0,0 +1,158 @@
+import json
+import platform
+import statistics
+import time as _time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from booking import loadgen
+from booking.models import Room, Reservation
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[k]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark de endpoints (reservas, listados, reportes, exportaciones) sobre una base de prueba "
+            "con datos sintéticos: latencia p50/p95/p99, consultas SQL y memoria pico por escenario")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=3)
+        parser.add_argument("--materials", type=int, default=5)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--reservations", type=int, default=2000)
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--only", nargs="*", help="Escenarios a ejecutar (por defecto todos)")
+        parser.add_argument("--output", help="Archivo JSON con los resultados")
+        parser.add_argument("--keepdb", action="store_true", help="Reutilizar la base de prueba")
+
+    def handle(self, *args, **opts):
+        # Always a throw-away test database: never benchmark against real data
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, keepdb=opts["keepdb"], interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            results = self._run(opts)
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        for name, r in results["scenarios"].items():
+            self.stdout.write(
+                f"{name:<22} n={r['n']:<4} p50={r['p50_ms']:>8.1f}ms p95={r['p95_ms']:>8.1f}ms "
+                f"p99={r['p99_ms']:>8.1f}ms queries={r['queries']:<4} peak={r['peak_kb']:>8.0f}KiB"
+            )
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2, default=str)
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {opts['output']}"))
+
+    def _run(self, opts):
+        self.stdout.write("Generando datos...")
+        started = _time.perf_counter()
+        dataset = loadgen.build_dataset(
+            rooms=opts["rooms"], materials=opts["materials"], users=opts["users"],
+            reservations=opts["reservations"], seed=opts["seed"],
+        )
+        dataset["seconds"] = round(_time.perf_counter() - started, 2)
+
+        admin = User.objects.create_user("bench-admin", "bench-admin@colegio.cl", is_staff=True)
+        teacher = User.objects.filter(username="docente0").first()
+        admin_client, teacher_client = Client(), Client()
+        admin_client.force_login(admin)
+        teacher_client.force_login(teacher)
+
+        room = Room.objects.order_by("code").first()
+        period = {"start_date": dataset["start"].isoformat(), "end_date": dataset["end"].isoformat()}
+        taken = Reservation.objects.filter(room=room).order_by("date").first()
+        free_slots = self._free_slots(dataset["end"] + timedelta(days=7))
+
+        def create_booking():
+            day, hour = next(free_slots)
+            return teacher_client.post("/reservas/nueva/", {
+                "room": room.pk, "date": day.isoformat(), "start_time": f"{hour:02d}:00", "end_time": f"{hour + 1:02d}:00",
+            })
+
+        def conflicting_booking():
+            return teacher_client.post("/reservas/nueva/", {
+                "room": room.pk, "date": taken.date.isoformat(),
+                "start_time": taken.start_time.strftime("%H:%M"), "end_time": taken.end_time.strftime("%H:%M"),
+            })
+
+        scenarios = {
+            "booking_create": create_booking,
+            "booking_conflict": conflicting_booking,
+            "reservation_list": lambda: admin_client.get("/reservas/"),
+            "api_reservation_list": lambda: admin_client.get("/api/reservations/"),
+            "reports_dashboard": lambda: admin_client.get("/reportes/", period),
+            "export_pdf": lambda: admin_client.get("/reportes/exportar/pdf/", period),
+            "export_excel": lambda: admin_client.get("/reportes/exportar/excel/", period),
+        }
+        if opts["only"]:
+            scenarios = {k: v for k, v in scenarios.items() if k in opts["only"]}
+
+        results = {}
+        for name, call in scenarios.items():
+            self.stdout.write(f"  {name}...")
+            results[name] = self._measure(call, opts["iterations"])
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "django": django.get_version(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "iterations": opts["iterations"],
+                "dataset": dataset,
+            },
+            "scenarios": results,
+        }
+
+    @staticmethod
+    def _free_slots(first_day):
+        day = first_day
+        while True:
+            if day.weekday() < 5:
+                for hour in range(8, 18):
+                    yield day, hour
+            day += timedelta(days=1)
+
+    @staticmethod
+    def _measure(call, iterations):
+        call()  # warm-up: template compilation, lazy imports
+        timings, queries, statuses = [], [], set()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = _time.perf_counter()
+                response = call()
+                timings.append((_time.perf_counter() - t0) * 1000)
+            queries.append(len(ctx.captured_queries))
+            statuses.add(response.status_code)
+        # Memory is measured in a separate call so tracing does not distort timings
+        tracemalloc.start()
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            "n": iterations,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "queries": int(statistics.median(queries)),
+            "queries_max": max(queries),
+            "peak_kb": round(peak / 1024, 1),
+            "status": sorted(statuses),
+        }
@@ -0,0 +1,49 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from booking import loadgen
+
+class Command(BaseCommand):
+    help = ("Genera datos sintéticos para pruebas de carga: salones, materiales con inventario, docentes, "
+            "reservas con distribución realista por día/hora, ítems y bloqueos (determinista según --seed)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=10, help=f"Máximo {loadgen.MAX_ROOMS} (Room.code es de 1 carácter)")
+        parser.add_argument("--materials", type=int, default=8)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--reservations", type=int, default=10000)
+        parser.add_argument("--days", type=int, default=365, help="Días cubiertos desde --start")
+        parser.add_argument("--start", help="Fecha inicial YYYY-MM-DD (por defecto: hoy - días + 60)")
+        parser.add_argument("--blackouts", type=int, default=100, help="Total de bloqueos de un salón (reuniones de 45 min, salón y día al azar) a crear")
+        parser.add_argument("--no-mirror-blackouts", action="store_true",
+                            help="No crear el bloqueo 'Reserva de ...' que acompaña a cada reserva")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--prefix", default="docente", help="Prefijo de usuarios y materiales")
+        parser.add_argument("--password", default="docente123", help="Contraseña común de los docentes sintéticos")
+
+    def handle(self, *args, **opts):
+        start = None
+        if opts["start"]:
+            try:
+                start = datetime.strptime(opts["start"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--start debe tener formato YYYY-MM-DD")
+        self.stdout.write(f"Base de datos: {connection.settings_dict['NAME']} ({connection.vendor})")
+        started = time.perf_counter()
+        try:
+            summary = loadgen.generate(
+                rooms=opts["rooms"], materials=opts["materials"], users=opts["users"],
+                reservations=opts["reservations"], seed=opts["seed"], start=start, days=opts["days"],
+                blackouts=opts["blackouts"], mirror_blackouts=not opts["no_mirror_blackouts"],
+                prefix=opts["prefix"], password=opts["password"], log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Datos generados en {elapsed:.1f}s: {summary['reservations']} reservas, {summary['items']} ítems, "
+            f"{summary['blackouts']} bloqueos (+{summary['mirror_blackouts']} de reservas), "
+            f"{summary['users']} docentes, {summary['rooms']} salones ({summary['start']} a {summary['end']})"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from booking.api import schema
+
+class Command(BaseCommand):
+    help = "Genera el esquema OpenAPI (YAML/JSON + .gz) que sirve /api/schema/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=None, help="Directorio destino (por defecto OPENAPI_SCHEMA_DIR)")
+
+    def handle(self, *args, **opts):
+        for path in schema.generate(opts["dir"]):
+            self.stdout.write(f"  {path}")
+        self.stdout.write(self.style.SUCCESS("Esquema OpenAPI generado"))
@@ -0,0 +1,63 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: what a gunicorn worker does before its first request
+CHILD = r"""
+import json, os, resource, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns  # imports every view module
+if sys.argv[1] == "eager":
+    from booking import exports
+    for fmt in exports.formats():
+        exports.get_renderer(fmt)
+elapsed = time.perf_counter() - t0
+heavy = sorted(m for m in ("reportlab", "openpyxl") if m in sys.modules)
+print(json.dumps({"seconds": elapsed, "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "modules": len(sys.modules), "export_libs": heavy}))
+"""
+
+
+class Command(BaseCommand):
+    help = ("Mide el arranque de un worker (tiempo, memoria RSS máxima, módulos importados) con los "
+            "renderers de exportación cargados bajo demanda (lazy) y cargados al inicio (eager)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--output", help="Archivo JSON con los resultados")
+
+    def handle(self, *args, **opts):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "salones_cra.settings"))
+        results = {}
+        for mode in ("lazy", "eager"):
+            samples = []
+            for _ in range(opts["runs"]):
+                out = subprocess.run([sys.executable, "-c", CHILD, mode], env=env, check=True,
+                                     capture_output=True, text=True).stdout
+                samples.append(json.loads(out.strip().splitlines()[-1]))
+            results[mode] = {
+                "seconds": round(statistics.median(s["seconds"] for s in samples), 3),
+                "maxrss_kb": int(statistics.median(s["maxrss_kb"] for s in samples)),
+                "modules": samples[0]["modules"],
+                "export_libs": samples[0]["export_libs"],
+            }
+            r = results[mode]
+            self.stdout.write(f"{mode:<6} {r['seconds'] * 1000:>7.0f}ms  RSS {r['maxrss_kb'] / 1024:>6.1f}MiB  "
+                              f"{r['modules']} módulos  {', '.join(r['export_libs']) or '-'}")
+        lazy, eager = results["lazy"], results["eager"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Ahorro por worker: {(eager['seconds'] - lazy['seconds']) * 1000:.0f}ms, "
+            f"{(eager['maxrss_kb'] - lazy['maxrss_kb']) / 1024:.1f}MiB, {eager['modules'] - lazy['modules']} módulos"
+        ))
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2)
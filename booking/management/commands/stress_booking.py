@@ -0,0 +1,162 @@
+import multiprocessing
+import threading
+import time as _time
+from collections import Counter
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from booking import loadgen
+from booking.models import Room, Material, RoomInventory, Reservation, ReservationItem
+
+HOURS = list(range(8, 18))
+
+
+def _next_weekday(day):
+    while day.weekday() > 4:
+        day += timedelta(days=1)
+    return day
+
+
+def _attempt(path, user_id, room_id, material_id, day, hour, client_cache):
+    """One booking attempt; returns 'accepted', 'rejected' or 'error:<Exception>'."""
+    try:
+        client = client_cache.get(path)
+        if client is None:
+            user = User.objects.get(pk=user_id)
+            if path == "api":
+                client = APIClient()
+                client.force_authenticate(user)
+            else:
+                client = Client()
+                client.force_login(user)
+            client_cache[path] = client
+        slot = {"room": room_id, "date": day.isoformat(), "start_time": f"{hour:02d}:00", "end_time": f"{hour + 1:02d}:00"}
+        if path == "api":
+            slot["items"] = [{"material_id": material_id, "quantity": 1}]
+            response = client.post(reverse("reservation-list"), slot, format="json")
+            return "accepted" if response.status_code == 201 else "rejected"
+        slot[f"qty_{material_id}"] = 1
+        response = client.post(reverse("reservation_create"), slot)
+        # Success redirects to the index, every rejection back to the form
+        return "accepted" if response.status_code == 302 and response.url == reverse("index") else "rejected"
+    except Exception as e:
+        return f"error:{type(e).__name__}"
+
+
+def _worker(args):
+    """Runs a list of attempts in one thread/process with its own DB connection."""
+    paths, user_id, room_id, material_id, plan, barrier = args
+    if barrier is not None:
+        barrier.wait()  # threads start together to maximize contention
+    cache = {}
+    try:
+        return [_attempt(paths[i % len(paths)], user_id, room_id, material_id, day, hour, cache)
+                for i, (day, hour) in enumerate(plan)]
+    finally:
+        connections.close_all()
+
+
+def _process_worker(args):
+    return _worker(args + (None,))
+
+
+class Command(BaseCommand):
+    help = ("Prueba de concurrencia: muchos intentos simultáneos de reservar el mismo salón/horario y material. "
+            "Verifica que no haya reservas solapadas ni stock negativo y reporta reservas aceptadas por segundo")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["threads", "processes"], default="threads")
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--attempts", type=int, default=10, help="Intentos por worker")
+        parser.add_argument("--slots", type=int, default=4, help="Horarios distintos en disputa (mismo salón y día)")
+        parser.add_argument("--stock", type=int, default=3, help="Stock inicial del material en disputa")
+        parser.add_argument("--path", choices=["html", "api", "both"], default="both")
+        parser.add_argument("--keepdb", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["slots"] > len(HOURS):
+            raise CommandError(f"--slots máximo {len(HOURS)}")
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, keepdb=opts["keepdb"], interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            violations = self._run(opts)
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+        if violations:
+            raise CommandError("; ".join(violations))
+        self.stdout.write(self.style.SUCCESS("OK: sin reservas solapadas ni stock negativo"))
+
+    def _run(self, opts):
+        if opts["mode"] == "processes" and connections["default"].is_in_memory_db():
+            raise CommandError("--mode processes necesita una base de prueba en disco (MySQL o TEST NAME en SQLite)")
+        if connections["default"].vendor == "sqlite":
+            self.stdout.write(self.style.WARNING(
+                "SQLite serializa toda escritura: use MySQL para medir concurrencia real"))
+        loadgen.generate(rooms=1, materials=1, users=opts["workers"], reservations=0, days=1,
+                                   prefix="stress", mirror_blackouts=False)
+        room = Room.objects.get(code=loadgen.ROOM_CODES[0])
+        material = Material.objects.get(name="stress-material-0")
+        RoomInventory.objects.filter(room=room, material=material).update(quantity=opts["stock"])
+        day = _next_weekday(date.today() + timedelta(days=30))
+        user_ids = list(User.objects.filter(username__startswith="stress").order_by("pk").values_list("pk", flat=True))
+        paths = ["html", "api"] if opts["path"] == "both" else [opts["path"]]
+        # Every worker goes through the same slots: maximal contention
+        plan = [(day, HOURS[i % opts["slots"]]) for i in range(opts["attempts"])]
+
+        connections.close_all()  # children/threads open their own connections
+        started = _time.perf_counter()
+        if opts["mode"] == "threads":
+            barrier = threading.Barrier(len(user_ids))
+            results = [None] * len(user_ids)
+
+            def run(i, uid):
+                results[i] = _worker((paths, uid, room.pk, material.pk, plan, barrier))
+            threads = [threading.Thread(target=run, args=(i, uid)) for i, uid in enumerate(user_ids)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        else:
+            ctx = multiprocessing.get_context("fork")
+            with ctx.Pool(len(user_ids)) as pool:
+                results = pool.map(_process_worker, [(paths, uid, room.pk, material.pk, plan) for uid in user_ids])
+        elapsed = _time.perf_counter() - started
+
+        outcomes = Counter(r for batch in results for r in batch)
+        accepted = outcomes.get("accepted", 0)
+        self.stdout.write(
+            f"{opts['mode']}: {sum(outcomes.values())} intentos en {elapsed:.2f}s, "
+            f"{accepted} aceptadas ({accepted / elapsed:.1f}/s), {dict(outcomes)}"
+        )
+        errors = sum(n for r, n in outcomes.items() if r.startswith("error"))
+        return self._violations(room, material, opts["stock"], accepted, errors)
+
+    def _violations(self, room, material, initial_stock, accepted, errors):
+        problems = []
+        rows = list(Reservation.objects.filter(room=room).order_by("date", "start_time").values_list("date", "start_time", "end_time"))
+        for a, b in zip(rows, rows[1:]):
+            if a[0] == b[0] and b[1] < a[2]:
+                problems.append(f"reservas solapadas {a} / {b}")
+        # Errors (deadlocks, lock timeouts, 500s) are failures too, not lost attempts
+        if errors:
+            problems.append(f"{errors} intentos terminaron con error")
+        if len(rows) != accepted:
+            problems.append(f"{accepted} aceptadas pero {len(rows)} reservas en la base")
+        stock = RoomInventory.objects.get(room=room, material=material).quantity
+        used = ReservationItem.objects.filter(reservation__room=room, material=material).aggregate(s=Sum("quantity"))["s"] or 0
+        if stock < 0:
+            problems.append(f"stock negativo: {stock}")
+        if stock + used != initial_stock:
+            problems.append(f"stock inconsistente: {stock} + {used} entregado != {initial_stock}")
+        return problems
@@ -0,0 +1,61 @@
+"""Prometheus metrics for bookings, exports and caches, served at ``/metrics``.
+
+With several gunicorn workers set ``PROMETHEUS_MULTIPROC_DIR`` (before the
+app is imported) to a directory shared by all of them and emptied on start:
+each process writes its samples there and ``/metrics`` aggregates the files.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+
+BOOKINGS = Counter(
+    "booking_reservations_total", "Intentos de reserva por resultado y motivo de rechazo",
+    ["path", "outcome", "reason"],
+)
+CONFLICT_CHECK = Histogram(
+    "booking_conflict_check_seconds", "Tiempo de verificación de choques (reservas y bloqueos)", ["path"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+LOCK_WAIT = Histogram(
+    "booking_lock_wait_seconds", "Espera por el bloqueo de salón/día o de stock", ["lock"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+EXPORT_RENDER = Histogram(
+    "booking_export_render_seconds", "Tiempo de generación de exportaciones", ["format"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+CACHE_REQUESTS = Counter("booking_cache_requests_total", "Consultas a caché por resultado", ["cache", "result"])
+
+
+def booking_created(path):
+    BOOKINGS.labels(path, "created", "").inc()
+
+
+def booking_rejected(path, reason):
+    BOOKINGS.labels(path, "rejected", reason).inc()
+
+
+def cache_lookup(name, hit):
+    CACHE_REQUESTS.labels(name, "hit" if hit else "miss").inc()
+
+
+@contextmanager
+def observe(histogram, *labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - t0)
+
+
+def exposition():
+    """Return (body, content_type) for every worker when multiprocess mode is on, else this process."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,139 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import profiling, timing
+from .routers import SAFE_METHODS, pin_to_primary
+
+request_log = logging.getLogger("booking.requests")
+
+SESSION_REFRESH_KEY = "_refreshed_at"
+
+
+class SessionRefreshMiddleware:
+    """Slide the session expiry without writing the session on every request.
+
+    Replaces ``SESSION_SAVE_EVERY_REQUEST``: the session is saved (expiry pushed
+    to ``SESSION_COOKIE_AGE`` from now) only once ``SESSION_REFRESH_FRACTION`` of
+    the age has elapsed since the last save. With the defaults (1 h, 0.1) an
+    active user causes one write every 6 minutes and an idle session expires
+    between 54 and 60 minutes after the last request.
+    Must be placed after ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, "session", None)
+        # is_empty() does not load the session; anonymous visitors never get one created
+        if session is None or session.is_empty():
+            return response
+        now = int(time.time())
+        if session.modified:
+            session[SESSION_REFRESH_KEY] = now  # saved anyway, just record when
+            return response
+        # A cookie of an expired or unknown session loads empty and drops its key: nothing to keep alive
+        if not session.keys() or session.session_key is None:
+            return response
+        interval = settings.SESSION_COOKIE_AGE * getattr(settings, "SESSION_REFRESH_FRACTION", 0.1)
+        if now - session.get(SESSION_REFRESH_KEY, 0) >= interval:
+            session[SESSION_REFRESH_KEY] = now
+        return response
+
+
+class ReplicaPinMiddleware:
+    """After a successful write, keep the user's reads on the primary for a while."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # request.user is read after the view: DRF sets it for JWT-authenticated calls
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(getattr(request, "user", None))
+        return response
+
+
+class ServerTimingMiddleware:
+    """Per-request query count, SQL/view/template time as ``Server-Timing`` plus one log line.
+
+    Requests slower than ``SERVER_TIMING_SLOW_MS`` also log their queries at
+    WARNING. Place first in MIDDLEWARE so ``total`` covers the whole stack.
+    Queries run while a streaming response is consumed are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "SERVER_TIMING", True)
+        self.slow_ms = getattr(settings, "SERVER_TIMING_SLOW_MS", 1000)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        timings, token = timing.start()
+        t0 = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in settings.DATABASES:
+                    stack.enter_context(connections[alias].execute_wrapper(timing.query_timer(alias)))
+                response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        total_ms = (time.perf_counter() - t0) * 1000
+        view_ms = (time.perf_counter() - request._view_started) * 1000 if hasattr(request, "_view_started") else 0.0
+
+        metrics = [
+            ("total", total_ms, None),
+            ("view", view_ms, None),
+            ("db", timings.sql_ms, f"{timings.queries} queries"),
+            ("tpl", timings.template_ms, None),
+        ] + [(name, ms, None) for name, ms in timings.spans.items()]
+        response["Server-Timing"] = ", ".join(
+            f'{name};dur={ms:.1f}' + (f';desc="{desc}"' if desc else "") for name, ms, desc in metrics
+        )
+        request_log.info(
+            "method=%s path=%s status=%s total_ms=%.1f view_ms=%.1f db_ms=%.1f queries=%d tpl_ms=%.1f%s",
+            request.method, request.path, response.status_code, total_ms, view_ms, timings.sql_ms,
+            timings.queries, timings.template_ms,
+            "".join(f" {name}_ms={ms:.1f}" for name, ms in timings.spans.items()),
+        )
+        if total_ms >= self.slow_ms:
+            request_log.warning(
+                "slow request %s %s %.0fms, %d queries:\n%s", request.method, request.path, total_ms, timings.queries,
+                "\n".join(f"  [{alias}] {ms:.1f}ms {sql}" for alias, ms, sql in timings.query_log),
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started = time.perf_counter()
+
+
+class ProfilingMiddleware:
+    """Profile the view for staff requests with ``?_profile=1`` or ``X-Profile: 1``.
+
+    Must be last in MIDDLEWARE: returning the response from ``process_view``
+    skips the ``process_view`` of any middleware placed after it.
+    JWT-authenticated API calls are not profiled (the user is only known inside DRF).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not profiling.requested(request):
+            return None
+        if not profiling.acquire_slot():
+            request_log.info("profile skipped (rate limit) path=%s", request.path)
+            return None
+        response, name = profiling.run(view_func, request, view_args, view_kwargs)
+        response["X-Profile-Id"] = name
+        return response
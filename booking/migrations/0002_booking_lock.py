@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='booking.room')),
+            ],
+            options={
+                'unique_together': {('room', 'date')},
+            },
+        ),
+    ]
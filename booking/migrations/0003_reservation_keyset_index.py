@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-19 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_booking_lock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date', 'start_time', 'id'], name='reservation_keyset_idx'),
+        ),
+    ]
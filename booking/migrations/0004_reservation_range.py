@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def backfill_range(apps, schema_editor):
+    # Same rule as Reservation.range_for (historical models have no custom methods)
+    Reservation = apps.get_model("booking", "Reservation")
+    tz = timezone.get_default_timezone()
+    qs = Reservation.objects.using(schema_editor.connection.alias).filter(start_at__isnull=True).order_by("pk")
+    last_pk = 0
+    while True:
+        batch = list(qs.filter(pk__gt=last_pk).only("date", "start_time", "end_time")[:BATCH_SIZE])
+        if not batch:
+            break
+        for r in batch:
+            end_day = r.date if r.end_time > r.start_time else r.date + timedelta(days=1)
+            r.start_at = timezone.make_aware(datetime.combine(r.date, r.start_time), tz)
+            r.end_at = timezone.make_aware(datetime.combine(end_day, r.end_time), tz)
+        Reservation.objects.using(schema_editor.connection.alias).bulk_update(batch, ["start_at", "end_at"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_reservation_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='start_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='end_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_range, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reservation',
+            name='start_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='end_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'start_at', 'end_at'], name='reservation_room_range_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-19 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_change_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blackout',
+            index=models.Index(fields=['start_datetime'], name='blackout_start_idx'),
+        ),
+    ]
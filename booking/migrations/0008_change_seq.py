@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-19 18:20
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing(apps, schema_editor):
+    # Clients hold ids as cursors: keep them valid by numbering the existing log with its ids
+    Change = apps.get_model('booking', 'Change')
+    ChangeSequence = apps.get_model('booking', 'ChangeSequence')
+    Change.objects.update(seq=F('id'))
+    ChangeSequence.objects.create(pk=1, last=Change.objects.aggregate(last=Max('id'))['last'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_blackout_start_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(number_existing, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+
 from django.db import models
 from django.utils import timezone
 from django.conf import settings
@@ -23,10 +25,50 @@ class Reservation(models.Model):
     date = models.DateField()
     start_time = models.TimeField()
     end_time = models.TimeField()
+    # Aware [start_at, end_at), derived from date/start_time/end_time on save; same shape as
+    # Blackout.start_datetime/end_datetime so one overlap query covers both (booking.conflicts)
+    start_at = models.DateTimeField(editable=False)
+    end_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(default=timezone.now)
+
+    RANGE_FIELDS = {"date", "start_time", "end_time"}
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the reservation list walks this index (see views.reservation_list)
+            models.Index(fields=['date', 'start_time', 'id'], name='reservation_keyset_idx'),
+            models.Index(fields=['room', 'start_at', 'end_at'], name='reservation_room_range_idx'),
+        ]
+
     def __str__(self):
         return f"Reserva {self.room.code} {self.date} {self.start_time}-{self.end_time}"
 
+    @staticmethod
+    def range_for(day, start_time, end_time):
+        """Aware (start_at, end_at) in the default time zone; an end not after the start is on the next day"""
+        tz = timezone.get_default_timezone()
+        end_day = day if end_time > start_time else day + timedelta(days=1)
+        return (timezone.make_aware(datetime.combine(day, start_time), tz),
+                timezone.make_aware(datetime.combine(end_day, end_time), tz))
+
+    def sync_range(self):
+        """Refresh start_at/end_at; save() does it, bulk_create callers must call it themselves"""
+        self.start_at, self.end_at = self.range_for(self.date, self.start_time, self.end_time)
+
+    def save(self, *args, **kwargs):
+        self.sync_range()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and self.RANGE_FIELDS.intersection(update_fields):
+            kwargs["update_fields"] = {*update_fields, "start_at", "end_at"}
+        super().save(*args, **kwargs)
+
+class BookingLock(models.Model):
+    """One row per (room, date); locking it serializes bookings for that room and day only."""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    date = models.DateField()
+    class Meta:
+        unique_together = ("room","date")
+
 class ReservationItem(models.Model):
     reservation = models.ForeignKey(Reservation, related_name="items", on_delete=models.CASCADE)
     material = models.ForeignKey(Material, on_delete=models.PROTECT)
@@ -41,8 +83,46 @@ class Blackout(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        indexes = [models.Index(fields=["room","start_datetime","end_datetime"])]
+        indexes = [
+            models.Index(fields=["room","start_datetime","end_datetime"]),
+            # Global listings by date (blackout list, admin date_hierarchy) across rooms
+            models.Index(fields=["start_datetime"], name="blackout_start_idx"),
+        ]
 
     def __str__(self):
         scope = self.room.code if self.room_id else "GLOBAL"
         return f"{scope}: {self.start_datetime}–{self.end_datetime} ({self.reason})"
+
+# Archive tier (booking.archive): past reservations moved out of the live tables.
+# Rows keep their original ids; only reports read them.
+
+class ArchivedReservation(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    date = models.DateField(db_index=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+class ArchivedReservationItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    reservation = models.ForeignKey(ArchivedReservation, related_name="items", on_delete=models.CASCADE)
+    material = models.ForeignKey(Material, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField(default=1)
+
+class Change(models.Model):
+    """Append-only log of API-visible writes (booking.changes); ``seq`` is the sequence clients sync from"""
+    entity = models.CharField(max_length=20)    # changes.RESERVATION / INVENTORY / BLACKOUT
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=6)         # changes.UPSERT / DELETE
+    user_id = models.BigIntegerField(null=True, blank=True)  # reservation owner: teachers only sync their own
+    created_at = models.DateTimeField(default=timezone.now)
+    seq = models.BigIntegerField(null=True, blank=True, unique=True)  # set in commit order by changes.sequence()
+
+class ChangeSequence(models.Model):
+    """Single row holding the last ``Change.seq`` handed out; its lock serializes changes.sequence()"""
+    last = models.BigIntegerField(default=0)
@@ -0,0 +1,90 @@
+"""On-demand profiling of single requests.
+
+A staff user adds ``?_profile=1`` or the header ``X-Profile: 1`` and
+``ProfilingMiddleware`` runs the view under cProfile. The stats are written
+to ``PROFILE_DIR`` as ``<id>.prof`` (pstats, for snakeviz/gprof2dot) and
+``<id>.txt`` (top functions by cumulative time); only the last
+``PROFILE_KEEP`` are kept. At most one profile per ``PROFILE_MIN_INTERVAL``
+seconds across workers (the lock lives in the shared cache).
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+RATE_KEY = "booking:profile:rate"
+NAME_RE = re.compile(r"^[\w-]+$")
+
+
+def profile_dir():
+    return Path(getattr(settings, "PROFILE_DIR", settings.BASE_DIR / "var" / "profiles"))
+
+
+def requested(request):
+    if not getattr(settings, "PROFILING", True):
+        return False
+    if request.GET.get("_profile") != "1" and request.headers.get("X-Profile") != "1":
+        return False
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+def acquire_slot():
+    """False if another profile ran less than PROFILE_MIN_INTERVAL seconds ago."""
+    return cache.add(RATE_KEY, 1, getattr(settings, "PROFILE_MIN_INTERVAL", 30))
+
+
+def run(view_func, request, args, kwargs):
+    """Call the view under cProfile, store the result; returns (response, profile id)."""
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    response = profiler.runcall(view_func, request, *args, **kwargs)
+    if hasattr(response, "render") and not response.is_rendered:
+        profiler.runcall(response.render)  # TemplateResponse: include template rendering
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    name = "{}-{}-{}".format(
+        time.strftime("%Y%m%d%H%M%S"), os.getpid(), re.sub(r"[^\w]+", "_", request.path).strip("_")[:60] or "root"
+    )
+    save(profiler, name, f"{request.method} {request.get_full_path()} {elapsed_ms:.1f}ms")
+    return response, name
+
+
+def save(profiler, name, title):
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f"{name}.prof")
+    out = io.StringIO()
+    out.write(title + "\n\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+    (directory / f"{name}.txt").write_text(out.getvalue(), encoding="utf-8")
+    prune(directory)
+
+
+def prune(directory):
+    keep = getattr(settings, "PROFILE_KEEP", 20)
+    profiles = sorted(directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in profiles[keep:]:
+        for suffix in (".prof", ".txt"):
+            old.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def list_profiles():
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = sorted(directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [{"id": p.stem, "size": p.stat().st_size, "created": int(p.stat().st_mtime)} for p in profiles]
+
+
+def profile_file(name, fmt):
+    """Path of a stored profile, or None (also for names that are not plain ids)."""
+    if fmt not in ("prof", "txt") or not NAME_RE.match(name):
+        return None
+    path = profile_dir() / f"{name}.{fmt}"
+    return path if path.is_file() else None
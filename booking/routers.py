@@ -0,0 +1,65 @@
+"""Optional read replica for heavy, read-only views (reports, exports, lists).
+
+Views opt in with ``@read_from_replica``; everything else, and every write,
+uses ``default``. A user who just wrote something (POST/PUT/PATCH/DELETE, see
+``ReplicaPinMiddleware``) is pinned to ``default`` for ``REPLICA_PIN_SECONDS``
+so they always see their own booking despite replication lag.
+"""
+import functools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+REPLICA = "replica"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_use_replica = ContextVar("booking_use_replica", default=False)
+
+
+def replica_configured():
+    return REPLICA in connections.databases
+
+
+def _pin_key(user_id):
+    return f"booking:dbpin:{user_id}"
+
+
+def pin_to_primary(user):
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), 1, getattr(settings, "REPLICA_PIN_SECONDS", 10))
+
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+def read_from_replica(view):
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or is_pinned(getattr(request, "user", None)):
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        return False if db == REPLICA else None
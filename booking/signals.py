@@ -0,0 +1,141 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from . import changes, events, versioning
+from .models import Room, Material, RoomInventory, Reservation, ReservationItem, Blackout
+
+
+def _is_reservation_mirror(blackout):
+    # Blackouts generated by reservation_create are already covered by reservation events
+    return (blackout.reason or "").startswith("Reserva de")
+
+
+def _reservation_payload(r):
+    return {
+        "reservation": r.pk,
+        "date": r.date,
+        "start_time": r.start_time,
+        "end_time": r.end_time,
+    }
+
+
+def _blackout_payload(b):
+    return {
+        "blackout": b.pk,
+        "start_datetime": b.start_datetime,
+        "end_datetime": b.end_datetime,
+        "reason": b.reason,
+    }
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, **kwargs):
+    kind = "reservation.created" if created else "reservation.updated"
+    payload = _reservation_payload(instance)
+    transaction.on_commit(lambda: events.publish(kind, instance.room_id, **payload))
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    payload = _reservation_payload(instance)
+    transaction.on_commit(lambda: events.publish("reservation.deleted", instance.room_id, **payload))
+
+
+@receiver(post_save, sender=Blackout)
+def blackout_saved(sender, instance, created, **kwargs):
+    if _is_reservation_mirror(instance):
+        return
+    kind = "blackout.created" if created else "blackout.updated"
+    payload = _blackout_payload(instance)
+    transaction.on_commit(lambda: events.publish(kind, instance.room_id, **payload))
+
+
+@receiver(post_delete, sender=Blackout)
+def blackout_deleted(sender, instance, **kwargs):
+    if _is_reservation_mirror(instance):
+        return
+    payload = _blackout_payload(instance)
+    transaction.on_commit(lambda: events.publish("blackout.deleted", instance.room_id, **payload))
+
+
+# Cache version stamps (iCal feeds, cached pages). Rooms/users are remembered at
+# load time so moving a reservation also invalidates where it came from.
+
+@receiver(post_init, sender=Reservation)
+def reservation_loaded(sender, instance, **kwargs):
+    # __dict__ lookups: never trigger a query for deferred fields
+    instance._loaded_scope = (instance.__dict__.get("room_id"), instance.__dict__.get("user_id"))
+
+
+def _reservation_scopes(instance):
+    scopes = set()
+    for room_id, user_id in ((instance.room_id, instance.user_id), getattr(instance, "_loaded_scope", (None, None))):
+        if room_id:
+            scopes.add(versioning.room_scope(room_id))
+        if user_id:
+            scopes.add(versioning.user_scope(user_id))
+    return scopes
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def reservation_versions(sender, instance, **kwargs):
+    scopes = _reservation_scopes(instance)
+    instance._loaded_scope = (instance.room_id, instance.user_id)
+    transaction.on_commit(lambda: versioning.bump(*scopes))
+
+
+@receiver(post_save, sender=Blackout)
+@receiver(post_delete, sender=Blackout)
+def blackout_versions(sender, instance, **kwargs):
+    if _is_reservation_mirror(instance):
+        return
+    scope = versioning.room_scope(instance.room_id) if instance.room_id else versioning.GLOBAL_BLACKOUTS
+    transaction.on_commit(lambda: versioning.bump(scope))
+
+
+# Per-model stamps for cached template fragments (lists, reports dashboard)
+
+def model_versions(sender, instance, **kwargs):
+    if sender is Blackout and _is_reservation_mirror(instance):
+        return  # never listed; reservations bump their own stamp
+    versioning.models_changed(sender)
+
+
+# Connected per model, since any delete receiver stops Django from fast-deleting a
+# model's cascades. ReservationItem gets none: its rows only go away together with
+# a save or delete of their reservation, which bumps Reservation (fragments that
+# read items also read reservations).
+for _model in (Room, Material, RoomInventory, Reservation, ReservationItem, Blackout):
+    post_save.connect(model_versions, sender=_model, dispatch_uid=f"versions:{_model._meta.label_lower}")
+    if _model is not ReservationItem:
+        post_delete.connect(model_versions, sender=_model, dispatch_uid=f"versions:{_model._meta.label_lower}")
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_versions(sender, instance, update_fields=None, **kwargs):
+    # Fragments that print usernames (blackout list) key on User too. Logins save
+    # only last_login, which no fragment shows.
+    if update_fields and "username" not in update_fields:
+        return
+    versioning.models_changed(User)
+
+
+# Change log for API delta sync (booking.changes), written in the write's own transaction
+
+CHANGE_ENTITIES = {Reservation: changes.RESERVATION, RoomInventory: changes.INVENTORY, Blackout: changes.BLACKOUT}
+
+
+def log_change(sender, instance, signal, **kwargs):
+    if sender is Blackout and _is_reservation_mirror(instance):
+        return  # not served by the API
+    op = changes.DELETE if signal is post_delete else changes.UPSERT
+    changes.record(CHANGE_ENTITIES[sender], op, [(instance.pk, getattr(instance, "user_id", None))])
+
+
+for _model in CHANGE_ENTITIES:
+    post_save.connect(log_change, sender=_model, dispatch_uid=f"changes:{_model._meta.label_lower}")
+    post_delete.connect(log_change, sender=_model, dispatch_uid=f"changes:{_model._meta.label_lower}")
@@ -0,0 +1,96 @@
+"""Nearest free slots for a booking rejected by an overlap or a blackout.
+
+:func:`nearest` loads, in one query (``conflicts.busy``), everything that
+occupies the requested room and its sibling rooms on the requested day and the
+next weekdays. It indexes each room's busy time as a sorted list of disjoint
+intervals, so checking a slot is one bisect. It then returns the free slots of
+the same duration, inside booking hours, closest to the requested start. Rooms
+without stock for the requested materials are skipped.
+"""
+import bisect
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from . import conflicts
+from .models import Room, RoomInventory
+
+COUNT = 3
+SEARCH_DAYS = 3                 # weekdays searched, the requested one included
+STEP = timedelta(minutes=30)    # candidate starts: 08:00, 08:30, ...
+OPEN, CLOSE = time(8), time(18)
+
+
+class IntervalIndex:
+    """Busy time of one room: merged, sorted intervals; ``free()`` is a binary search"""
+
+    def __init__(self, intervals):
+        starts, ends = [], []
+        for start, end in sorted(intervals):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts, self.ends = starts, ends
+
+    def free(self, start, end):
+        # Only the last interval starting before ``end`` can overlap: earlier ones end before it starts
+        i = bisect.bisect_left(self.starts, end) - 1
+        return i < 0 or self.ends[i] <= start
+
+
+def _weekdays(day, n):
+    days = []
+    while len(days) < n:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def nearest(room, start_at, end_at, exclude_reservation=None, materials=None, count=COUNT):
+    """Up to ``count`` free slots as long as ``[start_at, end_at)``, nearest first (same room wins ties).
+
+    ``materials`` maps material id -> quantity. Each slot is a dict: room, room_code, date, start_time, end_time.
+    """
+    tz = timezone.get_default_timezone()
+    duration = end_at - start_at
+    days = _weekdays(timezone.localtime(start_at, tz).date(), SEARCH_DAYS)
+    rooms = list(Room.objects.order_by("code"))
+    if materials:
+        stock = {(r, m): q for r, m, q in RoomInventory.objects.filter(
+            material_id__in=materials).values_list("room_id", "material_id", "quantity")}
+        rooms = [r for r in rooms if all(stock.get((r.pk, m), 0) >= q for m, q in materials.items())]
+    if not rooms:
+        return []
+
+    window = (timezone.make_aware(datetime.combine(days[0], time.min), tz),
+              timezone.make_aware(datetime.combine(days[-1] + timedelta(days=1), time.min), tz))
+    intervals, everywhere = {r.pk: [] for r in rooms}, []
+    for room_id, start, end in conflicts.busy(rooms, *window, exclude_reservation=exclude_reservation):
+        (intervals[room_id] if room_id else everywhere).append((start, end))
+    index = {pk: IntervalIndex(busy + everywhere) for pk, busy in intervals.items()}
+
+    now = timezone.now()
+    found = []
+    for day in days:
+        slot = timezone.make_aware(datetime.combine(day, OPEN), tz)
+        close = timezone.make_aware(datetime.combine(day, CLOSE), tz)
+        while slot + duration <= close:
+            if slot >= now:
+                for r in rooms:
+                    if index[r.pk].free(slot, slot + duration):
+                        found.append((abs(slot - start_at), r.pk != room.pk, slot, r.code, r))
+            slot += STEP
+    found.sort(key=lambda f: f[:4])
+    return [
+        {"room": r.pk, "room_code": r.code, "date": timezone.localtime(slot, tz).date(),
+         "start_time": timezone.localtime(slot, tz).time(), "end_time": timezone.localtime(slot + duration, tz).time()}
+        for _, _, slot, _, r in found[:count]
+    ]
+
+
+def as_text(slots):
+    """'Salón A 04/03 10:00-11:00; ...' for a form message"""
+    return "; ".join(f"Salón {s['room_code']} {s['date']:%d/%m} {s['start_time']:%H:%M}-{s['end_time']:%H:%M}" for s in slots)
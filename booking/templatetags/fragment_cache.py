@@ -0,0 +1,34 @@
+"""``{% cache %}`` that also counts its hits and misses (``booking_cache_requests_total{cache="fragment"}``).
+
+Same syntax as Django's tag: ``{% load fragment_cache %}`` instead of ``{% load cache %}``.
+"""
+from django import template
+from django.templatetags.cache import CacheNode, do_cache
+
+from booking import metrics
+
+register = template.Library()
+
+MISSED = "fragment_cache_missed"
+
+
+class _Body(template.NodeList):
+    # Django's CacheNode renders the body only when the fragment is not cached
+    def render(self, context):
+        context.render_context[MISSED] = True
+        return super().render(context)
+
+
+class CountedCacheNode(CacheNode):
+    def render(self, context):
+        # A layer of its own, so a fragment nested in the body is counted separately
+        with context.render_context.push():
+            output = super().render(context)
+            metrics.cache_lookup("fragment", MISSED not in context.render_context)
+        return output
+
+
+@register.tag("cache")
+def do_counted_cache(parser, token):
+    node = do_cache(parser, token)
+    return CountedCacheNode(_Body(node.nodelist), node.expire_time_var, node.fragment_name, node.vary_on, node.cache_name)
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase
 from datetime import date, time
 from booking.models import Room, Reservation
 
@@ -9,3 +9,880 @@ class ReservationTests(TestCase):
     def test_create_reservation(self):
         r = Reservation.objects.create(room=self.room, date=date.today(), start_time=time(10,0), end_time=time(11,0))
         self.assertIsNotNone(r.id)
+
+
+class EventHubTests(TestCase):
+    def setUp(self):
+        from booking import events
+        events.reset_hub()
+        self.hub = events.get_hub()
+        self.room = Room.objects.create(code="A")
+
+    def test_reservation_event_published_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(room=self.room, date=date.today(), start_time=time(10,0), end_time=time(11,0))
+        _, batch = self.hub.read(0, room_id=self.room.id)
+        self.assertEqual([e["type"] for e in batch], ["reservation.created"])
+
+    def test_room_filter_keeps_global_events(self):
+        from booking import events
+        other = Room.objects.create(code="B")
+        events.publish("blackout.created", other.id)
+        events.publish("blackout.created", None)
+        _, batch = self.hub.read(0, room_id=self.room.id)
+        self.assertEqual([e["room"] for e in batch], [None])
+
+    def test_memory_hub_restarts_ids_from_a_previous_process(self):
+        from booking.events import MemoryEventHub
+        hub = MemoryEventHub()
+        first = hub.publish({"type": "a", "room": None})
+        self.assertEqual(hub.read(first["id"] + 40), (1, [first]))
+
+    def test_file_hub_realigns_bad_ids_and_rotates(self):
+        import os
+        import tempfile
+        from booking.events import FileEventHub
+        with tempfile.TemporaryDirectory() as tmp:
+            hub = FileEventHub(os.path.join(tmp, "events.log"), max_bytes=0)
+            first = hub.publish({"type": "a", "room": None})
+            second = hub.publish({"type": "b", "room": None})
+            # A Last-Event-ID in the middle of the first line resumes at the second one
+            self.assertEqual(hub.read(first["id"] - 3), (second["id"], [second]))
+            self.assertEqual(hub.read(-5)[1], [first, second])
+            self.assertEqual(hub.read(second["id"] + 100)[1], [first, second])  # past the end: file rotated
+
+            hub.max_bytes = second["id"] + 1
+            third = hub.publish({"type": "c", "room": None})
+            self.assertEqual(os.path.getsize(hub.path + ".1"), third["id"])
+            self.assertEqual((hub.last_id(), hub.read(third["id"])), (0, (0, [])))
+            fourth = hub.publish({"type": "d", "room": None})
+            self.assertEqual([e["type"] for e in hub.read(second["id"])[1]], ["d"])
+            self.assertEqual(fourth["id"], os.path.getsize(hub.path))
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.room = Room.objects.create(code="A")
+
+    def test_room_feed_etag_and_invalidation(self):
+        url = f"/calendario/salon/{self.room.id}.ics"
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(room=self.room, date=date.today(), start_time=time(10,0), end_time=time(11,0))
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.content.count(b"BEGIN:VEVENT"), 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(room=self.room, date=date.today(), start_time=time(12,0), end_time=time(13,0))
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content.count(b"BEGIN:VEVENT"), 2)
+
+    def test_user_feed_rejects_bad_token(self):
+        self.assertEqual(self.client.get("/calendario/usuario/1:nope.ics").status_code, 404)
+
+
+class PrecomputedSchemaTests(TestCase):
+    def test_serves_generated_file_with_etag(self):
+        import gzip
+        import os
+        import tempfile
+        from pathlib import Path
+        from django.test import override_settings
+        from booking.api import schema
+        with tempfile.TemporaryDirectory() as tmp, override_settings(OPENAPI_SCHEMA_DIR=tmp):
+            self.assertEqual(self.client.get("/api/schema/").status_code, 503)
+            schema.generate()
+            first = self.client.get("/api/schema/?format=json")
+            self.assertEqual(first.status_code, 200)
+            self.assertIn(b'"openapi"', first.content)
+            again = self.client.get("/api/schema/?format=json", HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(again.status_code, 304)
+            gz = self.client.get("/api/schema/", HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(gz["Content-Encoding"], "gzip")
+            self.assertFalse(list(Path(tmp).glob("*.tmp")))
+            # A replaced .gz alone is picked up too
+            gz_path = Path(tmp) / "openapi.yaml.gz"
+            gz_path.write_bytes(gzip.compress(b"openapi: 3.0.3\n", mtime=0))
+            os.utime(gz_path, ns=(1, 1))
+            self.assertEqual(gzip.decompress(self.client.get("/api/schema/", HTTP_ACCEPT_ENCODING="gzip").content), b"openapi: 3.0.3\n")
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    class FakeConn:
+        closed = False
+        def close(self): self.closed = True
+
+    def test_reuses_and_bounds_connections(self):
+        from booking.db.pool import ConnectionPool, PoolTimeout
+        pool = ConnectionPool(connect=self.FakeConn, size=1, max_overflow=1, timeout=0.01)
+        a = pool.acquire(); b = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        pool.release(a); pool.release(b)  # b is overflow: closed, not kept idle
+        self.assertTrue(b.closed)
+        self.assertIs(pool.acquire(), a)
+        self.assertEqual(pool.stats()["created"], 2)
+
+    def test_failed_ping_discards_connection(self):
+        from booking.db.pool import ConnectionPool
+        def ping(conn): raise OSError("gone")
+        pool = ConnectionPool(connect=self.FakeConn, ping=ping, size=1)
+        a = pool.acquire(); pool.release(a)
+        self.assertIsNot(pool.acquire(), a)
+        self.assertTrue(a.closed)
+
+
+class SessionRefreshTests(TestCase):
+    def test_session_saved_only_when_refresh_is_due(self):
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from django.contrib.sessions.backends.cached_db import SessionStore
+        self.client.force_login(User.objects.create_user("doc", "doc@colegio.cl", "x"))
+        self.client.get("/reservas/")  # records the first refresh
+        with mock.patch.object(SessionStore, "save", autospec=True) as save:
+            self.client.get("/reservas/")
+            save.assert_not_called()
+            with mock.patch("booking.middleware.time.time", return_value=10**10):
+                self.client.get("/reservas/")
+            save.assert_called_once()
+
+    def test_stale_cookie_does_not_create_a_session(self):
+        from django.conf import settings
+        from django.contrib.sessions.models import Session
+        room = Room.objects.create(code="A")
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = "expirada0123456789abcdefghijklmn"
+        # A feed never reads request.user, so only the refresh would load the session
+        self.assertEqual(self.client.get(f"/calendario/salon/{room.pk}.ics").status_code, 200)
+        self.assertFalse(Session.objects.exists())
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()  # pins left by other tests' writes (user ids are reused)
+
+    def test_reads_routed_unless_user_pinned(self):
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from django.db import router
+        from django.test import RequestFactory
+        from booking import routers
+        request = RequestFactory().get("/reportes/")
+        request.user = User.objects.create_user("doc", "doc@colegio.cl", "x")
+        view = routers.read_from_replica(lambda req: router.db_for_read(Reservation))
+        with mock.patch.object(routers, "replica_configured", return_value=True):
+            self.assertEqual(view(request), routers.REPLICA)
+            routers.pin_to_primary(request.user)
+            self.assertEqual(view(request), "default")
+        self.assertEqual(router.db_for_read(Reservation), "default")
+
+
+class ServerTimingTests(TestCase):
+    def test_header_and_slow_request_log(self):
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        self.client.force_login(User.objects.create_user("doc", "doc@colegio.cl", "x"))
+        with override_settings(SERVER_TIMING_SLOW_MS=0), self.assertLogs("booking.requests", "INFO") as logs:
+            response = self.client.get("/reservas/")
+        header = response["Server-Timing"]
+        for metric in ("total;dur=", "view;dur=", "db;dur=", "tpl;dur="):
+            self.assertIn(metric, header)
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn("path=/reservas/ status=200", logs.output[0])
+        self.assertIn("SELECT", logs.output[1])
+
+
+class MetricsTests(TestCase):
+    def test_rejected_booking_counted_and_exposed(self):
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        from prometheus_client import REGISTRY
+        labels = {"path": "html", "outcome": "rejected", "reason": "hours"}
+        before = REGISTRY.get_sample_value("booking_reservations_total", labels) or 0
+        self.client.force_login(User.objects.create_user("doc", "doc@colegio.cl", "x"))
+        room = Room.objects.create(code="A")
+        self.client.post("/reservas/nueva/", {"room": room.pk, "date": "2030-01-07", "start_time": "07:00", "end_time": "09:00"})
+        self.assertEqual(REGISTRY.get_sample_value("booking_reservations_total", labels), before + 1)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)  # no token outside DEBUG
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+        with override_settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 401)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertIn(b'booking_reservations_total{outcome="rejected",path="html",reason="hours"}', response.content)
+
+
+class ProfilingTests(TestCase):
+    def test_staff_request_profiled_once_per_interval(self):
+        import tempfile
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from django.test import override_settings
+        cache.clear()
+        self.client.force_login(User.objects.create_user("admin", "admin@colegio.cl", "x", is_staff=True))
+        with tempfile.TemporaryDirectory() as tmp, override_settings(PROFILE_DIR=tmp, PROFILE_MIN_INTERVAL=60):
+            name = self.client.get("/reportes/?_profile=1")["X-Profile-Id"]
+            self.assertNotIn("X-Profile-Id", self.client.get("/reportes/", HTTP_X_PROFILE="1"))
+            self.assertEqual([p["id"] for p in self.client.get("/salud/perfiles/").json()["profiles"]], [name])
+            report = b"".join(self.client.get(f"/salud/perfiles/{name}.txt").streaming_content)
+            self.assertIn(b"reports_view", report)
+            self.assertEqual(self.client.get(f"/salud/perfiles/{name}.exe").status_code, 404)
+
+
+class QueryBudgetTests(TestCase):
+    """Every view and viewset action runs once over a few rows; budgets raise in tests (QUERY_BUDGET_RAISE)."""
+
+    def setUp(self):
+        from datetime import datetime, timedelta
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from django.utils import timezone
+        from booking.models import Material, RoomInventory, ReservationItem, Blackout
+        cache.clear()
+        self.admin = User.objects.create_user("admin", "admin@colegio.cl", "x", is_staff=True)
+        self.teacher = User.objects.create_user("doc", "doc@colegio.cl", "x")
+        self.rooms = [Room.objects.create(code=c) for c in "AB"]
+        self.materials = [Material.objects.create(name=n) for n in ("data", "parlante", "notebook")]
+        for room in self.rooms:
+            for m in self.materials:
+                RoomInventory.objects.create(room=room, material=m, quantity=20)
+        self.day = date.today() + timedelta(days=14 + (7 - date.today().weekday()) % 7)  # a Monday
+        tz = timezone.get_current_timezone()
+        self.reservations = []
+        for hour in (9, 10, 11):
+            for room in self.rooms:
+                r = Reservation.objects.create(room=room, user=self.teacher, date=self.day, start_time=time(hour), end_time=time(hour + 1))
+                for m in self.materials[:2]:
+                    ReservationItem.objects.create(reservation=r, material=m, quantity=1)
+                Blackout.objects.create(room=room, created_by=self.teacher, reason="Reserva de doc",
+                                        start_datetime=timezone.make_aware(datetime.combine(self.day, time(hour)), tz),
+                                        end_datetime=timezone.make_aware(datetime.combine(self.day, time(hour + 1)), tz))
+                self.reservations.append(r)
+        # Each by a different admin: lists must not load creators one by one
+        creators = [self.admin, User.objects.create_user("admin2", "admin2@colegio.cl", "x", is_staff=True)]
+        self.blackouts = [
+            Blackout.objects.create(room=room, created_by=creator, reason="Reunión",
+                                    start_datetime=timezone.make_aware(datetime.combine(self.day + timedelta(days=1), time(8)), tz),
+                                    end_datetime=timezone.make_aware(datetime.combine(self.day + timedelta(days=1), time(8, 45)), tz))
+            for room, creator in zip(self.rooms, creators)
+        ]
+        self.client.force_login(self.admin)
+
+    def _run(self, client, calls):
+        for method, url, data, status in calls:
+            with self.subTest(method=method, url=url):
+                kwargs = {"format": "json"} if hasattr(client, "credentials") and data is not None else {}
+                response = getattr(client, method)(url, data, **kwargs) if data is not None else getattr(client, method)(url)
+                self.assertEqual(response.status_code, status)
+
+    def test_over_budget_raises_or_logs(self):
+        from django.test import RequestFactory, override_settings
+        from booking.budgets import QueryBudgetExceeded, query_budget, add_items
+        view = query_budget(1, per_item=1)(lambda request, n: add_items(n) or list(Room.objects.all()) + list(Room.objects.all()))
+        request = RequestFactory().get("/")
+        view(request, 1)
+        with self.assertRaises(QueryBudgetExceeded):
+            view(request, 0)
+        with override_settings(QUERY_BUDGET_RAISE=False), self.assertLogs("booking.requests", "WARNING"):
+            view(request, 0)
+
+    def test_every_view_and_viewset_declares_a_budget(self):
+        from booking import views
+        from booking.api import viewsets
+        from django.urls import get_resolver
+        for pattern in get_resolver().url_patterns:
+            callback = getattr(pattern, "callback", None)
+            if callback is not None and callback.__module__ == views.__name__:
+                self.assertTrue(hasattr(callback, "query_budget"), pattern)
+        for name in ("RoomViewSet", "MaterialViewSet", "RoomInventoryViewSet", "ReservationViewSet", "BlackoutViewSet"):
+            viewset = getattr(viewsets, name)
+            actions = {"list", "retrieve"} if not hasattr(viewset, "create") else {"list", "retrieve", "create", "update", "partial_update", "destroy"}
+            self.assertEqual(set(viewset.query_budgets), actions, name)
+        self.assertEqual(set(viewsets.ChangeViewSet.query_budgets), {"list"})
+
+    def test_blackout_list_loads_creators_with_the_blackouts(self):
+        from django.contrib.auth.models import User
+        from booking.models import Blackout
+        template = self.blackouts[0]
+        for i in range(4):
+            Blackout.objects.create(room=None, reason="Consejo", start_datetime=template.start_datetime, end_datetime=template.end_datetime,
+                                    created_by=User.objects.create_user(f"jefe{i}", f"jefe{i}@colegio.cl", "x", is_staff=True))
+        response = self.client.get("/bloqueos/")
+        self.assertContains(response, "jefe3")
+
+    def test_html_views_within_budget(self):
+        from booking import ical
+        from django.test import Client
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        room, material, blackout = self.rooms[0], self.materials[0], self.blackouts[0]
+        inventory = room.roominventory_set.first()
+        spare = self.materials[2]
+        self._run(self.client, [
+            ("get", "/", None, 302),
+            ("get", "/reservas/", None, 200),
+            ("get", "/reservas/nueva/", None, 200),
+            ("post", "/reservas/nueva/", {"room": room.pk, "date": self.day.isoformat(), "start_time": "14:00", "end_time": "15:00",
+                                          f"qty_{material.pk}": 1, f"qty_{spare.pk}": 2}, 302),
+            ("get", "/eventos/", None, 200),
+            ("get", f"/calendario/salon/{room.pk}.ics", None, 200),
+            ("get", f"/calendario/usuario/{ical.user_token(self.teacher)}.ics", None, 200),
+            ("get", "/calendario/semana/", {"semana": self.day.isoformat()}, 200),
+            ("get", "/bloqueos/", None, 200),
+            ("get", "/bloqueos/nuevo/", None, 200),
+            ("get", f"/bloqueos/{blackout.pk}/editar/", None, 200),
+            ("post", f"/bloqueos/{blackout.pk}/editar/", {"room": room.pk, "start_datetime": f"{self.day}T16:00", "reason": "Reunión"}, 302),
+            ("get", f"/bloqueos/{blackout.pk}/eliminar/", None, 200),
+            ("post", f"/bloqueos/{blackout.pk}/eliminar/", {}, 302),
+            ("get", "/materiales/", None, 200),
+            ("get", "/materiales/nuevo/", None, 200),
+            ("post", "/materiales/nuevo/", {"name": "proyector"}, 302),
+            ("get", f"/materiales/{spare.pk}/editar/", None, 200),
+            ("post", f"/materiales/{spare.pk}/editar/", {"name": "notebooks"}, 302),
+            ("get", "/inventario/", None, 200),
+            ("get", "/inventario/nuevo/", None, 200),
+            ("get", f"/inventario/{inventory.pk}/actualizar/", None, 200),
+            ("post", f"/inventario/{inventory.pk}/actualizar/", {"action": "add", "quantity": 3}, 302),
+            ("get", f"/inventario/{inventory.pk}/eliminar/", None, 200),
+            ("get", "/salud/db-pool/", None, 200),
+            ("get", "/salud/perfiles/", None, 200),
+            ("get", "/salud/perfiles/nada.txt", None, 404),
+            ("get", "/metrics", None, 403),
+            ("get", "/usuarios/", None, 200),
+            ("get", "/usuarios/nuevo/", None, 200),
+            ("post", "/usuarios/nuevo/", {"username": "nuevo", "email": "nuevo@colegio.cl", "first_name": "N", "last_name": "N",
+                                          "password1": "clave-larga-123", "password2": "clave-larga-123"}, 302),
+            ("get", "/usuarios/importar/", None, 200),
+            ("post", "/usuarios/importar/", {"csv_file": SimpleUploadedFile("d.csv", b"username;email;first_name;last_name\nnueva;nueva@colegio.cl;N;N\n")}, 200),
+            ("get", "/reportes/", None, 200),
+            ("get", "/reportes/exportar/pdf/", {"start_date": self.day.isoformat(), "end_date": self.day.isoformat()}, 200),
+            ("get", "/reportes/exportar/excel/", {"start_date": self.day.isoformat(), "end_date": self.day.isoformat()}, 200),
+            ("get", "/reportes/exportar/csv/", {"start_date": self.day.isoformat(), "end_date": self.day.isoformat()}, 200),
+            ("get", "/reportes/exportar/ods/", None, 404),
+        ])
+        spare_room = Room.objects.create(code="C")
+        self._run(self.client, [
+            ("get", f"/materiales/{spare.pk}/eliminar/", None, 200),
+            ("post", f"/materiales/{spare.pk}/eliminar/", {}, 302),
+            ("post", "/inventario/nuevo/", {"room": spare_room.pk, "material": material.pk, "quantity": 4}, 302),
+            ("post", f"/inventario/{inventory.pk}/eliminar/", {}, 302),
+            # Global blackout 09:30-10:15: cancels the four reservations of 09:00 and 10:00
+            ("post", "/bloqueos/nuevo/", {"start_datetime": f"{self.day}T09:30", "reason": "Feriado"}, 302),
+            ("get", "/cuentas/logout/", None, 302),
+        ])
+        self._run(Client(), [
+            ("get", "/cuentas/registro/", None, 200),
+            ("post", "/cuentas/registro/", {"username": "otro", "email": "otro@colegio.cl", "first_name": "O", "last_name": "T",
+                                            "password1": "clave-larga-123", "password2": "clave-larga-123"}, 302),
+        ])
+
+    def _api_client(self, user, auth):
+        """APIClient authenticated the way real clients are: a JWT from /api/token/ or a session login"""
+        from rest_framework.test import APIClient
+        client = APIClient()
+        if auth == "jwt":
+            token = client.post("/api/token/", {"username": user.username, "password": "x"}, format="json").json()["access"]
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        else:
+            client.login(username=user.username, password="x")
+        return client
+
+    def _api_calls(self):
+        room, material, reservation, blackout = self.rooms[0], self.materials[0], self.reservations[0], self.blackouts[0]
+        inventory = room.roominventory_set.first()
+        items = [{"material_id": m.pk, "quantity": 1} for m in self.materials]
+        slot = {"room": room.pk, "date": self.day.isoformat(), "start_time": "15:00", "end_time": "16:00", "items": items}
+        return [
+            ("get", "/api/rooms/", None, 200),
+            ("get", f"/api/rooms/{room.pk}/", None, 200),
+            ("get", "/api/materials/", None, 200),
+            ("get", f"/api/materials/{material.pk}/", None, 200),
+            ("get", "/api/inventory/", None, 200),
+            ("get", f"/api/inventory/{inventory.pk}/", None, 200),
+            ("patch", f"/api/inventory/{inventory.pk}/", {"quantity": 30}, 200),
+            ("put", f"/api/inventory/{inventory.pk}/", {"room_id": room.pk, "material_id": material.pk, "quantity": 25}, 200),
+            ("delete", f"/api/inventory/{inventory.pk}/", None, 204),
+            ("post", "/api/inventory/", {"room_id": room.pk, "material_id": material.pk, "quantity": 10}, 201),
+            ("get", "/api/reservations/", None, 200),
+            ("get", f"/api/reservations/{reservation.pk}/", None, 200),
+            ("post", "/api/reservations/", slot, 201),
+            ("patch", f"/api/reservations/{reservation.pk}/", {"start_time": "12:00", "end_time": "13:00"}, 200),
+            ("put", f"/api/reservations/{reservation.pk}/", dict(slot, start_time="16:00", end_time="17:00"), 200),
+            ("delete", f"/api/reservations/{reservation.pk}/", None, 204),
+            ("get", "/api/blackouts/", None, 200),
+            ("get", f"/api/blackouts/{blackout.pk}/", None, 200),
+            ("post", "/api/blackouts/", {"room": room.pk, "start_datetime": f"{self.day}T17:00", "end_datetime": f"{self.day}T17:45"}, 201),
+            ("patch", f"/api/blackouts/{blackout.pk}/", {"reason": "Reunión de ciclo"}, 200),
+            ("put", f"/api/blackouts/{blackout.pk}/", {"room": room.pk, "start_datetime": f"{self.day}T17:00",
+                                                       "end_datetime": f"{self.day}T17:45", "reason": "Consejo"}, 200),
+            ("delete", f"/api/blackouts/{blackout.pk}/", None, 204),
+            ("get", "/api/changes/", None, 200),
+            ("get", "/api/changes/", {"since": 0}, 200),
+        ]
+
+    def _teacher_calls(self):
+        # Teachers pay for the AdminBiblioteca group check in get_queryset
+        reservation = self.reservations[1]
+        slot = {"room": self.rooms[1].pk, "date": self.day.isoformat(), "start_time": "14:00", "end_time": "15:00",
+                "items": [{"material_id": self.materials[0].pk, "quantity": 1}]}
+        return [
+            ("get", "/api/reservations/", None, 200),
+            ("get", f"/api/reservations/{reservation.pk}/", None, 200),
+            ("post", "/api/reservations/", slot, 201),
+            ("patch", f"/api/reservations/{reservation.pk}/", {"start_time": "12:00", "end_time": "13:00"}, 200),
+            ("put", f"/api/reservations/{reservation.pk}/", dict(slot, start_time="16:00", end_time="17:00"), 200),
+            ("delete", f"/api/reservations/{reservation.pk}/", None, 204),
+            ("get", "/api/changes/", {"since": 0}, 200),
+        ]
+
+    def test_api_viewsets_within_budget_with_jwt(self):
+        self._run(self._api_client(self.teacher, "jwt"), self._teacher_calls())
+        self._run(self._api_client(self.admin, "jwt"), self._api_calls())
+
+    def test_api_viewsets_within_budget_with_session(self):
+        self._run(self._api_client(self.teacher, "session"), self._teacher_calls())
+        self._run(self._api_client(self.admin, "session"), self._api_calls())
+
+
+class InventoryMatrixTests(TestCase):
+    def test_matrix_zero_fills_and_filters(self):
+        from django.contrib.auth.models import User
+        from booking.models import Material, RoomInventory
+        self.client.force_login(User.objects.create_user("admin", "admin@colegio.cl", "x", is_staff=True))
+        a, b = Room.objects.create(code="A"), Room.objects.create(code="B")
+        data, parlante = Material.objects.create(name="data"), Material.objects.create(name="parlante")
+        inv = RoomInventory.objects.create(room=a, material=data, quantity=4)
+        RoomInventory.objects.create(room=b, material=parlante, quantity=2)
+        response = self.client.get("/inventario/")
+        grid = [[(c["id"], c["quantity"]) for c in row["cells"]] for row in response.context["matrix"]]
+        self.assertEqual(grid, [[(inv.pk, 4), (None, 0)], [(None, 0), (grid[1][1][0], 2)]])
+        self.assertEqual(response.context["room_totals"], [4, 2])
+        response = self.client.get("/inventario/", {"room": b.pk, "q": "parl"})
+        self.assertEqual([r.code for r in response.context["shown_rooms"]], ["B"])
+        self.assertEqual([row["material"].name for row in response.context["matrix"]], ["parlante"])
+
+
+class ReservationListTests(TestCase):
+    def test_window_filters_and_keyset_pages(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.contrib.auth.models import User
+        admin = User.objects.create_user("admin", "admin@colegio.cl", "x", is_staff=True)
+        doc = User.objects.create_user("doc", "doc@colegio.cl", "x")
+        a, b = Room.objects.create(code="A"), Room.objects.create(code="B")
+        today = date.today()
+        Reservation.objects.create(room=a, user=doc, date=today - timedelta(days=30), start_time=time(9), end_time=time(10))
+        ids = [Reservation.objects.create(room=room, user=doc, date=today + timedelta(days=d), start_time=time(h), end_time=time(h + 1)).pk
+               for d in (0, 1) for h in (9, 10) for room in (a, b)]
+        self.client.force_login(admin)
+        with mock.patch("booking.views.RESERVATION_PAGE_SIZE", 3):
+            seen, params = [], {}
+            while True:
+                response = self.client.get("/reservas/", params)
+                seen += [r.pk for r in response.context["reservations"]]
+                if not response.context["next_cursor"]:
+                    break
+                params = {"despues": response.context["next_cursor"]}
+            self.assertEqual(seen, ids)  # the 30-day-old one is outside the default window
+            back = self.client.get("/reservas/", {"antes": response.context["previous_cursor"]})
+            self.assertEqual([r.pk for r in back.context["reservations"]], ids[3:6])
+        response = self.client.get("/reservas/", {"room": b.pk, "desde": (today - timedelta(days=60)).isoformat()})
+        self.assertEqual(len(response.context["reservations"]), 4)
+        response = self.client.get("/reservas/", {"usuario": "nadie"})
+        self.assertEqual(list(response.context["reservations"]), [])
+
+
+class FragmentCacheTests(TestCase):
+    def test_cached_until_a_read_model_changes(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from prometheus_client import REGISTRY
+        from booking.locking import take_stock
+        from booking.models import Material, RoomInventory
+        cache.clear()
+        self.client.force_login(User.objects.create_user("admin", "admin@colegio.cl", "x", is_staff=True))
+        room, data = Room.objects.create(code="A"), Material.objects.create(name="data")
+        RoomInventory.objects.create(room=room, material=data, quantity=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            pass
+        self.client.get("/inventario/")
+        hits = REGISTRY.get_sample_value("booking_cache_requests_total", {"cache": "fragment", "result": "hit"}) or 0
+        with self.assertNumQueries(1):  # request.user only; the matrix comes from the cache
+            self.assertContains(self.client.get("/inventario/"), ">4</a>")
+        self.assertEqual(REGISTRY.get_sample_value("booking_cache_requests_total", {"cache": "fragment", "result": "hit"}), hits + 1)
+        fragments = {r: REGISTRY.get_sample_value("booking_cache_requests_total", {"cache": "fragment", "result": r}) or 0
+                     for r in ("hit", "miss")}
+        with self.captureOnCommitCallbacks(execute=True):
+            take_stock(room, data.pk, 1)  # queryset update(): no signals, bumped explicitly
+        self.assertContains(self.client.get("/inventario/"), ">3</a>")
+        self.assertEqual(REGISTRY.get_sample_value("booking_cache_requests_total", {"cache": "fragment", "result": "miss"}),
+                         fragments["miss"] + 1)
+        # Other fragments do not depend on RoomInventory
+        self.client.get("/materiales/")
+        with self.captureOnCommitCallbacks(execute=True):
+            take_stock(room, data.pk, 1)
+        with self.assertNumQueries(1):
+            self.client.get("/materiales/")
+
+    def test_blackout_list_follows_creator_renames(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from django.utils import timezone
+        from booking.models import Blackout
+        cache.clear()
+        admin = User.objects.create_user("admin", "admin@colegio.cl", "x", is_staff=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(admin)
+            Blackout.objects.create(room=None, created_by=admin, reason="Consejo", start_datetime=timezone.now(), end_datetime=timezone.now())
+        self.assertContains(self.client.get("/bloqueos/"), "admin")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(admin)  # saves last_login only: the fragment stays
+        with self.assertNumQueries(1):
+            self.client.get("/bloqueos/")
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.username = "jefa"
+            admin.save()
+        self.assertContains(self.client.get("/bloqueos/"), "Creado por:</strong> jefa")
+
+
+class WeekCalendarTests(TestCase):
+    def test_grid_slots_and_global_blackouts(self):
+        from datetime import datetime, timedelta
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from django.utils import timezone
+        from booking.models import Blackout
+        cache.clear()
+        admin = User.objects.create_user("admin", "admin@colegio.cl", "x", is_staff=True)
+        self.client.force_login(admin)
+        a = Room.objects.create(code="A")
+        Room.objects.create(code="B")  # an empty column
+        monday = date.today() - timedelta(days=date.today().weekday())
+        tuesday = monday + timedelta(days=1)
+        Reservation.objects.create(room=a, user=admin, date=tuesday, start_time=time(9), end_time=time(11))
+        Blackout.objects.create(room=None, reason="Consejo", start_datetime=timezone.make_aware(datetime.combine(tuesday, time(15))),
+                                end_datetime=timezone.make_aware(datetime.combine(tuesday, time(15, 45))))
+        with self.captureOnCommitCallbacks(execute=True):
+            pass
+        response = self.client.get("/calendario/semana/", {"semana": tuesday.isoformat()})
+        rows = {row["slot"].hour: [[e["label"] for e in cell] for cell in row["cells"]] for row in response.context["grid"][1]["rows"]}
+        self.assertEqual((rows[9], rows[10], rows[11]), ([["admin"], []], [["admin"], []], [[], []]))
+        self.assertEqual(rows[15], [["Consejo"], ["Consejo"]])
+        with self.assertNumQueries(1):  # request.user; the week comes from the cache
+            self.assertContains(self.client.get("/calendario/semana/", {"semana": monday.isoformat()}), "Consejo", count=2)
+
+
+class UserImportTests(TestCase):
+    def test_parallel_import_validates_and_skips_existing(self):
+        from django.contrib.auth.models import User
+        from booking import userimport
+        User.objects.create_user("doc0", "doc0@colegio.cl", "x")
+        rows = ["username,email,first_name,last_name,password"] + [
+            f"doc{i},doc{i}@colegio.cl,Doc,{i},{'' if i % 2 else f'clave-segura-{i}'}" for i in range(10)]
+        result = userimport.import_users("\n".join(rows) + "\n", workers=2)
+        self.assertEqual((len(result.created), result.skipped, result.errors), (9, ["doc0"], []))
+        self.assertEqual(sorted(result.generated), ["doc1", "doc3", "doc5", "doc7", "doc9"])
+        self.assertTrue(User.objects.get(username="doc2").check_password("clave-segura-2"))
+        self.assertTrue(User.objects.get(username="doc3").check_password(result.generated["doc3"]))
+        self.assertEqual(User.objects.filter(groups__name="Docente").count(), 9)
+
+        bad = "username;email;first_name;last_name\nana;ana@gmail.com;Ana;A\nbeto;beto@colegio.cl;Beto;B\nbeto;b2@colegio.cl;B;B\n"
+        result = userimport.import_users(bad)
+        self.assertEqual([line for line, _ in result.errors], [2, 4])
+        self.assertFalse(User.objects.filter(username="beto").exists())
+
+
+class ConflictQueryTests(TestCase):
+    def test_one_query_for_reservations_and_blackouts_across_days(self):
+        from datetime import datetime, timedelta
+        from django.utils import timezone
+        from booking import conflicts
+        from booking.models import Blackout
+        room, other = Room.objects.create(code="A"), Room.objects.create(code="B")
+        day = date(2030, 3, 4)
+        r = Reservation.objects.create(room=room, date=day, start_time=time(9), end_time=time(10))
+        self.assertEqual(r.start_at, timezone.make_aware(datetime.combine(day, time(9))))
+        late = Reservation(room=room, date=day, start_time=time(23), end_time=time(1))
+        late.sync_range()
+        self.assertEqual(late.end_at - late.start_at, timedelta(hours=2))  # crosses midnight
+        # The reservation's own mirror is not a conflict; a global blackout is
+        Blackout.objects.create(room=room, reason="Reserva de doc", start_datetime=r.start_at, end_datetime=r.end_at)
+        Blackout.objects.create(room=None, reason="Jornada", start_datetime=r.end_at + timedelta(hours=1),
+                                end_datetime=r.end_at + timedelta(days=2))
+        with self.assertNumQueries(1):
+            self.assertEqual(conflicts.first_conflict(room, *Reservation.range_for(day, time(9, 30), time(12))), conflicts.RESERVATION)
+        self.assertIsNone(conflicts.first_conflict(room, r.start_at, r.end_at, exclude_reservation=r.pk))
+        self.assertEqual(conflicts.first_conflict(other, *Reservation.range_for(day + timedelta(days=1), time(8), time(9))),
+                         conflicts.BLACKOUT)
+        self.assertIsNone(conflicts.first_conflict(other, *Reservation.range_for(day + timedelta(days=3), time(8), time(9))))
+
+
+class BenchmarkTests(TestCase):
+    def test_scenarios_report_latency_queries_and_status(self):
+        import io
+        from booking.management.commands.benchmark import Command, percentile
+        self.assertEqual([percentile([4, 1, 3, 2], p) for p in (50, 95, 99)], [2, 4, 4])
+        only = ["booking_create", "booking_conflict", "reservation_list", "api_reservation_list", "reports_dashboard"]
+        results = Command(stdout=io.StringIO())._run({"rooms": 1, "materials": 1, "users": 2, "reservations": 20,
+                                                      "seed": 1, "iterations": 3, "only": only})
+        self.assertEqual(results["meta"]["dataset"]["reservations"], 20)
+        scenarios = results["scenarios"]
+        self.assertEqual(list(scenarios), only)
+        # Bookings redirect (created or rejected), pages render; no 4xx/5xx hidden in the timings
+        self.assertEqual({name: r["status"] for name, r in scenarios.items()},
+                         {"booking_create": [302], "booking_conflict": [302], "reservation_list": [200],
+                          "api_reservation_list": [200], "reports_dashboard": [200]})
+        self.assertEqual(Reservation.objects.count(), 20 + 5)  # warm-up, 3 timed, 1 traced
+        for r in scenarios.values():
+            self.assertEqual(r["n"], 3)
+            self.assertLessEqual(r["p50_ms"], r["p99_ms"])
+            self.assertGreater(r["queries"], 0)
+
+
+class LoadgenTests(TestCase):
+    def test_generates_the_requested_counts_without_overlaps(self):
+        from datetime import datetime, timedelta
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from booking import loadgen
+        from booking.models import Blackout, Material, ReservationItem, RoomInventory
+        summary = loadgen.generate(rooms=2, materials=3, users=4, reservations=60, start=date(2030, 3, 4), days=90,
+                                   blackouts=5, prefix="carga")
+        self.assertEqual((summary["rooms"], summary["materials"], summary["users"], summary["reservations"]), (2, 3, 4, 60))
+        self.assertEqual((Room.objects.count(), Material.objects.count(), RoomInventory.objects.count()), (2, 3, 6))
+        self.assertEqual(User.objects.filter(username__startswith="carga", groups__name="Docente").count(), 4)
+        self.assertEqual(Reservation.objects.count(), 60)
+        self.assertEqual(ReservationItem.objects.count(), summary["items"])
+        self.assertEqual(Blackout.objects.filter(reason__startswith="Reserva de").count(), summary["mirror_blackouts"])
+        self.assertEqual(Blackout.objects.filter(reason="Reunión (sintético)").count(), 5)  # in total, not per room
+        holidays = Blackout.objects.filter(room=None)
+        self.assertEqual(holidays.count() + 5, summary["blackouts"])
+        for h in holidays:  # Good Friday, May 1st, May 21st: whole days, up to the next midnight
+            day = timezone.localtime(h.start_datetime).date()
+            self.assertEqual(h.end_datetime, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)))
+        self.assertGreaterEqual(holidays.count(), 3)
+        rows = list(Reservation.objects.order_by("room", "start_at").values_list("room", "start_at", "end_at"))
+        self.assertFalse([(a, b) for a, b in zip(rows, rows[1:]) if a[0] == b[0] and b[1] < a[2]])
+        self.assertFalse(Reservation.objects.filter(date__week_day__in=(1, 7)).exists())
+
+
+class LockingTests(TestCase):
+    def test_locks_every_day_touched_and_stock_never_goes_negative(self):
+        from datetime import timedelta
+        from booking.locking import lock_blackout, lock_room_ranges, take_stock
+        from booking.models import Blackout, BookingLock, Material, RoomInventory
+        room, other = Room.objects.create(code="A"), Room.objects.create(code="B")
+        day = date(2030, 3, 4)
+        with self.assertNumQueries(2):  # one upsert per (room, day)
+            self.assertEqual(lock_room_ranges((room, *Reservation.range_for(day, time(23), time(1)))), 2)
+        self.assertEqual(set(BookingLock.objects.values_list("room__code", "date")), {("A", day), ("A", day + timedelta(days=1))})
+        start, end = Reservation.range_for(day, time(9), time(10))
+        self.assertEqual(lock_room_ranges((room, start, end), (room, start, end)), 1)
+        self.assertEqual(lock_blackout(Blackout(room=None, start_datetime=start, end_datetime=end)), 2)
+        self.assertTrue(BookingLock.objects.filter(room=other, date=day).exists())
+
+        data = Material.objects.create(name="data")
+        RoomInventory.objects.create(room=room, material=data, quantity=2)
+        self.assertTrue(take_stock(room, data.pk, 2))
+        self.assertFalse(take_stock(room, data.pk, 1))
+        self.assertFalse(take_stock(other, data.pk, 1))  # no inventory row in that room
+        self.assertEqual(RoomInventory.objects.get(room=room, material=data).quantity, 0)
+
+    def test_stress_verdict_fails_on_errors_overlaps_and_lost_stock(self):
+        from booking.management.commands.stress_booking import Command
+        from booking.models import Material, ReservationItem, RoomInventory
+        room, data = Room.objects.create(code="A"), Material.objects.create(name="data")
+        RoomInventory.objects.create(room=room, material=data, quantity=2)
+        r = Reservation.objects.create(room=room, date=date(2030, 3, 4), start_time=time(9), end_time=time(10))
+        ReservationItem.objects.create(reservation=r, material=data, quantity=1)
+        verdict = Command()._violations
+        self.assertEqual(verdict(room, data, 2, 1, 0), ["stock inconsistente: 2 + 1 entregado != 2"])
+        RoomInventory.objects.filter(room=room).update(quantity=1)
+        self.assertEqual(verdict(room, data, 2, 1, 0), [])
+        self.assertEqual(verdict(room, data, 2, 1, 8), ["8 intentos terminaron con error"])
+        self.assertEqual(verdict(room, data, 2, 0, 1), ["1 intentos terminaron con error", "0 aceptadas pero 1 reservas en la base"])
+        Reservation.objects.create(room=room, date=date(2030, 3, 4), start_time=time(9, 30), end_time=time(11))
+        self.assertTrue(verdict(room, data, 2, 2, 0)[0].startswith("reservas solapadas"))
+
+
+class ArchiveTests(TestCase):
+    def test_moves_old_reservations_and_reports_union_only_when_reached(self):
+        import io
+        from django.core.management import call_command
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        from booking import archive
+        from booking.models import ArchivedReservation, Blackout, Material, ReservationItem
+        room, data = Room.objects.create(code="A"), Material.objects.create(name="data")
+        old_day, new_day = date(2020, 5, 4), date.today()
+        for day in (old_day, old_day, new_day):
+            r = Reservation.objects.create(room=room, date=day, start_time=time(9), end_time=time(10))
+            ReservationItem.objects.create(reservation=r, material=data, quantity=2)
+            Blackout.objects.create(room=room, reason="Reserva de doc", start_datetime=r.start_at, end_datetime=r.end_at)
+        call_command("archive_reservations", before="2021-01-01", batch_size=1, stdout=io.StringIO())
+        self.assertEqual((Reservation.objects.count(), ArchivedReservation.objects.count()), (1, 2))
+        self.assertEqual(Blackout.objects.count(), 1)
+        self.assertEqual(ArchivedReservation.objects.get(pk=r.pk - 2).items.get().quantity, 2)
+
+        self.assertEqual(archive.horizon(), old_day)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(archive.report_stats(new_day, new_day)[0], 1)
+        self.assertFalse(any("archived" in q["sql"] for q in ctx.captured_queries[1:]))  # past the horizon lookup
+        with self.assertNumQueries(3):  # the horizon, then one UNION ALL per report
+            total, rooms, materials = archive.report_stats(old_day, new_day)
+        self.assertEqual((total, rooms, materials), (3, [{"room__code": "A", "reservation_count": 3}],
+                                                     [{"material__name": "data", "total_quantity": 6}]))
+
+
+class ChangeSyncTests(TestCase):
+    def test_deltas_tombstones_and_visibility(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from booking.models import Blackout, Material, RoomInventory
+        teacher, other = User.objects.create_user("doc", "doc@colegio.cl", "x"), User.objects.create_user("otro", "otro@colegio.cl", "x")
+        api = APIClient()
+        api.force_authenticate(teacher)
+        room, data = Room.objects.create(code="A"), Material.objects.create(name="data")
+        inventory = RoomInventory.objects.create(room=room, material=data, quantity=4)
+        cursor = api.get("/api/changes/").json()["next"]
+        mine = Reservation.objects.create(room=room, user=teacher, date=date(2030, 3, 4), start_time=time(9), end_time=time(10))
+        Reservation.objects.create(room=room, user=other, date=date(2030, 3, 4), start_time=time(11), end_time=time(12))
+        mine.end_time = time(11)
+        mine.save()
+        Blackout.objects.create(room=room, reason="Consejo", start_datetime=mine.start_at, end_datetime=mine.end_at)
+        inventory_id = inventory.pk
+        inventory.delete()
+        # unsequenced check, savepoint, counter lock, ids, seq update, counter update, release, group check,
+        # changes, reservations + items
+        with self.assertNumQueries(11):
+            body = api.get("/api/changes/", {"since": cursor}).json()
+        self.assertEqual([(c["entity"], c["id"], c["op"]) for c in body["changes"]],
+                         [("reservation", mine.pk, "upsert"), ("inventory", inventory_id, "delete")])
+        self.assertEqual(body["changes"][0]["data"]["end_time"], "11:00:00")
+        self.assertEqual((body["next"], body["more"]), (body["changes"][-1]["seq"], False))
+        self.assertEqual(api.get("/api/changes/", {"since": body["next"]}).json()["changes"], [])
+        self.assertEqual(api.get("/api/changes/", {"since": "x"}).status_code, 400)
+
+    def test_change_committed_after_a_later_one_was_served_is_not_skipped(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from booking import changes
+        from booking.models import Change, Material, RoomInventory
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user("doc", "doc@colegio.cl", "x"))
+        room = Room.objects.create(code="A")
+        early, late = (RoomInventory.objects.create(room=room, material=Material.objects.create(name=n), quantity=1) for n in "ab")
+        cursor = api.get("/api/changes/").json()["next"]
+        # Two transactions take ids in turn; the second commits first and is served
+        first_id = Change.objects.order_by("-pk").values_list("pk", flat=True).first() + 1
+        Change.objects.create(pk=first_id + 1, entity=changes.INVENTORY, object_id=late.pk, op=changes.UPSERT)
+        body = api.get("/api/changes/", {"since": cursor}).json()
+        self.assertEqual([c["id"] for c in body["changes"]], [late.pk])
+        # ... then the first one commits, with the lower id, and the client resumes from its cursor
+        Change.objects.create(pk=first_id, entity=changes.INVENTORY, object_id=early.pk, op=changes.UPSERT)
+        after = api.get("/api/changes/", {"since": body["next"]}).json()
+        self.assertEqual([c["id"] for c in after["changes"]], [early.pk])
+        self.assertGreater(after["next"], body["next"])
+
+    def test_polling_without_new_changes_takes_no_lock(self):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user("doc", "doc@colegio.cl", "x"))
+        Room.objects.create(code="A")
+        cursor = api.get("/api/changes/").json()["next"]
+        with self.assertNumQueries(3):  # unsequenced check, changes, group check
+            self.assertEqual(api.get("/api/changes/", {"since": cursor}).json(), {"changes": [], "next": cursor, "more": False})
+
+
+class AdminTests(TestCase):
+    def test_changelists_run_a_fixed_number_of_queries(self):
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from booking.models import Blackout, Material, ReservationItem
+        admin = User.objects.create_superuser("root", "root@colegio.cl", "x")
+        self.client.force_login(admin)
+        room, data = Room.objects.create(code="A"), Material.objects.create(name="data")
+
+        def add(n):
+            for i in range(n):
+                r = Reservation.objects.create(room=room, user=admin, date=date(2030, 3, 4 + i), start_time=time(9), end_time=time(10))
+                ReservationItem.objects.create(reservation=r, material=data)
+                Blackout.objects.create(room=room, reason="Reserva de root", start_datetime=r.start_at, end_datetime=r.end_at)
+
+        urls = ["/admin/booking/reservation/", "/admin/booking/reservationitem/", "/admin/booking/blackout/?origen=reserva"]
+        for url in urls:
+            self.client.get(url)  # warm up per-process caches (content types, session)
+        counts = []
+        for n in (1, 10):
+            add(n)
+            for url in urls:
+                with CaptureQueriesContext(connection) as ctx:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[:3], counts[3:])
+        self.assertContains(self.client.get(f"/admin/booking/reservation/{Reservation.objects.first().pk}/change/"), "data")
+
+
+class SuggestionTests(TestCase):
+    def test_nearest_free_slots_in_api_error_and_form_message(self):
+        from datetime import datetime
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+        from booking import suggestions
+        from booking.models import Blackout, Material, RoomInventory
+        teacher = User.objects.create_user("doc", "doc@colegio.cl", "x")
+        a, b = Room.objects.create(code="A"), Room.objects.create(code="B")
+        data = Material.objects.create(name="data")
+        RoomInventory.objects.create(room=a, material=data, quantity=1)
+        monday = date(2030, 3, 4)
+        Reservation.objects.create(room=a, user=teacher, date=monday, start_time=time(9), end_time=time(11))
+        Blackout.objects.create(room=None, reason="Consejo", start_datetime=timezone.make_aware(datetime.combine(monday, time(11))),
+                                end_datetime=timezone.make_aware(datetime.combine(monday, time(17))))
+        index = suggestions.IntervalIndex([(1, 3), (2, 4), (6, 7)])
+        self.assertEqual((index.starts, index.ends), ([1, 6], [4, 7]))
+        self.assertEqual([index.free(*slot) for slot in ((0, 1), (3, 5), (4, 6), (5, 7))], [True, False, True, False])
+
+        api = APIClient()
+        api.force_authenticate(teacher)
+        response = api.post("/api/reservations/", {"room": a.pk, "date": monday.isoformat(), "start_time": "09:00",
+                                                   "end_time": "10:00", "items": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(s["room_code"], s["start_time"]) for s in response.json()["suggestions"]],
+                         [("B", "09:00:00"), ("B", "08:30:00"), ("B", "09:30:00")])
+        self.assertEqual(response.json()["suggestions"][0], {"room": b.pk, "room_code": "B", "date": "2030-03-04",
+                                                             "start_time": "09:00:00", "end_time": "10:00:00"})
+        self.assertEqual(response.json()["non_field_errors"], ["El salón ya está ocupado en ese horario."])
+        # Only room A has the material: its free hours are 08:00 and (after the blackout) 17:00
+        with self.assertNumQueries(3):
+            free = suggestions.nearest(a, *Reservation.range_for(monday, time(9), time(10)), materials={data.pk: 1})
+        self.assertEqual([(s["room_code"], s["date"], s["start_time"]) for s in free],
+                         [("A", monday, time(8)), ("A", monday, time(17)), ("A", date(2030, 3, 5), time(8))])
+
+        self.client.force_login(teacher)
+        response = self.client.post("/reservas/nueva/", {"room": a.pk, "date": monday.isoformat(), "start_time": "09:00",
+                                                         "end_time": "10:00", f"qty_{data.pk}": 1}, follow=True)
+        self.assertContains(response, "Horarios libres cercanos: Salón A 04/03 08:00-09:00; Salón A 04/03 17:00-18:00")
+
+    def test_api_searches_suggestions_after_releasing_the_lock(self):
+        from types import SimpleNamespace
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from booking import suggestions
+        from booking.api.serializers import BookingConflict, ReservationSerializer
+        teacher = User.objects.create_user("doc", "doc@colegio.cl", "x")
+        room = Room.objects.create(code="A")
+        slot = {"room": room.pk, "date": "2030-03-04", "start_time": "09:00", "end_time": "10:00", "items": []}
+        serializer = ReservationSerializer(data=slot, context={"request": SimpleNamespace(user=teacher)})
+        self.assertTrue(serializer.is_valid())
+        # Another booking commits between validate() and the locked re-check
+        Reservation.objects.create(room=room, user=teacher, date=date(2030, 3, 4), start_time=time(9), end_time=time(10))
+        depth, seen = len(connection.atomic_blocks), []
+        with mock.patch.object(suggestions, "nearest", side_effect=lambda *a, **k: seen.append(len(connection.atomic_blocks)) or []):
+            with self.assertRaises(BookingConflict):
+                serializer.save()
+        self.assertEqual(seen, [depth])
+        self.assertEqual(Reservation.objects.count(), 1)
@@ -0,0 +1,102 @@
+"""Per-request timing: SQL, templates and named spans (PDF/Excel building).
+
+``ServerTimingMiddleware`` opens a ``RequestTimings`` in a context variable;
+the DB execute wrapper, ``TimedDjangoTemplates`` and ``span()`` add to it
+when one is active and do nothing otherwise. Cost per query is one
+``perf_counter`` pair and a list append.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+MAX_LOGGED_QUERIES = 500
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.spans = {}
+        self.query_log = []
+        self._template_depth = 0
+
+    def add_query(self, alias, sql, ms):
+        self.queries += 1
+        self.sql_ms += ms
+        if len(self.query_log) < MAX_LOGGED_QUERIES:
+            self.query_log.append((alias, ms, sql))
+
+    def add_span(self, name, ms):
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+
+def current():
+    return _current.get()
+
+
+def start():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Time a block of a view, e.g. ``with timing.span("pdf"): doc.build(...)``."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add_span(name, (time.perf_counter() - t0) * 1000)
+
+
+def query_timer(alias):
+    """Execute wrapper (``connection.execute_wrapper``) adding each query to the active timings."""
+    def wrapper(execute, sql, params, many, context):
+        timings = _current.get()
+        if timings is None:
+            return execute(sql, params, many, context)
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.add_query(alias, sql, (time.perf_counter() - t0) * 1000)
+    return wrapper
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        # Nested renders (render_to_string inside a tag) are already inside the outer one
+        if timings is None or timings._template_depth:
+            return super().render(context, request)
+        timings._template_depth += 1
+        t0 = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings._template_depth -= 1
+            timings.template_ms += (time.perf_counter() - t0) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
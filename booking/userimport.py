@@ -0,0 +1,158 @@
+"""Bulk creation of teacher accounts from a CSV.
+
+Used by ``manage.py import_users`` and the ``/usuarios/importar/`` upload.
+Columns (header row, ``;`` or ``,``): ``username``, ``email``, ``first_name``,
+``last_name`` and optionally ``password``. An empty password gets a random one,
+returned to the caller so it can be handed out.
+
+Every row is validated before anything is written. Existing usernames are
+skipped, so a list can be imported again after fixing errors. PBKDF2 dominates
+the cost, so passwords are hashed in a process pool. Users and their
+``Docente`` memberships are inserted with ``bulk_create``.
+"""
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import django
+from django.contrib.auth import password_validation
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.utils.crypto import get_random_string
+
+from .budgets import add_items
+from .validators import validate_institutional_email
+
+COLUMNS = ("username", "email", "first_name", "last_name")
+BATCH_SIZE = 500
+# Below this, starting the pool (a fresh interpreter per worker) costs more than it saves
+POOL_MIN_PASSWORDS = 8
+GENERATED_PASSWORD_LENGTH = 12
+
+
+@dataclass
+class ImportResult:
+    created: list = field(default_factory=list)     # usernames
+    skipped: list = field(default_factory=list)     # usernames that already exist
+    errors: list = field(default_factory=list)      # (line, message)
+    generated: dict = field(default_factory=dict)   # username -> generated password
+
+
+def read_rows(text):
+    """(line, row dict) pairs from CSV text; raises ValueError if required columns are missing"""
+    sample = text[:4096]
+    try:
+        dialect = csv.Sniffer().sniff(sample.splitlines()[0] if sample else "", delimiters=";,")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    header = [(name or "").strip().lower() for name in reader.fieldnames or ()]
+    missing = [c for c in COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"Faltan columnas: {', '.join(missing)}")
+    reader.fieldnames = header
+    rows = []
+    for row in reader:
+        row = {k: (row.get(k) or "").strip() for k in header if k}
+        if any(row.values()):
+            rows.append((reader.line_num, row))
+    return rows
+
+
+def _validate(rows, existing):
+    """Split rows into new users and skipped usernames; collect per-line errors"""
+    users, skipped, errors, seen = [], [], [], set()
+    for line, row in rows:
+        username, email = row["username"], row["email"]
+        if not username:
+            errors.append((line, "Falta el nombre de usuario."))
+            continue
+        if username.lower() in seen:
+            errors.append((line, f"Usuario {username} repetido en el archivo."))
+            continue
+        seen.add(username.lower())
+        if username.lower() in existing:
+            skipped.append(username)
+            continue
+        user = User(username=username, email=email, first_name=row["first_name"], last_name=row["last_name"],
+                    is_active=True)
+        try:
+            User._meta.get_field("username").run_validators(username)
+            validate_email(email)
+            validate_institutional_email(email)
+            if row.get("password"):
+                password_validation.validate_password(row["password"], user)
+        except ValidationError as e:
+            errors.append((line, f"{username}: {' '.join(e.messages)}"))
+            continue
+        users.append((user, row.get("password", "")))
+    return users, skipped, errors
+
+
+def hash_passwords(passwords, workers=None):
+    """make_password() for each password, spread over ``workers`` processes (default: every core)"""
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    if workers <= 1 or len(passwords) < POOL_MIN_PASSWORDS:
+        return [make_password(p) for p in passwords]
+    # spawn, not fork: a forked child would share (and could close) the parent's DB sockets.
+    # Workers only import django and its hashers, never this module (models need setup first).
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=django.setup) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def import_users(text, workers=None, dry_run=False):
+    """Validate and create the users in ``text`` (CSV). Nothing is written if any row has errors."""
+    result = ImportResult()
+    try:
+        rows = read_rows(text)
+    except ValueError as e:
+        result.errors.append((1, str(e)))
+        return result
+    usernames = [row["username"] for _, row in rows if row["username"]]
+    existing = {u.lower() for u in User.objects.filter(username__in=usernames).values_list("username", flat=True)}
+    users, result.skipped, result.errors = _validate(rows, existing)
+    if result.errors or dry_run or not users:
+        result.created = [] if result.errors else [u.username for u, _ in users]
+        return result
+
+    passwords = []
+    for user, password in users:
+        if not password:
+            password = result.generated[user.username] = get_random_string(GENERATED_PASSWORD_LENGTH)
+        passwords.append(password)
+    for (user, _), hashed in zip(users, hash_passwords(passwords, workers)):
+        user.password = hashed
+
+    objs = [u for u, _ in users]
+    with transaction.atomic():
+        add_items(-(-len(objs) // BATCH_SIZE))  # one INSERT per batch, for users and for memberships
+        User.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL returns no ids from bulk inserts
+            ids = dict(User.objects.filter(username__in=[u.username for u in objs]).values_list("username", "pk"))
+            for u in objs:
+                u.pk = ids[u.username]
+        docente, _ = Group.objects.get_or_create(name="Docente")
+        Membership = User.groups.through
+        Membership.objects.bulk_create([Membership(user_id=u.pk, group_id=docente.pk) for u in objs],
+                                       batch_size=BATCH_SIZE)
+    result.created = [u.username for u in objs]
+    return result
+
+
+def credentials_csv(result, stream):
+    """Write username;password for the generated passwords (utf-8-sig, like the report exports)"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text, delimiter=";")
+    writer.writerow(["username", "password"])
+    for username, password in result.generated.items():
+        writer.writerow([username, password])
+    text.flush()
+    text.detach()
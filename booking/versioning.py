@@ -0,0 +1,73 @@
+"""Version stamps for cached data, bumped by ``booking.signals`` on writes.
+
+A stamp is just a counter in the default cache. Cache keys and ETags embed the
+stamp, so bumping it invalidates every derived entry without deleting anything.
+With several workers the cache must be shared (see ``CACHES`` in settings).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+
+def _key(scope):
+    return f"booking:ver:{scope}"
+
+
+def get_version(scope):
+    key = _key(scope)
+    version = cache.get(key)
+    metrics.cache_lookup("version", version is not None)
+    if version is None:
+        # Seed from the clock so a flushed cache never reissues an old stamp
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = _key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def room_scope(room_id):
+    return f"room:{room_id}"
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+GLOBAL_BLACKOUTS = "blackouts:global"
+
+
+def model_scope(model):
+    return f"model:{model._meta.label_lower}"
+
+
+def models_changed(*models):
+    """Bump the stamps of ``models`` once the current transaction commits.
+
+    Signals call this on save/delete; writes that bypass signals (queryset
+    ``update()``, ``bulk_create``) must call it themselves.
+    """
+    scopes = [model_scope(m) for m in models]
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def fragment_version(*models):
+    """Cache-key part for a template fragment that reads ``models`` (one cache round trip when all are set)"""
+    keys = {model_scope(m): None for m in models}
+    found = cache.get_many([_key(scope) for scope in keys])
+    for scope in keys:
+        version = found.get(_key(scope))
+        if version is not None:
+            metrics.cache_lookup("version", True)
+        keys[scope] = version if version is not None else get_version(scope)
+    return ".".join(str(v) for v in keys.values())
@@ -1,28 +1,43 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.core.paginator import Paginator
 from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth import logout, login
 from django.contrib.auth.models import User
-from .forms import ReservationForm, BlackoutForm, MaterialForm, InventoryForm, InventoryUpdateForm, CustomUserCreationForm, AdminUserCreationForm
-from django.http import HttpResponse
+from .forms import ReservationForm, BlackoutForm, MaterialForm, InventoryForm, InventoryUpdateForm, CustomUserCreationForm, AdminUserCreationForm, UserImportForm
+from django.http import HttpResponse, StreamingHttpResponse, Http404, JsonResponse, FileResponse
+from django.core.cache import cache
+from django.utils.cache import quote_etag
+from django.views.decorators.http import condition
+from django.conf import settings
 from django.utils import timezone
-from datetime import time, datetime, date
-from django.db.models import Count, Sum, Q
+from django.utils.functional import SimpleLazyObject
+from datetime import time, datetime, date, timedelta
+from django.db import transaction
+from django.db.models import Q, F, Prefetch
 from .models import Room, Material, RoomInventory, Reservation, ReservationItem, Blackout
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+import functools
 import io
+import os
+import time as _time
+from . import archive, changes, conflicts, events, exports, ical, metrics, profiling, suggestions, timing, userimport, versioning
+from .routers import read_from_replica
+from .budgets import query_budget, add_items
+from .locking import lock_blackout, lock_room_ranges, take_stock
 
 def is_library_admin(user):
     return user.is_authenticated and (user.is_staff or user.groups.filter(name='AdminBiblioteca').exists())
 
+def _fragment(*models):
+    """Context for a ``{% cache fragment.timeout name fragment.version ... %}`` block that reads ``models``"""
+    return {'timeout': settings.FRAGMENT_CACHE_TIMEOUT, 'version': versioning.fragment_version(*models)}
+
+def _lazy_context(build, *keys):
+    """Context entries taken from ``build()``, which runs only if a template reads one of them (a fragment cache miss)"""
+    build = functools.cache(build)
+    return {key: SimpleLazyObject(lambda key=key: build()[key]) for key in keys}
+
+@query_budget(1)
 def index(request):
     # Redirect unauthenticated users to login
     if not request.user.is_authenticated:
@@ -37,6 +52,7 @@ def index(request):
         return redirect('reservation_list')
 
 @user_passes_test(lambda u: u.is_authenticated)
+@query_budget(10, per_item=2)
 def reservation_create(request):
     materials = Material.objects.order_by('name')
     if request.method == "POST":
@@ -46,91 +62,385 @@ def reservation_create(request):
             q = int(request.POST.get(f"qty_{m.id}", 0) or 0)
             if q > 0:
                 items.append((m.id, q))
+        add_items(len(items))
         if form.is_valid():
             room = form.cleaned_data["room"]
             date = form.cleaned_data["date"]
             start = form.cleaned_data["start_time"]
             end = form.cleaned_data["end_time"]
 
-            # Validaciones simples (choque de reservas)
-            exists = Reservation.objects.filter(room=room, date=date, start_time__lt=end, end_time__gt=start).exists()
-            if exists:
-                messages.error(request, "El salón ya está ocupado en ese horario.")
-                return redirect('reservation_create')
-
             # Validación horario laboral
             if not (time(8,0) <= start < time(18,0) and time(8,0) < end <= time(18,0)):
+                metrics.booking_rejected("html", "hours")
                 messages.error(request, "Horario permitido: 08:00 a 18:00.")
                 return redirect('reservation_create')
 
-            # Blackouts
-            from datetime import datetime as _dt
-            def _join(d,t): return _dt.combine(d,t)
-            start_dt = _join(date, start); end_dt = _join(date, end)
-            blackout_exists = Blackout.objects.filter(
-                room__isnull=True, start_datetime__lt=end_dt, end_datetime__gt=start_dt
-            ).exists() or Blackout.objects.filter(room=room, start_datetime__lt=end_dt, end_datetime__gt=start_dt).exists()
-            if blackout_exists:
+            r = Reservation(room=room, date=date, start_time=start, end_time=end, user=request.user)
+            r.sync_range()
+
+            # Checks and writes under the (room, date) lock: concurrent requests for
+            # the same slot are serialized, so only one of them can pass the checks
+            with transaction.atomic():
+                lock_room_ranges((room, r.start_at, r.end_at))
+
+                with metrics.observe(metrics.CONFLICT_CHECK, "html"):
+                    # Reservations and blackouts (global or per room) in one query
+                    conflict = conflicts.first_conflict(room, r.start_at, r.end_at)
+                if not conflict:
+                    # Stock
+                    for mid, qty in items:
+                        if not take_stock(room, mid, qty):
+                            transaction.set_rollback(True)
+                            metrics.booking_rejected("html", "stock")
+                            messages.error(request, "No hay stock suficiente de materiales para ese salón.")
+                            return redirect('reservation_create')
+                    changes.inventory_changed((room.pk, mid) for mid, _ in items)
+
+                    r.save()
+                    for mid, qty in items:
+                        ReservationItem.objects.create(reservation=r, material_id=mid, quantity=qty)
+
+                    # Create blackout for the reservation
+                    username = request.user.username
+                    Blackout.objects.create(
+                        room=room,
+                        start_datetime=r.start_at,
+                        end_datetime=r.end_at,
+                        reason=f"Reserva de {username}",
+                        created_by=request.user
+                    )
+
+            if conflict == conflicts.RESERVATION:
+                metrics.booking_rejected("html", "overlap")
+                messages.error(request, "El salón ya está ocupado en ese horario.")
+            if conflict == conflicts.BLACKOUT:
+                metrics.booking_rejected("html", "blackout")
                 messages.error(request, "Existe un bloqueo de agenda en ese horario (feriado/reunión).")
+            if conflict:
+                # Searched after the transaction, so the room/day lock is not held meanwhile
+                free = suggestions.nearest(room, r.start_at, r.end_at, materials=dict(items))
+                if free:
+                    messages.info(request, f"Horarios libres cercanos: {suggestions.as_text(free)}.")
                 return redirect('reservation_create')
 
-            # Stock
-            for mid, qty in items:
-                inv = RoomInventory.objects.filter(room=room, material_id=mid).first()
-                if not inv or inv.quantity < qty:
-                    messages.error(request, "No hay stock suficiente de materiales para ese salón.")
-                    return redirect('reservation_create')
-
-            r = Reservation.objects.create(room=room, date=date, start_time=start, end_time=end, user=request.user)
-            for mid, qty in items:
-                ReservationItem.objects.create(reservation=r, material_id=mid, quantity=qty)
-                inv = RoomInventory.objects.get(room=room, material_id=mid)
-                inv.quantity -= qty; inv.save()
-
-            # Create blackout for the reservation
-            start_dt = _join(date, start)
-            end_dt = _join(date, end)
-            username = request.user.username
-            Blackout.objects.create(
-                room=room,
-                start_datetime=start_dt,
-                end_datetime=end_dt,
-                reason=f"Reserva de {username}",
-                created_by=request.user
-            )
-
+            metrics.booking_created("html")
             messages.success(request, "Reserva creada con éxito.")
             return redirect('index')
+        metrics.booking_rejected("html", "invalid")
     else:
         form = ReservationForm()
     return render(request, 'reservation_form.html', {'form': form, 'materials': materials})
 
 
+RESERVATION_PAGE_SIZE = 25
+RESERVATION_RECENT_DAYS = 7     # default window: a week back...
+RESERVATION_UPCOMING_DAYS = 90  # ...and a term ahead
+
+
+def _parse_date(request, name, default):
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, "Formato de fecha inválido")
+        return default
+
+
+def _cursor(reservation):
+    return f"{reservation.date.isoformat()}_{reservation.start_time.isoformat()}_{reservation.pk}"
+
+
+def _parse_cursor(value):
+    """(date, start_time, id) from a _cursor() string, or None if missing or malformed"""
+    try:
+        d, t, pk = value.split('_')
+        return date.fromisoformat(d), time.fromisoformat(t), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _keyset_after(key):
+    # (date, start_time, id) > key, spelled out so every backend can use the composite index
+    d, t, pk = key
+    return Q(date__gt=d) | Q(date=d, start_time__gt=t) | Q(date=d, start_time=t, id__gt=pk)
+
+
+def _keyset_before(key):
+    d, t, pk = key
+    return Q(date__lt=d) | Q(date=d, start_time__lt=t) | Q(date=d, start_time=t, id__lt=pk)
+
+
+@read_from_replica
+@query_budget(5)
 def reservation_list(request):
-    """List reservations - teachers see only their own, admins see all"""
-    if request.user.is_authenticated:
-        # Check if user is admin (staff or AdminBiblioteca group)
-        if request.user.is_staff or request.user.groups.filter(name='AdminBiblioteca').exists():
-            # Admins can see all reservations
-            reservations = Reservation.objects.select_related('room', 'user').prefetch_related('items__material').order_by('-date', '-start_time')
-        else:
-            # Teachers (Docente group) and other users see only their own reservations
-            reservations = Reservation.objects.filter(user=request.user).select_related('room', 'user').prefetch_related('items__material').order_by('-date', '-start_time')
-    else:
+    """Reservations in a date window (default: last RESERVATION_RECENT_DAYS to next RESERVATION_UPCOMING_DAYS),
+    filterable by room, user and dates and keyset-paginated on (date, start_time, id).
+    Teachers see only their own, admins see all."""
+    if not request.user.is_authenticated:
         # Anonymous users see no reservations
-        reservations = Reservation.objects.none()
-    
-    return render(request, 'reservations/list.html', {'reservations': reservations})
+        return render(request, 'reservations/list.html', {'reservations': [], 'ical_token': None})
+    is_admin = is_library_admin(request.user)
+    today = date.today()
+    date_from = _parse_date(request, 'desde', today - timedelta(days=RESERVATION_RECENT_DAYS))
+    date_to = _parse_date(request, 'hasta', today + timedelta(days=RESERVATION_UPCOMING_DAYS))
+    room_filter = request.GET.get('room', '')
+    user_filter = request.GET.get('usuario', '').strip() if is_admin else ''
+
+    reservations = Reservation.objects.filter(date__gte=date_from, date__lte=date_to)
+    if not is_admin:
+        reservations = reservations.filter(user=request.user)
+    elif user_filter:
+        reservations = reservations.filter(user__username__icontains=user_filter)
+    if room_filter.isdigit():
+        reservations = reservations.filter(room_id=room_filter)
+
+    after, before = _parse_cursor(request.GET.get('despues')), _parse_cursor(request.GET.get('antes'))
+    if before:
+        reservations = reservations.filter(_keyset_before(before)).order_by('-date', '-start_time', '-id')
+    else:
+        if after:
+            reservations = reservations.filter(_keyset_after(after))
+        reservations = reservations.order_by('date', 'start_time', 'id')
+    page = list(reservations.select_related('room', 'user').prefetch_related(
+        Prefetch('items', queryset=ReservationItem.objects.select_related('material'))
+    )[:RESERVATION_PAGE_SIZE + 1])
+    more = len(page) > RESERVATION_PAGE_SIZE
+    page = page[:RESERVATION_PAGE_SIZE]
+    if before:
+        page.reverse()
+        has_previous, has_next = more, True
+    else:
+        has_previous, has_next = bool(after), more
+
+    querystring = request.GET.copy()
+    querystring.pop('despues', None)
+    querystring.pop('antes', None)
+    return render(request, 'reservations/list.html', {
+        'reservations': page,
+        'ical_token': ical.user_token(request.user),
+        'is_admin': is_admin,
+        'rooms': Room.objects.order_by('code'),
+        'room_filter': room_filter,
+        'user_filter': user_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+        'previous_cursor': _cursor(page[0]) if page and has_previous else None,
+        'next_cursor': _cursor(page[-1]) if page and has_next else None,
+        'querystring': querystring.urlencode(),
+    })
+
+@user_passes_test(lambda u: u.is_authenticated)
+@query_budget(0)
+def events_stream(request, room_id=None):
+    """Server-Sent Events with reservation/blackout changes, globally or for one room"""
+    hub = events.get_hub()
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_id")
+    try:
+        last_id = int(last_id)
+    except (TypeError, ValueError):
+        last_id = hub.last_id()
+    heartbeat = getattr(settings, "BOOKING_EVENTS_HEARTBEAT", 15)
+    # Streams are recycled so a worker thread is never held forever; EventSource reconnects with Last-Event-ID
+    max_age = getattr(settings, "BOOKING_EVENTS_MAX_STREAM_SECONDS", 300)
+
+    def stream(after):
+        yield "retry: 3000\n: conectado\n\n"
+        started = last_write = _time.monotonic()
+        while last_write - started < max_age:
+            after, batch = hub.read(after, room_id=room_id, timeout=heartbeat)
+            for event in batch:
+                yield events.format_sse(event)
+            if batch or _time.monotonic() - last_write >= heartbeat:
+                if not batch:
+                    yield ": keepalive\n\n"
+                last_write = _time.monotonic()
+
+    response = StreamingHttpResponse(stream(last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: do not buffer the stream
+    return response
+
+# iCalendar feeds: ETag = version stamps + window, body cached under the same key
+def _ical_response(etag, filename, build):
+    key = f"booking:ical:{etag}"
+    body = cache.get(key)
+    metrics.cache_lookup("ical", body is not None)
+    if body is None:
+        body = "".join(build())
+        cache.set(key, body, getattr(settings, "ICAL_CACHE_TIMEOUT", 86400))
+    response = HttpResponse(body, content_type="text/calendar; charset=utf-8")
+    response["Content-Disposition"] = f'inline; filename="{filename}"'
+    response["ETag"] = quote_etag(etag)
+    response["Cache-Control"] = "private, max-age=300"
+    return response
+
+
+def _room_feed_etag(request, room_id):
+    window_start, _ = ical.feed_window()
+    return "room-{}-{}-{}-{:%Y%m%d}".format(
+        room_id,
+        versioning.get_version(versioning.room_scope(room_id)),
+        versioning.get_version(versioning.GLOBAL_BLACKOUTS),
+        window_start,
+    )
+
+
+def _user_feed_etag(request, token):
+    user_id = ical.user_id_from_token(token)
+    if user_id is None:
+        return None
+    window_start, _ = ical.feed_window()
+    return "user-{}-{}-{:%Y%m%d}".format(user_id, versioning.get_version(versioning.user_scope(user_id)), window_start)
+
+
+@condition(etag_func=_room_feed_etag)
+@query_budget(3)
+def room_calendar_feed(request, room_id):
+    """Public .ics feed with a room's reservations and blackouts (no user data)"""
+    room = get_object_or_404(Room, pk=room_id)
+    etag = _room_feed_etag(request, room_id)
+    return _ical_response(etag, f"salon_{room.code}.ics", lambda: ical.room_feed(room, ical.feed_window()))
+
+
+@condition(etag_func=_user_feed_etag)
+@query_budget(2)
+def user_calendar_feed(request, token):
+    """Personal .ics feed; the signed token replaces login for calendar apps"""
+    user_id = ical.user_id_from_token(token)
+    if user_id is None:
+        raise Http404
+    user = get_object_or_404(User, pk=user_id, is_active=True)
+    etag = _user_feed_etag(request, token)
+    return _ical_response(etag, "mis_reservas.ics", lambda: ical.user_feed(user, ical.feed_window()))
+
+CALENDAR_DAYS = 5          # Monday to Friday
+CALENDAR_FIRST_HOUR = 8    # widened when a booking of the week starts earlier...
+CALENDAR_LAST_HOUR = 18    # ...or ends later
+
+
+def _week_grid(days, rooms, ranges):
+    """Day -> hour slot -> room grid; each cell lists the reservations and blackouts overlapping that hour.
+
+    ``ranges`` are (kind, room_id or None for every room, local start datetime, local end datetime, label)
+    rows; a range spanning midnight or several days shows up on each day it touches.
+    """
+    entries = {}
+    for kind, room_id, start_dt, end_dt, label in ranges:
+        last_day = (end_dt - timedelta(microseconds=1)).date()  # a range ending at 00:00 does not touch that day
+        for day in days:
+            if start_dt.date() <= day <= last_day:
+                start = start_dt.time() if start_dt.date() == day else time.min
+                end = end_dt.time() if end_dt.date() == day else time.max
+                for room in ([room_id] if room_id else [r.pk for r in rooms]):
+                    entries.setdefault((day, room), []).append({"kind": kind, "start": start, "end": end, "label": label})
+    first, last = CALENDAR_FIRST_HOUR, CALENDAR_LAST_HOUR
+    for items in entries.values():
+        for e in items:
+            first = min(first, e["start"].hour)
+            last = max(last, e["end"].hour + (1 if e["end"].minute or e["end"].second else 0))
+    hours = range(first, min(last, 24))
+    grid = []
+    for day in days:
+        rows = []
+        for hour in hours:
+            slot_start, slot_end = time(hour), time(hour + 1) if hour < 23 else time.max
+            rows.append({"slot": slot_start, "cells": [
+                sorted((e for e in entries.get((day, room.pk), ()) if e["start"] < slot_end and e["end"] > slot_start),
+                       key=lambda e: e["start"])
+                for room in rooms
+            ]})
+        grid.append({"date": day, "rows": rows})
+    return grid
+
+
+@user_passes_test(is_library_admin)
+@read_from_replica
+@query_budget(3)
+def week_calendar(request):
+    """All rooms for one week (?semana=<any day of it>), one query each for rooms, reservations and blackouts"""
+    week = _parse_date(request, 'semana', date.today())
+    monday = week - timedelta(days=week.weekday())
+    days = [monday + timedelta(days=i) for i in range(CALENDAR_DAYS)]
+
+    def build():
+        rooms = list(Room.objects.order_by('code'))
+        tz = timezone.get_current_timezone()
+        week_start = timezone.make_aware(datetime.combine(days[0], time.min), tz)
+        week_end = timezone.make_aware(datetime.combine(days[-1] + timedelta(days=1), time.min), tz)
+        reservations = Reservation.objects.filter(start_at__lt=week_end, end_at__gt=week_start).values_list(
+            'room_id', 'start_at', 'end_at', 'user__username')
+        blackouts = Blackout.objects.filter(
+            start_datetime__lt=week_end, end_datetime__gt=week_start
+        ).exclude(reason__startswith='Reserva de').values_list('room_id', 'start_datetime', 'end_datetime', 'reason')
+        ranges = [(conflicts.RESERVATION, room_id, timezone.localtime(start, tz), timezone.localtime(end, tz), username or "Anónimo")
+                  for room_id, start, end, username in reservations]
+        ranges += [(conflicts.BLACKOUT, room_id, timezone.localtime(start, tz), timezone.localtime(end, tz), reason or "Bloqueo")
+                   for room_id, start, end, reason in blackouts]
+        return {'rooms': rooms, 'grid': _week_grid(days, rooms, ranges)}
+
+    return render(request, 'calendar/week.html', {
+        **_lazy_context(build, 'rooms', 'grid'),
+        'monday': monday,
+        'friday': days[-1],
+        'previous_week': monday - timedelta(days=7),
+        'next_week': monday + timedelta(days=7),
+        'fragment': _fragment(Reservation, Blackout, Room),
+    })
 
 @user_passes_test(is_library_admin)
+@read_from_replica
+@query_budget(3)
 def blackout_list(request):
     # Only show administrative blackouts, not reservation-generated ones
-    items = Blackout.objects.select_related('room').exclude(
+    items = Blackout.objects.select_related('room', 'created_by').exclude(
         reason__startswith='Reserva de'
     ).order_by('-start_datetime')
-    return render(request, 'blackouts/list.html', {'items': items})
+    return render(request, 'blackouts/list.html', {'items': items, 'fragment': _fragment(Blackout, Room, User)})
+
+def _cancel_overlapping_reservations(blackout):
+    """Delete the reservations a blackout overlaps (every room if global) and return their stock; returns how many.
+
+    Call inside the transaction that saves ``blackout``.
+    """
+    overlapping_reservations = Reservation.objects.filter(
+        start_at__lt=blackout.end_datetime,
+        end_at__gt=blackout.start_datetime
+    ).select_related('user').prefetch_related('items')
+    if blackout.room:
+        # Room-specific blackout
+        overlapping_reservations = overlapping_reservations.filter(room=blackout.room)
+
+    cancelled_count = 0
+    restocked = []
+    for reservation in overlapping_reservations:
+        # Restore inventory for cancelled reservation
+        items = reservation.items.all()
+        for item in items:
+            RoomInventory.objects.filter(
+                room_id=reservation.room_id, material_id=item.material_id
+            ).update(quantity=F('quantity') + item.quantity)
+            restocked.append((reservation.room_id, item.material_id))
+        if items:
+            versioning.models_changed(RoomInventory)
+        add_items(1 + len(items))
+
+        # Delete the reservation-generated blackout
+        Blackout.objects.filter(
+            room_id=reservation.room_id,
+            reason=f"Reserva de {reservation.user.username}",
+            start_datetime=reservation.start_at,
+            end_datetime=reservation.end_at
+        ).delete()
+
+        reservation.delete()
+        cancelled_count += 1
+    changes.inventory_changed(restocked)
+    return cancelled_count
 
 @user_passes_test(is_library_admin)
+@query_budget(11, per_item=2)  # per item: a locked (room, day) or a cancelled reservation/item
 def blackout_create(request):
     if request.method == "POST":
         form = BlackoutForm(request.POST)
@@ -138,51 +448,12 @@ def blackout_create(request):
             obj = form.save(commit=False)
             obj.created_by = request.user
             
-            # Cancel overlapping reservations before saving the blackout
-            from datetime import datetime as _dt
-            start_dt = obj.start_datetime
-            end_dt = obj.end_datetime
-            
-            # Find overlapping reservations
-            if obj.room:
-                # Room-specific blackout
-                overlapping_reservations = Reservation.objects.filter(
-                    room=obj.room,
-                    date=start_dt.date(),
-                    start_time__lt=end_dt.time(),
-                    end_time__gt=start_dt.time()
-                )
-            else:
-                # Global blackout affects all rooms
-                overlapping_reservations = Reservation.objects.filter(
-                    date=start_dt.date(),
-                    start_time__lt=end_dt.time(),
-                    end_time__gt=start_dt.time()
-                )
-            
-            cancelled_count = 0
-            for reservation in overlapping_reservations:
-                # Restore inventory for cancelled reservation
-                for item in reservation.items.all():
-                    inventory = RoomInventory.objects.get(
-                        room=reservation.room, 
-                        material=item.material
-                    )
-                    inventory.quantity += item.quantity
-                    inventory.save()
-                
-                # Delete the reservation-generated blackout
-                Blackout.objects.filter(
-                    room=reservation.room,
-                    reason=f"Reserva de {reservation.user.username}",
-                    start_datetime=_dt.combine(reservation.date, reservation.start_time),
-                    end_datetime=_dt.combine(reservation.date, reservation.end_time)
-                ).delete()
-                
-                reservation.delete()
-                cancelled_count += 1
-            
-            obj.save()
+            # Under the booking locks of its days, so no reservation commits into the
+            # blackout between the cancellations and its save
+            with transaction.atomic():
+                add_items(lock_blackout(obj))
+                cancelled_count = _cancel_overlapping_reservations(obj)
+                obj.save()
             
             if cancelled_count > 0:
                 messages.success(request, f"Bloqueo creado. Se cancelaron {cancelled_count} reserva(s) que se solapaban.")
@@ -194,6 +465,7 @@ def blackout_create(request):
     return render(request, 'blackouts/form.html', {'form': form, 'title': 'Nuevo bloqueo'})
 
 @user_passes_test(is_library_admin)
+@query_budget(6, per_item=2)
 def blackout_update(request, pk):
     obj = get_object_or_404(Blackout, pk=pk)
     if request.method == "POST":
@@ -201,51 +473,10 @@ def blackout_update(request, pk):
         if form.is_valid():
             updated_obj = form.save(commit=False)
             
-            # Cancel overlapping reservations with the updated blackout
-            from datetime import datetime as _dt
-            start_dt = updated_obj.start_datetime
-            end_dt = updated_obj.end_datetime
-            
-            # Find overlapping reservations
-            if updated_obj.room:
-                # Room-specific blackout
-                overlapping_reservations = Reservation.objects.filter(
-                    room=updated_obj.room,
-                    date=start_dt.date(),
-                    start_time__lt=end_dt.time(),
-                    end_time__gt=start_dt.time()
-                )
-            else:
-                # Global blackout affects all rooms
-                overlapping_reservations = Reservation.objects.filter(
-                    date=start_dt.date(),
-                    start_time__lt=end_dt.time(),
-                    end_time__gt=start_dt.time()
-                )
-            
-            cancelled_count = 0
-            for reservation in overlapping_reservations:
-                # Restore inventory for cancelled reservation
-                for item in reservation.items.all():
-                    inventory = RoomInventory.objects.get(
-                        room=reservation.room, 
-                        material=item.material
-                    )
-                    inventory.quantity += item.quantity
-                    inventory.save()
-                
-                # Delete the reservation-generated blackout
-                Blackout.objects.filter(
-                    room=reservation.room,
-                    reason=f"Reserva de {reservation.user.username}",
-                    start_datetime=_dt.combine(reservation.date, reservation.start_time),
-                    end_datetime=_dt.combine(reservation.date, reservation.end_time)
-                ).delete()
-                
-                reservation.delete()
-                cancelled_count += 1
-            
-            updated_obj.save()
+            with transaction.atomic():
+                add_items(lock_blackout(updated_obj))
+                cancelled_count = _cancel_overlapping_reservations(updated_obj)
+                updated_obj.save()
             
             if cancelled_count > 0:
                 messages.success(request, f"Bloqueo actualizado. Se cancelaron {cancelled_count} reserva(s) que se solapaban.")
@@ -257,21 +488,26 @@ def blackout_update(request, pk):
     return render(request, 'blackouts/form.html', {'form': form, 'title': 'Editar bloqueo'})
 
 @user_passes_test(is_library_admin)
+@query_budget(3)
 def blackout_delete(request, pk):
     obj = get_object_or_404(Blackout, pk=pk)
     if request.method == "POST":
-        obj.delete()
+        with transaction.atomic():
+            obj.delete()
         messages.success(request, "Bloqueo eliminado.")
         return redirect('blackout_list')
-    return render(request, 'blackouts/delete.html', {'obj': obj})
+    return render(request, 'blackouts/confirm_delete.html', {'obj': obj})
 
 # Material Management Views
 @user_passes_test(is_library_admin)
+@read_from_replica
+@query_budget(1)
 def material_list(request):
     materials = Material.objects.order_by('name')
-    return render(request, 'materials/list.html', {'materials': materials})
+    return render(request, 'materials/list.html', {'materials': materials, 'fragment': _fragment(Material)})
 
 @user_passes_test(is_library_admin)
+@query_budget(2)
 def material_create(request):
     if request.method == "POST":
         form = MaterialForm(request.POST)
@@ -284,6 +520,7 @@ def material_create(request):
     return render(request, 'materials/form.html', {'form': form, 'title': 'Nuevo Material'})
 
 @user_passes_test(is_library_admin)
+@query_budget(3)
 def material_update(request, pk):
     material = get_object_or_404(Material, pk=pk)
     if request.method == "POST":
@@ -297,6 +534,7 @@ def material_update(request, pk):
     return render(request, 'materials/form.html', {'form': form, 'title': 'Editar Material'})
 
 @user_passes_test(is_library_admin)
+@query_budget(4)  # PROTECT checks reservation items, live and archived
 def material_delete(request, pk):
     material = get_object_or_404(Material, pk=pk)
     if request.method == "POST":
@@ -309,18 +547,59 @@ def material_delete(request, pk):
     return render(request, 'materials/delete.html', {'material': material})
 
 # Inventory Management Views
+INVENTORY_PAGE_SIZE = 25  # materials (matrix rows) per page
+
+
+def _inventory_matrix(rooms, materials, rows):
+    """Dense material x room grid from (id, room_id, material_id, quantity) rows; missing pairs are None cells"""
+    cells = {(room_id, material_id): (pk, quantity) for pk, room_id, material_id, quantity in rows}
+    matrix = []
+    totals = [0] * len(rooms)
+    for material in materials:
+        row = []
+        for i, room in enumerate(rooms):
+            pk, quantity = cells.get((room.pk, material.pk), (None, 0))
+            totals[i] += quantity
+            row.append({"id": pk, "quantity": quantity, "room": room})
+        matrix.append({"material": material, "cells": row})
+    return matrix, totals
+
+
 @user_passes_test(is_library_admin)
+@read_from_replica
+@query_budget(4)
 def inventory_list(request):
-    inventory = RoomInventory.objects.select_related('room', 'material').order_by('room__code', 'material__name')
-    rooms = Room.objects.order_by('code')
-    materials = Material.objects.order_by('name')
+    """Room x material matrix, paginated by material and filterable by room and material name"""
+    room_filter = request.GET.get('room', '')
+    q = request.GET.get('q', '').strip()
+
+    def build():
+        rooms = list(Room.objects.order_by('code'))
+        shown_rooms = [r for r in rooms if str(r.pk) == room_filter] or rooms
+        materials = Material.objects.order_by('name')
+        if q:
+            materials = materials.filter(name__icontains=q)
+        page = Paginator(materials, INVENTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+        # One query for the whole page, pivoted in Python
+        rows = RoomInventory.objects.filter(
+            material__in=[m.pk for m in page], room__in=[r.pk for r in shown_rooms]
+        ).values_list('id', 'room_id', 'material_id', 'quantity')
+        matrix, totals = _inventory_matrix(shown_rooms, page, rows)
+        return {'rooms': rooms, 'shown_rooms': shown_rooms, 'room_totals': totals, 'matrix': matrix, 'page': page}
+
+    querystring = request.GET.copy()
+    querystring.pop('page', None)
     return render(request, 'inventory/list.html', {
-        'inventory': inventory,
-        'rooms': rooms,
-        'materials': materials
+        **_lazy_context(build, 'rooms', 'shown_rooms', 'room_totals', 'matrix', 'page'),
+        'room_filter': room_filter,
+        'q': q,
+        'querystring': querystring.urlencode(),
+        'fragment': _fragment(Room, Material, RoomInventory),
+        'fragment_key': request.GET.urlencode(),
     })
 
 @user_passes_test(is_library_admin)
+@query_budget(8)
 def inventory_create(request):
     if request.method == "POST":
         form = InventoryForm(request.POST)
@@ -332,7 +611,8 @@ def inventory_create(request):
             if existing:
                 messages.error(request, f"Ya existe inventario para {material.name} en salón {room.code}")
                 return render(request, 'inventory/form.html', {'form': form, 'title': 'Agregar Inventario'})
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, "Inventario agregado exitosamente.")
             return redirect('inventory_list')
     else:
@@ -340,6 +620,7 @@ def inventory_create(request):
     return render(request, 'inventory/form.html', {'form': form, 'title': 'Agregar Inventario'})
 
 @user_passes_test(is_library_admin)
+@query_budget(5)
 def inventory_update(request, pk):
     inventory = get_object_or_404(RoomInventory, pk=pk)
     if request.method == "POST":
@@ -359,7 +640,8 @@ def inventory_update(request, pk):
             elif action == 'set':
                 inventory.quantity = quantity
             
-            inventory.save()
+            with transaction.atomic():
+                inventory.save()
             messages.success(request, f"Inventario actualizado: {inventory.material.name} en salón {inventory.room.code}")
             return redirect('inventory_list')
     else:
@@ -367,14 +649,50 @@ def inventory_update(request, pk):
     return render(request, 'inventory/update.html', {'form': form, 'inventory': inventory})
 
 @user_passes_test(is_library_admin)
+@query_budget(3)
 def inventory_delete(request, pk):
     inventory = get_object_or_404(RoomInventory, pk=pk)
     if request.method == "POST":
-        inventory.delete()
+        with transaction.atomic():
+            inventory.delete()
         messages.success(request, "Inventario eliminado exitosamente.")
         return redirect('inventory_list')
     return render(request, 'inventory/delete.html', {'item': inventory})
 
+@user_passes_test(is_library_admin)
+@query_budget(0)
+def db_pool_stats(request):
+    """Connection pool counters of the worker process that answers (mysql_pool backend)"""
+    from .db.pool import all_stats
+    return JsonResponse({"pid": os.getpid(), "pools": all_stats()})
+
+@user_passes_test(lambda u: u.is_staff)
+@query_budget(0)
+def profile_list(request):
+    """Stored request profiles, newest first (see booking.profiling)"""
+    return JsonResponse({"profiles": profiling.list_profiles()})
+
+@user_passes_test(lambda u: u.is_staff)
+@query_budget(0)
+def profile_download(request, name, fmt):
+    path = profiling.profile_file(name, fmt)
+    if path is None:
+        raise Http404
+    content_type = "text/plain; charset=utf-8" if fmt == "txt" else "application/octet-stream"
+    return FileResponse(open(path, "rb"), content_type=content_type, as_attachment=fmt == "prof", filename=path.name)
+
+@query_budget(0)
+def metrics_view(request):
+    """Prometheus text exposition; requires "Authorization: Bearer <METRICS_TOKEN>" (open without a token only in DEBUG)"""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token and not settings.DEBUG:
+        return HttpResponse("Defina METRICS_TOKEN para habilitar /metrics.", status=403, content_type="text/plain; charset=utf-8")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    body, content_type = metrics.exposition()
+    return HttpResponse(body, content_type=content_type)
+
+@query_budget(3)
 def custom_logout(request):
     """Custom logout view that properly clears session and forces redirect"""
     logout(request)
@@ -389,6 +707,7 @@ def custom_logout(request):
     return response
 
 
+@query_budget(9)
 def user_register(request):
     """User registration view"""
     if request.method == 'POST':
@@ -404,6 +723,8 @@ def user_register(request):
 
 
 @user_passes_test(is_library_admin)
+@read_from_replica
+@query_budget(2)
 def user_list(request):
     """List all users - only accessible to admins"""
     users = User.objects.select_related().prefetch_related('groups').order_by('username')
@@ -411,6 +732,7 @@ def user_list(request):
 
 
 @user_passes_test(is_library_admin)
+@query_budget(2)
 def user_create(request):
     """Create new user - only accessible to admins"""
     if request.method == 'POST':
@@ -425,6 +747,32 @@ def user_create(request):
 
 
 @user_passes_test(is_library_admin)
+@query_budget(4, per_item=2)
+def user_import(request):
+    """Bulk teacher import from a CSV (see booking.userimport); generated passwords come back as a CSV download"""
+    result = None
+    if request.method == 'POST':
+        form = UserImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            result = userimport.import_users(form.cleaned_data['csv_file'], dry_run=form.cleaned_data['dry_run'])
+            if not result.errors and not form.cleaned_data['dry_run']:
+                messages.success(request, f"{len(result.created)} docentes importados"
+                                          f"{f', {len(result.skipped)} ya existían' if result.skipped else ''}.")
+                if not result.generated:
+                    return redirect('user_list')
+                buffer = io.BytesIO()
+                userimport.credentials_csv(result, buffer)
+                response = HttpResponse(buffer.getvalue(), content_type="text/csv; charset=utf-8")
+                response['Content-Disposition'] = 'attachment; filename="credenciales_docentes.csv"'
+                return response
+    else:
+        form = UserImportForm()
+    return render(request, 'users/import.html', {'form': form, 'result': result})
+
+
+@user_passes_test(is_library_admin)
+@read_from_replica
+@query_budget(4)
 def reports_view(request):
     """Reports view with date range and room filters"""
     # Get filter parameters
@@ -450,32 +798,12 @@ def reports_view(request):
         start_date = start_date_obj.strftime('%Y-%m-%d')
         end_date = end_date_obj.strftime('%Y-%m-%d')
     
-    # Base queryset for reservations in date range
-    reservations_qs = Reservation.objects.filter(
-        date__gte=start_date_obj,
-        date__lte=end_date_obj
-    )
-    
-    # Apply room filter if specified
-    if room_filter:
-        reservations_qs = reservations_qs.filter(room_id=room_filter)
-    
-    # Report 1: Reservations by room (count)
-    room_stats = reservations_qs.values(
-        'room__code'
-    ).annotate(
-        reservation_count=Count('id')
-    ).order_by('room__code')
-    
-    # Report 2: Materials requested (sum by type)
-    material_stats = ReservationItem.objects.filter(
-        reservation__in=reservations_qs
-    ).values(
-        'material__name'
-    ).annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('material__name')
-    
+    # Reservations by room (count) and materials requested (sum by type), archive
+    # included when the range reaches it; only computed on a fragment cache miss
+    def build():
+        total, room_stats, material_stats = archive.report_stats(start_date_obj, end_date_obj, room_filter)
+        return {'total_reservations': total, 'room_stats': room_stats, 'material_stats': material_stats}
+
     # Get all rooms for filter dropdown
     rooms = Room.objects.order_by('code')
     
@@ -483,199 +811,35 @@ def reports_view(request):
         'start_date': start_date,
         'end_date': end_date,
         'room_filter': room_filter,
-        'room_stats': room_stats,
-        'material_stats': material_stats,
+        **_lazy_context(build, 'total_reservations', 'room_stats', 'material_stats'),
         'rooms': rooms,
-        'total_reservations': reservations_qs.count(),
-        'date_range_display': f"{start_date_obj.strftime('%d/%m/%Y')} - {end_date_obj.strftime('%d/%m/%Y')}"
+        'date_range_display': f"{start_date_obj.strftime('%d/%m/%Y')} - {end_date_obj.strftime('%d/%m/%Y')}",
+        'fragment': _fragment(Reservation, ReservationItem, Room, Material),
     }
     
     return render(request, 'reports/dashboard.html', context)
 
 
 @user_passes_test(is_library_admin)
-def export_reports_pdf(request):
-    """Export reports data to PDF"""
-    # Get the same filter parameters as reports_view
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    room_filter = request.GET.get('room')
-    
-    # Default to current month if no dates provided
-    if not start_date or not end_date:
-        today = date.today()
-        start_date = today.replace(day=1).strftime('%Y-%m-%d')
-        end_date = today.strftime('%Y-%m-%d')
-    
-    # Parse dates
+@read_from_replica
+@query_budget(3)
+def export_reports(request, fmt):
+    """Export reports data with the renderer registered for ``fmt`` (see booking.exports)"""
     try:
-        start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-        end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-    except ValueError:
-        today = date.today()
-        start_date_obj = today.replace(day=1)
-        end_date_obj = today
-    
-    # Get the same data as reports_view
-    reservations_qs = Reservation.objects.filter(
-        date__gte=start_date_obj,
-        date__lte=end_date_obj
-    )
-    
-    if room_filter:
-        reservations_qs = reservations_qs.filter(room_id=room_filter)
-    
-    room_stats = reservations_qs.values(
-        'room__code'
-    ).annotate(
-        reservation_count=Count('id')
-    ).order_by('room__code')
-    
-    material_stats = ReservationItem.objects.filter(
-        reservation__in=reservations_qs
-    ).values(
-        'material__name'
-    ).annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('material__name')
-    
-    # Check if there's data to export
-    if not reservations_qs.exists():
-        messages.error(request, "No hay datos para exportar en el período seleccionado.")
-        return redirect('reports')
-    
-    # Create PDF
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="reporte_biblioteca_{start_date}_{end_date}.pdf"'
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    
-    # Title
-    title = Paragraph("Reporte de Biblioteca", title_style)
-    elements.append(title)
-    
-    # Date range
-    date_range = Paragraph(
-        f"Período: {start_date_obj.strftime('%d/%m/%Y')} - {end_date_obj.strftime('%d/%m/%Y')}",
-        styles['Normal']
-    )
-    elements.append(date_range)
-    elements.append(Spacer(1, 20))
-    
-    # Summary stats
-    summary_data = [
-        ['Métrica', 'Valor'],
-        ['Total de reservas', str(reservations_qs.count())],
-        ['Salones utilizados', str(len(room_stats))],
-        ['Tipos de materiales', str(len(material_stats))]
-    ]
-    
-    summary_table = Table(summary_data)
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(summary_table)
-    elements.append(Spacer(1, 30))
-    
-    # Room statistics
-    elements.append(Paragraph("Reservas por Salón", styles['Heading2']))
-    elements.append(Spacer(1, 12))
-    
-    if room_stats:
-        room_data = [['Código de Salón', 'Cantidad de Reservas']]
-        for stat in room_stats:
-            room_data.append([
-                f"Salón {stat['room__code']}",
-                str(stat['reservation_count'])
-            ])
-        
-        room_table = Table(room_data)
-        room_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(room_table)
-    else:
-        elements.append(Paragraph("No hay datos de reservas para el período seleccionado.", styles['Normal']))
-    
-    elements.append(Spacer(1, 30))
-    
-    # Material statistics
-    elements.append(Paragraph("Materiales Solicitados", styles['Heading2']))
-    elements.append(Spacer(1, 12))
-    
-    if material_stats:
-        material_data = [['Material', 'Cantidad Total Solicitada']]
-        for stat in material_stats:
-            material_data.append([
-                stat['material__name'],
-                str(stat['total_quantity'])
-            ])
-        
-        material_table = Table(material_data)
-        material_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(material_table)
-    else:
-        elements.append(Paragraph("No hay datos de materiales para el período seleccionado.", styles['Normal']))
-    
-    # Build PDF
-    doc.build(elements)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    
-    return response
-
-
-@user_passes_test(is_library_admin)
-def export_reports_excel(request):
-    """Export reports data to Excel"""
+        renderer = exports.get_renderer(fmt)
+    except KeyError:
+        raise Http404
     # Get the same filter parameters as reports_view
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     room_filter = request.GET.get('room')
-    
+
     # Default to current month if no dates provided
     if not start_date or not end_date:
         today = date.today()
         start_date = today.replace(day=1).strftime('%Y-%m-%d')
         end_date = today.strftime('%Y-%m-%d')
-    
+
     # Parse dates
     try:
         start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -684,132 +848,25 @@ def export_reports_excel(request):
         today = date.today()
         start_date_obj = today.replace(day=1)
         end_date_obj = today
-    
+
     # Get the same data as reports_view
-    reservations_qs = Reservation.objects.filter(
-        date__gte=start_date_obj,
-        date__lte=end_date_obj
-    )
-    
-    if room_filter:
-        reservations_qs = reservations_qs.filter(room_id=room_filter)
-    
-    room_stats = reservations_qs.values(
-        'room__code'
-    ).annotate(
-        reservation_count=Count('id')
-    ).order_by('room__code')
-    
-    material_stats = ReservationItem.objects.filter(
-        reservation__in=reservations_qs
-    ).values(
-        'material__name'
-    ).annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('material__name')
-    
+    total, room_stats, material_stats = archive.report_stats(start_date_obj, end_date_obj, room_filter)
     # Check if there's data to export
-    if not reservations_qs.exists():
+    if not total:
         messages.error(request, "No hay datos para exportar en el período seleccionado.")
         return redirect('reports')
-    
-    # Create Excel workbook
-    wb = Workbook()
-    
-    # Remove default sheet
-    wb.remove(wb.active)
-    
-    # Create summary sheet
-    summary_ws = wb.create_sheet("Resumen")
-    
-    # Header styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Title
-    summary_ws['A1'] = "Reporte de Biblioteca"
-    summary_ws['A1'].font = Font(bold=True, size=16)
-    summary_ws.merge_cells('A1:C1')
-    
-    # Date range
-    summary_ws['A3'] = f"Período: {start_date_obj.strftime('%d/%m/%Y')} - {end_date_obj.strftime('%d/%m/%Y')}"
-    summary_ws.merge_cells('A3:C3')
-    
-    # Summary statistics
-    summary_ws['A5'] = "Métrica"
-    summary_ws['B5'] = "Valor"
-    summary_ws['A5'].font = header_font
-    summary_ws['A5'].fill = header_fill
-    summary_ws['A5'].alignment = header_alignment
-    summary_ws['B5'].font = header_font
-    summary_ws['B5'].fill = header_fill
-    summary_ws['B5'].alignment = header_alignment
-    
-    summary_ws['A6'] = "Total de reservas"
-    summary_ws['B6'] = reservations_qs.count()
-    summary_ws['A7'] = "Salones utilizados"
-    summary_ws['B7'] = len(room_stats)
-    summary_ws['A8'] = "Tipos de materiales"
-    summary_ws['B8'] = len(material_stats)
-    
-    # Adjust column widths
-    summary_ws.column_dimensions['A'].width = 20
-    summary_ws.column_dimensions['B'].width = 15
-    
-    # Create room statistics sheet
-    room_ws = wb.create_sheet("Reservas por Salón")
-    
-    # Headers
-    room_ws['A1'] = "Código de Salón"
-    room_ws['B1'] = "Cantidad de Reservas"
-    
-    for col in ['A1', 'B1']:
-        room_ws[col].font = header_font
-        room_ws[col].fill = header_fill
-        room_ws[col].alignment = header_alignment
-    
-    # Data
-    row = 2
-    for stat in room_stats:
-        room_ws[f'A{row}'] = f"Salón {stat['room__code']}"
-        room_ws[f'B{row}'] = stat['reservation_count']
-        row += 1
-    
-    # Adjust column widths
-    room_ws.column_dimensions['A'].width = 20
-    room_ws.column_dimensions['B'].width = 25
-    
-    # Create material statistics sheet
-    material_ws = wb.create_sheet("Materiales Solicitados")
-    
-    # Headers
-    material_ws['A1'] = "Material"
-    material_ws['B1'] = "Cantidad Total Solicitada"
-    
-    for col in ['A1', 'B1']:
-        material_ws[col].font = header_font
-        material_ws[col].fill = header_fill
-        material_ws[col].alignment = header_alignment
-    
-    # Data
-    row = 2
-    for stat in material_stats:
-        material_ws[f'A{row}'] = stat['material__name']
-        material_ws[f'B{row}'] = stat['total_quantity']
-        row += 1
-    
-    # Adjust column widths
-    material_ws.column_dimensions['A'].width = 30
-    material_ws.column_dimensions['B'].width = 25
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    dataset = exports.ReportDataset(
+        start=start_date_obj,
+        end=end_date_obj,
+        total_reservations=total,
+        room_stats=room_stats,
+        material_stats=material_stats,
     )
-    response['Content-Disposition'] = f'attachment; filename="reporte_biblioteca_{start_date}_{end_date}.xlsx"'
-    
-    # Save workbook to response
-    wb.save(response)
-    
+
+    buffer = io.BytesIO()
+    with timing.span(fmt), metrics.observe(metrics.EXPORT_RENDER, fmt):
+        renderer.render(dataset, buffer)
+    response = HttpResponse(buffer.getvalue(), content_type=renderer.content_type)
+    response['Content-Disposition'] = f'attachment; filename="reporte_biblioteca_{start_date}_{end_date}.{renderer.extension}"'
     return response
@@ -1,6 +1,21 @@
 #!/usr/bin/env bash
 set -e
 
+# DJANGO_SERVER_MODE=dev (default): runserver with autoreload
+# DJANGO_SERVER_MODE=production: gunicorn pre-forked workers, DEBUG off
+SERVER_MODE="${DJANGO_SERVER_MODE:-dev}"
+if [ "$SERVER_MODE" = "production" ]; then
+  export DJANGO_DEBUG=0
+  export DB_CONN_MAX_AGE="${DB_CONN_MAX_AGE:-60}"
+  # Several workers: events and cache must be shared between processes
+  export BOOKING_EVENTS_BACKEND="${BOOKING_EVENTS_BACKEND:-file}"
+  export CACHE_BACKEND="${CACHE_BACKEND:-django.core.cache.backends.filebased.FileBasedCache}"
+  export CACHE_LOCATION="${CACHE_LOCATION:-/app/var/cache}"
+  # Per-worker metric files aggregated by /metrics; stale files from a previous run are removed
+  export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/app/var/metrics}"
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 # Wait for MySQL
 echo "Waiting for MySQL at $DB_HOST:$DB_PORT ..."
 until python - <<'PY'
@@ -23,9 +38,19 @@ done
 echo "Applying migrations..."
 python manage.py migrate
 
+echo "Generating OpenAPI schema..."
+python manage.py generate_schema || true
+
 echo "Seeding base data..."
 python manage.py create_sample_users || true
 python manage.py seed_data || true
 
+if [ "$SERVER_MODE" = "production" ]; then
+  echo "Collecting static files..."
+  python manage.py collectstatic --noinput
+  echo "Starting gunicorn on ${GUNICORN_BIND:-0.0.0.0:8000}"
+  exec gunicorn salones_cra.wsgi:application -c gunicorn.conf.py
+fi
+
 echo "Starting Django dev server on 0.0.0.0:8000"
 exec python manage.py runserver 0.0.0.0:8000
@@ -0,0 +1,31 @@
+# Gunicorn settings for DJANGO_SERVER_MODE=production (see entrypoint.sh)
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Threads let one worker keep serving while another thread holds an SSE stream
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Import Django once in the master and fork: faster boot, shared memory pages
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live samples from the shared metrics directory
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
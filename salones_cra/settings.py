@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -8,6 +9,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "dev-secret")
 DEBUG = os.getenv("DJANGO_DEBUG", "0") == "1"
+TESTING = sys.argv[1:2] == ["test"]
 ALLOWED_HOSTS = [h for h in os.getenv("DJANGO_ALLOWED_HOSTS","").split(",") if h] or ["127.0.0.1","localhost"]
 
 INSTALLED_APPS = [
@@ -25,21 +27,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "booking.middleware.ServerTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "booking.middleware.SessionRefreshMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "booking.middleware.ReplicaPinMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "booking.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "salones_cra.urls"
 
+# No explicit "loaders": Django wraps them in the cached template loader, so
+# templates are compiled once per worker process.
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates that reports render time to ServerTimingMiddleware
+        "BACKEND": "booking.timing.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "booking" / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -55,9 +65,13 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "salones_cra.wsgi.application"
 
+# DB_POOL=1 switches to the pooled MySQL backend (booking/db/backends/mysql_pool);
+# with the pool CONN_MAX_AGE must stay 0 so connections go back to it after each request.
+DB_POOL = os.getenv("DB_POOL", "0") == "1"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        "ENGINE": "booking.db.backends.mysql_pool" if DB_POOL else "django.db.backends.mysql",
         "NAME": os.getenv("DB_NAME", "salones_cra"),
         "USER": os.getenv("DB_USER", "root"),
         "PASSWORD": os.getenv("DB_PASSWORD", ""),
@@ -66,9 +80,35 @@ DATABASES = {
         "OPTIONS": {
             "charset": "utf8mb4",
         },
+        # Persistent connections (0 = close after each request); production mode sets 60
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": {
+            "SIZE": int(os.getenv("DB_POOL_SIZE", "5")),
+            "MAX_OVERFLOW": int(os.getenv("DB_POOL_MAX_OVERFLOW", "5")),
+            "MAX_LIFETIME": int(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            "PRE_PING": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        },
     }
 }
 
+# Optional read replica (reports, exports, lists). A second local database works
+# too: DB_REPLICA_NAME=salones_cra_replica with the same host.
+if os.getenv("DB_REPLICA_HOST") or os.getenv("DB_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_REPLICA_NAME", DATABASES["default"]["NAME"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "HOST": os.getenv("DB_REPLICA_HOST", DATABASES["default"]["HOST"]),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["booking.routers.ReplicaRouter"]
+# Seconds a user's reads stay on the primary after a write (read-your-writes)
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
 LANGUAGE_CODE = "es-cl"
 TIME_ZONE = os.getenv("TIME_ZONE", "America/Santiago")
 USE_I18N = True
@@ -76,6 +116,14 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "booking" / "static"]
+STATIC_ROOT = os.getenv("STATIC_ROOT", str(BASE_DIR / "var" / "static"))
+# Static files are served by WhiteNoise when DEBUG is off (compressed, far-future cache headers)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedStaticFilesStorage",
+    },
+}
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Authentication redirects
@@ -85,7 +133,71 @@ LOGOUT_REDIRECT_URL = "/"
 # Session settings
 SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are read from the cache (DB only on a miss). The 1 h sliding expiry is
+# kept by booking.middleware.SessionRefreshMiddleware, which saves the session
+# only after SESSION_REFRESH_FRACTION of the age has elapsed instead of on every request.
+# SESSION_BACKEND: cached_db (default), db or signed_cookies
+SESSION_ENGINE = "django.contrib.sessions.backends." + os.getenv("SESSION_BACKEND", "cached_db")
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_FRACTION = float(os.getenv("SESSION_REFRESH_FRACTION", "0.1"))
+
+# Cache: locmem is per process. With several workers point it to a shared
+# backend (e.g. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache)
+# so version stamps and cached feeds/pages are consistent.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "salones-cra"),
+    }
+}
+
+# iCalendar feeds: window around today and body cache lifetime (seconds)
+ICAL_PAST_DAYS = int(os.getenv("ICAL_PAST_DAYS", "30"))
+ICAL_FUTURE_DAYS = int(os.getenv("ICAL_FUTURE_DAYS", "180"))
+ICAL_CACHE_TIMEOUT = 86400
+
+# Cached template fragments (lists, reports dashboard); keys embed per-model
+# version stamps, so the timeout only bounds how long stale entries linger
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv("FRAGMENT_CACHE_TIMEOUT", "86400"))
+
+# archive_reservations moves reservations older than this many days to the archive tables
+RESERVATION_ARCHIVE_DAYS = int(os.getenv("RESERVATION_ARCHIVE_DAYS", "365"))
+
+# Live availability events (SSE). "memory" is per process; use "file" with several workers
+BOOKING_EVENTS_BACKEND = os.getenv("BOOKING_EVENTS_BACKEND", "memory")
+BOOKING_EVENTS_FILE = os.getenv("BOOKING_EVENTS_FILE", str(BASE_DIR / "var" / "events.log"))
+BOOKING_EVENTS_MAX_BYTES = int(os.getenv("BOOKING_EVENTS_MAX_BYTES", str(10 * 1024 * 1024)))  # then renamed to .1
+BOOKING_EVENTS_HEARTBEAT = int(os.getenv("BOOKING_EVENTS_HEARTBEAT", "15"))
+BOOKING_EVENTS_MAX_STREAM_SECONDS = int(os.getenv("BOOKING_EVENTS_MAX_STREAM_SECONDS", "300"))
+
+# Server-Timing header and one "booking.requests" log line per request;
+# queries of requests slower than SERVER_TIMING_SLOW_MS are logged too
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+SERVER_TIMING_SLOW_MS = int(os.getenv("SERVER_TIMING_SLOW_MS", "1000"))
+
+# Query budgets (booking.budgets): over budget raises with DEBUG and in tests, logs otherwise
+QUERY_BUDGET_RAISE = DEBUG or TESTING
+
+# On-demand profiling: staff requests with ?_profile=1 or "X-Profile: 1"
+PROFILING = os.getenv("PROFILING", "1") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "var" / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_MIN_INTERVAL = int(os.getenv("PROFILE_MIN_INTERVAL", "30"))
+
+# /metrics (Prometheus), refused while METRICS_TOKEN is empty unless DEBUG.
+# Multi-worker aggregation: set PROMETHEUS_MULTIPROC_DIR (see entrypoint.sh)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        # Under manage.py test only slow requests are logged, not one line per test request
+        "booking.requests": {"handlers": ["console"], "propagate": False,
+                             "level": os.getenv("REQUEST_LOG_LEVEL", "WARNING" if TESTING else "INFO")},
+    },
+}
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -109,3 +221,6 @@ SPECTACULAR_SETTINGS = {
     "TITLE": "Salones CRA API",
     "VERSION": "1.2.0",
 }
+
+# Precomputed schema artifact (manage.py generate_schema); live generation only with DEBUG
+OPENAPI_SCHEMA_DIR = os.getenv("OPENAPI_SCHEMA_DIR", str(BASE_DIR / "var" / "schema"))
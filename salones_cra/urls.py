@@ -8,6 +8,13 @@ urlpatterns = [
     path('', booking_views.index, name='index'),
     path('reservas/', booking_views.reservation_list, name='reservation_list'),
     path('reservas/nueva/', booking_views.reservation_create, name='reservation_create'),
+    # Live availability (Server-Sent Events)
+    path('eventos/', booking_views.events_stream, name='events_stream'),
+    path('eventos/salon/<int:room_id>/', booking_views.events_stream, name='room_events_stream'),
+    # iCalendar feeds
+    path('calendario/salon/<int:room_id>.ics', booking_views.room_calendar_feed, name='room_calendar_feed'),
+    path('calendario/usuario/<str:token>.ics', booking_views.user_calendar_feed, name='user_calendar_feed'),
+    path('calendario/semana/', booking_views.week_calendar, name='week_calendar'),
     path('bloqueos/', booking_views.blackout_list, name='blackout_list'),
     path('bloqueos/nuevo/', booking_views.blackout_create, name='blackout_create'),
     path('bloqueos/<int:pk>/editar/', booking_views.blackout_update, name='blackout_update'),
@@ -25,10 +32,16 @@ urlpatterns = [
     # User Management URLs
     path('usuarios/', booking_views.user_list, name='user_list'),
     path('usuarios/nuevo/', booking_views.user_create, name='user_create'),
+    path('usuarios/importar/', booking_views.user_import, name='user_import'),
     # Reports URLs
     path('reportes/', booking_views.reports_view, name='reports'),
-    path('reportes/exportar/pdf/', booking_views.export_reports_pdf, name='export_reports_pdf'),
-    path('reportes/exportar/excel/', booking_views.export_reports_excel, name='export_reports_excel'),
+    path('reportes/exportar/pdf/', booking_views.export_reports, {'fmt': 'pdf'}, name='export_reports_pdf'),
+    path('reportes/exportar/excel/', booking_views.export_reports, {'fmt': 'xlsx'}, name='export_reports_excel'),
+    path('reportes/exportar/<slug:fmt>/', booking_views.export_reports, name='export_reports'),
+    path('salud/db-pool/', booking_views.db_pool_stats, name='db_pool_stats'),
+    path('salud/perfiles/', booking_views.profile_list, name='profile_list'),
+    path('salud/perfiles/<slug:name>.<str:fmt>', booking_views.profile_download, name='profile_download'),
+    path('metrics', booking_views.metrics_view, name='metrics'),
     # Authentication URLs
     path('cuentas/login/', auth_views.LoginView.as_view(), name='login'),
     path('cuentas/logout/', booking_views.custom_logout, name='logout'),